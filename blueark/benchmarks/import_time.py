@@ -0,0 +1,88 @@
+"""Import time benchmarks of the entry points of the package.
+
+Every module is imported in a fresh interpreter, such that nothing is cached
+in `sys.modules`, and the wall time of the import is measured there together
+with the heavy optional dependencies the import pulled in. Reports are stored
+as json like the scale benchmarks.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from blueark.benchmarks import scale
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                            '..', '..'))
+
+DEFAULT_MODULES = ('blueark.simulation.simulator',
+                   'blueark.model.compiler',
+                   'blueark.optmization.backends',
+                   'blueark.optmization.opt',
+                   'blueark.optmization.ScipyMinimizer',
+                   'blueark.data_aggregation.load_data')
+
+# dependencies that should only be imported by the code using them
+HEAVY_MODULES = ('scipy', 'pandas', 'picos', 'cvxopt', 'pyarrow')
+
+_CHILD_CODE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds,
+                  'heavy': [name for name in sys.argv[2:]
+                            if name in sys.modules]}))
+"""
+
+
+def measure_import(module_name, repeat=5):
+    """Imports a module in `repeat` fresh interpreters.
+
+    Returns
+    -------
+    result: dict with the fastest import time in seconds and the sorted
+            heavy modules the import loaded
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [PROJECT_ROOT] + [path for path in [env.get('PYTHONPATH')] if path])
+
+    times = []
+    heavy = set()
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _CHILD_CODE, module_name] +
+            list(HEAVY_MODULES), env=env)
+        measurement = json.loads(output.decode().strip().split('\n')[-1])
+        times.append(measurement['seconds'])
+        heavy.update(measurement['heavy'])
+
+    return {'module': module_name,
+            'import_s': min(times),
+            'heavy_modules': sorted(heavy)}
+
+
+def run_suite(modules=DEFAULT_MODULES, repeat=5):
+    """Measures all modules and returns a json serialisable report."""
+    results = []
+    for module_name in modules:
+        print('Importing', module_name, '...')
+        results.append(measure_import(module_name, repeat))
+    return {'metadata': scale.metadata(),
+            'parameters': {'repeat': repeat},
+            'results': results}
+
+
+def save_results(report, results_dir):
+    """Stores a report as `imports_<commit>_<time>.json` in `results_dir`."""
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+    file_name = 'imports_{}_{}.json'.format(
+        (report['metadata']['commit'] or 'unknown')[:10],
+        report['metadata']['timestamp'])
+    path = os.path.join(results_dir, file_name)
+    with open(path, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+    return path
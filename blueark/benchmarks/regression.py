@@ -0,0 +1,234 @@
+"""Performance regression gate of the pipeline.
+
+Every stage of the pipeline is measured on generated networks of a few
+sizes: constraint generation, parsing of the constraint strings, matrix
+assembly, solving and a short simulation solving in process. Durations are
+divided by the duration of a fixed calibration workload measured in the same
+process, such that a baseline recorded on one machine can be checked on
+another. The peak traced memory of every stage is recorded as is.
+
+The baseline is a json report of `measure` stored in the repository,
+`find_regressions` compares a new report against it. The benchmark tests in
+`test/test_performance.py` only run if the environment variable
+`BLUEARK_BENCHMARKS` is set, see there.
+"""
+
+import contextlib
+import gc
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import blueark.equations_parsing as equ_parse
+from blueark.benchmarks.scale import metadata
+from blueark.equations import SymbolGenerator
+from blueark.model.generator import generate_network, generate_spec
+from blueark.model.objective import Objective
+from blueark.optmization.ScipyMinimizer import ScipyLinprogSolver
+from blueark.simulation.simulator import Simulator
+
+DEFAULT_SIZES = (50, 200, 800)
+DEFAULT_THRESHOLD = 2.0
+SIMULATION_STEPS = 5
+
+CONSTRAINTS_STAGE = 'constraints'
+PARSING_STAGE = 'parsing'
+MATRIX_STAGE = 'matrix'
+SOLVE_STAGE = 'solve'
+SIMULATION_STAGE = 'simulation'
+STAGES = (CONSTRAINTS_STAGE, PARSING_STAGE, MATRIX_STAGE, SOLVE_STAGE,
+          SIMULATION_STAGE)
+
+RELATIVE_TIME = 'relative_time'
+PEAK_MEMORY = 'peak_memory_bytes'
+# measurements below these floors are noise and never regress
+MIN_RELATIVE_TIME = 0.05
+MIN_PEAK_MEMORY = 256 * 1024
+
+Regression = namedtuple('Regression', ['size', 'stage', 'measure',
+                                       'baseline', 'value', 'ratio'])
+Regression.__doc__ = """A measurement of `stage` on networks of `size`
+entities exceeding its baseline by the factor `ratio`."""
+
+
+def calibrate(repeat=5):
+    """Best duration in seconds of a fixed workload of the kind the pipeline
+    runs: python loops over objects, string formatting and parsing."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        terms = ['{} * x_{}'.format(idx * 0.5, idx) for idx in range(20000)]
+        total = 0.0
+        for term in ' + '.join(terms).split(' + '):
+            factor, name = term.split('*')
+            total += float(factor) * int(name.strip()[2:])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _measure(function, repeat):
+    """Best duration over `repeat` calls and the peak traced memory of an
+    additional call, returns the result of the last call as well. Like in
+    timeit, the garbage collector is off while timing."""
+    best = float('inf')
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def measure_size(n_entities, repeat=5, seed=0):
+    """Measures every stage on a generated network.
+
+    Returns
+    -------
+    stages: OrderedDict of stage, (seconds, peak memory in bytes) pairs
+    """
+    SymbolGenerator.reset()
+    network = generate_network(n_entities, seed=seed)
+    stages = OrderedDict()
+
+    seconds, peak, (constraints, maximizers) = _measure(
+        network.gen_constraints, repeat)
+    stages[CONSTRAINTS_STAGE] = (seconds, peak)
+
+    def parse():
+        constr, bounds = Simulator.filter_equations(constraints)
+        var_names = sorted(equ_parse.get_all_coefficients(constraints),
+                           key=lambda name: int(name[2:]))
+        upper_bounds = Simulator.create_bounds_equ_dict(bounds, var_names)
+        return constr, var_names, upper_bounds
+
+    seconds, peak, (constr, var_names, upper_bounds) = _measure(parse,
+                                                                repeat)
+    stages[PARSING_STAGE] = (seconds, peak)
+
+    seconds, peak, (matrix, rhs_vec, equ_vec, columns) = _measure(
+        lambda: equ_parse.build_matrix(constr), repeat)
+    stages[MATRIX_STAGE] = (seconds, peak)
+
+    objective = Objective.from_maximizers(maximizers, columns)
+    solver = ScipyLinprogSolver(objective.coefficients, np.asarray(matrix),
+                                np.asarray(rhs_vec), np.asarray(equ_vec),
+                                [upper_bounds.get(name, -1.0)
+                                 for name in columns])
+    seconds, peak, _ = _measure(solver.solve, repeat)
+    stages[SOLVE_STAGE] = (seconds, peak)
+
+    with tempfile.TemporaryDirectory() as tmpdirpath:
+        network_path = os.path.join(tmpdirpath, 'network.json')
+        spec = generate_spec(n_entities, seed=seed)
+        with open(network_path, 'w') as outfile:
+            json.dump(spec, outfile)
+        n_consumers = sum(item['type'] == 'consumer'
+                          for item in spec['entities'])
+        rng = np.random.RandomState(seed)
+        consumer_data = OrderedDict(
+            (idx, rng.uniform(100, 300, SIMULATION_STEPS))
+            for idx in range(n_consumers))
+
+        def simulate():
+            # every run creates a run directory of its own in tmpdirpath
+            with contextlib.redirect_stdout(io.StringIO()):
+                Simulator(consumer_data, SIMULATION_STEPS, tmpdirpath,
+                          network_path=network_path,
+                          solve_workers=1).execute_main_loop()
+
+        # the first run compiles the network file, later runs load the cache
+        simulate()
+        seconds, peak, _ = _measure(simulate, repeat)
+        stages[SIMULATION_STAGE] = (seconds, peak)
+    SymbolGenerator.reset()
+    return stages
+
+
+def measure(sizes=DEFAULT_SIZES, repeat=5, seed=0):
+    """Measures all sizes and returns a json serialisable report, durations
+    are relative to the calibration workload."""
+    calibration = calibrate()
+    results = OrderedDict()
+    for n_entities in sizes:
+        results[str(n_entities)] = OrderedDict(
+            (stage, {RELATIVE_TIME: seconds / calibration,
+                     'seconds': seconds, PEAK_MEMORY: peak})
+            for stage, (seconds, peak) in measure_size(n_entities, repeat,
+                                                       seed).items())
+    return {'metadata': metadata(), 'calibration_s': calibration,
+            'parameters': {'repeat': repeat, 'seed': seed,
+                           'simulation_steps': SIMULATION_STEPS},
+            'results': results}
+
+
+def find_regressions(baseline, report, threshold=DEFAULT_THRESHOLD,
+                     memory_threshold=None):
+    """Measurements of a report exceeding the baseline by more than a
+    factor.
+
+    Arguments
+    ---------
+    baseline, report: reports of `measure`, only the sizes and stages
+                      present in both are compared
+    threshold: tolerated factor of the relative durations
+    memory_threshold: tolerated factor of the peak memory, defaults to
+                      `threshold`
+
+    Returns
+    -------
+    regressions: list of Regression
+    """
+    if memory_threshold is None:
+        memory_threshold = threshold
+    limits = ((RELATIVE_TIME, threshold, MIN_RELATIVE_TIME),
+              (PEAK_MEMORY, memory_threshold, MIN_PEAK_MEMORY))
+    regressions = []
+    for size, stages in report['results'].items():
+        for stage, values in stages.items():
+            old = baseline['results'].get(size, {}).get(stage)
+            if old is None:
+                continue
+            for key, factor, floor in limits:
+                reference = max(old[key], floor)
+                if values[key] > factor * reference:
+                    regressions.append(Regression(
+                        int(size), stage, key, old[key], values[key],
+                        values[key] / reference))
+    return regressions
+
+
+def describe(regression):
+    return '{} entities, {} {}: {:.3g} against {:.3g}, {:.1f}x'.format(
+        regression.size, regression.stage, regression.measure,
+        regression.value, regression.baseline, regression.ratio)
+
+
+def save_baseline(report, path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+        outfile.write('\n')
+
+
+def load_baseline(path):
+    with open(path, 'r') as infile:
+        return json.load(infile)
@@ -0,0 +1,218 @@
+"""Scale benchmarks of constraint generation, matrix assembly and solving on
+generated networks.
+
+Every stage is timed without tracing, the peak memory of the whole pipeline
+is measured in a second, traced, pass. Results are stored as json together
+with the git commit they were measured on, such that runs of different
+versions can be compared with `compare_results`.
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import blueark.equations_parsing as equ_parse
+from blueark.equations import SymbolGenerator
+from blueark.model.arrays import ArrayNetwork
+from blueark.model.generator import generate_network, random_structure
+from blueark.model.objective import Objective
+from blueark.optmization.ScipyMinimizer import ScipyLinprogSolver
+from blueark.simulation.simulator import Simulator
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# the dense matrix of build_matrix needs O(constraints * variables) memory
+DENSE_LIMIT = 3000
+
+CONSTRAINTS_STAGE = 'constraints'
+ARRAY_CONSTRAINTS_STAGE = 'array_constraints'
+MATRIX_STAGE = 'matrix'
+SOLVE_STAGE = 'solve'
+
+
+def run_pipeline(n_entities, seed=0, dense_limit=DENSE_LIMIT, timings=None,
+                 **generator_kwargs):
+    """Generates a network and runs all stages on it.
+
+    Arguments
+    ---------
+    n_entities: approximate size of the generated network
+    seed: seed of the network generator
+    dense_limit: matrix assembly and solve are skipped for larger networks
+    timings: optional dict receiving the duration of every stage
+    generator_kwargs: passed on to generate_network
+
+    Returns
+    -------
+    stats: dict with the network and problem sizes
+    """
+    timings = {} if timings is None else timings
+    SymbolGenerator.reset()
+    network = generate_network(n_entities, seed=seed, **generator_kwargs)
+
+    start = time.perf_counter()
+    constraints, maximizers = network.gen_constraints()
+    timings[CONSTRAINTS_STAGE] = time.perf_counter() - start
+
+    arrays = ArrayNetwork.from_network(network)
+    start = time.perf_counter()
+    arrays.build_constraints()
+    timings[ARRAY_CONSTRAINTS_STAGE] = time.perf_counter() - start
+
+    stats = {'n_entities': len(network.entities()),
+             'n_constraints': len(constraints),
+             'n_turbines': len(maximizers)}
+
+    if stats['n_entities'] > dense_limit:
+        return stats
+
+    start = time.perf_counter()
+    matrix, rhs_vec, equ_vec, var_names = equ_parse.build_matrix(constraints)
+    timings[MATRIX_STAGE] = time.perf_counter() - start
+    stats['n_variables'] = len(var_names)
+
+    # single variable constraints are upper bounds, as in the simulator
+    _, bounds = Simulator.filter_equations(constraints)
+    upper_bounds = Simulator.create_bounds_equ_dict(bounds, var_names)
+    rows = [idx for idx, equ in enumerate(constraints) if '+' in equ]
+    objective = Objective.from_maximizers(maximizers, var_names)
+    solver = ScipyLinprogSolver(objective.coefficients,
+                                np.asarray(matrix)[rows],
+                                np.asarray(rhs_vec)[rows],
+                                np.asarray(equ_vec)[rows],
+                                [upper_bounds[name] for name in var_names])
+    start = time.perf_counter()
+    result = solver.solve()
+    timings[SOLVE_STAGE] = time.perf_counter() - start
+    stats['solve_status'] = int(result.status)
+
+    return stats
+
+
+def benchmark_size(n_entities, repeat=3, seed=0, measure_memory=True,
+                   dense_limit=DENSE_LIMIT, **generator_kwargs):
+    """Benchmarks a single network size.
+
+    Returns
+    -------
+    result: dict of network sizes, the best time of every stage over
+    `repeat` runs in seconds and the peak traced memory in bytes
+    """
+    best = {}
+    for _ in range(repeat):
+        timings = {}
+        stats = run_pipeline(n_entities, seed, dense_limit, timings,
+                             **generator_kwargs)
+        for stage, duration in timings.items():
+            best[stage] = min(duration, best.get(stage, float('inf')))
+
+    result = dict(stats)
+    result.update({stage + '_s': duration for stage, duration in best.items()})
+
+    if measure_memory:
+        tracemalloc.start()
+        run_pipeline(n_entities, seed, dense_limit, **generator_kwargs)
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+
+def benchmark_arrays(n_entities, repeat=3, seed=0, **generator_kwargs):
+    """Benchmarks the constraints of an ArrayNetwork, which is generated
+    without creating any entity such that millions of entities fit.
+
+    Returns
+    -------
+    result: dict of network sizes and the best build time in seconds
+    """
+    network = ArrayNetwork.from_structure(
+        *random_structure(n_entities, seed=seed, **generator_kwargs))
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matrix, _, _, _ = network.build_constraints()
+        best = min(best, time.perf_counter() - start)
+    return {'n_entities': len(network), 'n_constraints': matrix.shape[0],
+            ARRAY_CONSTRAINTS_STAGE + '_s': best}
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=3, seed=0, measure_memory=True,
+              dense_limit=DENSE_LIMIT, array_sizes=(), **generator_kwargs):
+    """Benchmarks all sizes and returns a json serialisable report.
+
+    `array_sizes` are only benchmarked in their array form."""
+    results = []
+    for n_entities in sizes:
+        print('Benchmarking', n_entities, 'entities ...')
+        results.append(benchmark_size(n_entities, repeat, seed,
+                                      measure_memory, dense_limit,
+                                      **generator_kwargs))
+    array_results = []
+    for n_entities in array_sizes:
+        print('Benchmarking', n_entities, 'entities as arrays ...')
+        array_results.append(benchmark_arrays(n_entities, repeat, seed,
+                                              **generator_kwargs))
+
+    return {'metadata': metadata(),
+            'parameters': dict(generator_kwargs, seed=seed, repeat=repeat),
+            'results': results,
+            'array_results': array_results}
+
+
+def save_results(report, results_dir):
+    """Stores a report as `scale_<commit>_<time>.json` in `results_dir`."""
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+    file_name = 'scale_{}_{}.json'.format(
+        (report['metadata']['commit'] or 'unknown')[:10],
+        report['metadata']['timestamp'])
+    path = os.path.join(results_dir, file_name)
+    with open(path, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, 'r') as infile:
+        return json.load(infile)
+
+
+def compare_results(old_report, new_report):
+    """Returns the ratio new / old of every timing and memory measurement of
+    the sizes present in both reports, keyed by network size."""
+    old_results = {result['n_entities']: result
+                   for result in old_report['results']}
+    ratios = {}
+    for result in new_report['results']:
+        old = old_results.get(result['n_entities'])
+        if old is None:
+            continue
+        ratios[result['n_entities']] = {
+            key: result[key] / old[key] for key in result
+            if (key.endswith('_s') or key == 'peak_memory_bytes')
+            and old.get(key)}
+    return ratios
+
+
+def metadata():
+    """Commit, time and platform a benchmark report was measured on."""
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {'commit': commit,
+            'timestamp': datetime.datetime.now().strftime('%Y%m%d%H%M%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform()}
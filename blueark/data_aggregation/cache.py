@@ -0,0 +1,185 @@
+"""Module caching the sheets of the blue ark excel files in a binary columnar
+format, such that only the first load of a workbook has to parse excel.
+
+Every workbook gets a small json meta file in the cache directory holding the
+modification time and size of the source file it was converted from. A cached
+workbook is only reused as long as both of them are unchanged.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+
+CACHE_DIR_NAME = '.blueark_cache'
+
+FEATHER_FORMAT = 'feather'
+PICKLE_FORMAT = 'pickle'
+
+# feather needs pyarrow, which is only looked up, not imported
+if importlib.util.find_spec('pyarrow') is not None:
+    DEFAULT_FORMAT = FEATHER_FORMAT
+else:
+    DEFAULT_FORMAT = PICKLE_FORMAT
+
+FILE_EXTENSIONS = {FEATHER_FORMAT: '.feather', PICKLE_FORMAT: '.pkl'}
+
+
+def _pandas():
+    """Returns the pandas module, which is only imported on first use such
+    that importing the package stays fast."""
+    import pandas
+    return pandas
+
+
+def default_cache_dir(data_dir_path):
+    """Returns the cache directory used for the data files in a dir."""
+    return os.path.join(data_dir_path, CACHE_DIR_NAME)
+
+
+class SheetCache:
+    """Cache of converted excel sheets stored in `cache_dir`.
+
+    Arguments
+    ---------
+    cache_dir: directory holding the converted sheets, created if needed
+    file_format: either 'feather' (requires pyarrow) or 'pickle'
+    """
+
+    def __init__(self, cache_dir, file_format=DEFAULT_FORMAT):
+        assert file_format in FILE_EXTENSIONS, \
+            'unknown cache format {}'.format(file_format)
+        self.cache_dir = cache_dir
+        self.file_format = file_format
+
+    def sheet_names(self, file_path):
+        """Returns the sheet names of a workbook, converting it if the cache
+        is missing or stale."""
+        return list(self._valid_meta(file_path)['sheets'])
+
+    def load_sheet(self, file_path, sheet):
+        """Returns a single sheet of a workbook as pandas data frame."""
+        meta = self._valid_meta(file_path)
+        entry = meta['sheets'][sheet]
+        return _read_frame(os.path.join(self.cache_dir, entry['file']),
+                           entry['format'])
+
+    def load_workbook(self, file_path):
+        """Returns a dict holding sheet name, pandas df key value pairs for
+        all sheets of a workbook."""
+        meta = self._valid_meta(file_path)
+        return {sheet: _read_frame(os.path.join(self.cache_dir, entry['file']),
+                                   entry['format'])
+                for sheet, entry in meta['sheets'].items()}
+
+    def is_fresh(self, file_path):
+        """Returns whether the cached copy of a workbook can be reused."""
+        return self._read_meta(file_path) is not None
+
+    def _valid_meta(self, file_path):
+        meta = self._read_meta(file_path)
+        if meta is None:
+            meta = self._convert(file_path)
+        return meta
+
+    def _read_meta(self, file_path):
+        """Returns the meta dict of a workbook or None if it is stale."""
+        meta = self._load_meta(file_path)
+        if meta is None:
+            return None
+
+        stat = os.stat(file_path)
+        if meta['mtime_ns'] != stat.st_mtime_ns or \
+                meta['size'] != stat.st_size:
+            return None
+        return meta
+
+    def _load_meta(self, file_path):
+        """Returns the stored meta dict of a workbook, stale or not, or None
+        if there is none."""
+        try:
+            with open(self._meta_path(file_path), 'r') as infile:
+                return json.load(infile)
+        except (IOError, ValueError):
+            return None
+
+    def _convert(self, file_path):
+        """Parses all sheets of a workbook and stores them in the cache."""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # stat before parsing such that a concurrent edit invalidates the copy
+        stat = os.stat(file_path)
+        key = self._key(file_path)
+        previous = self._load_meta(file_path)
+        sheets = {}
+
+        pd = _pandas()
+        with pd.ExcelFile(file_path) as xls:
+            for idx, sheet in enumerate(xls.sheet_names):
+                frame = pd.read_excel(xls, sheet)
+                file_format = _write_frame(
+                    frame, os.path.join(self.cache_dir,
+                                        '{}_{}'.format(key, idx)),
+                    self.file_format)
+                sheets[sheet] = {'file': '{}_{}{}'.format(
+                    key, idx, FILE_EXTENSIONS[file_format]),
+                    'format': file_format}
+
+        meta = {'source': os.path.abspath(file_path),
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sheets': sheets}
+
+        # meta is written last, a crash while converting leaves a stale cache
+        tmp_path = self._meta_path(file_path) + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(meta, outfile)
+        os.replace(tmp_path, self._meta_path(file_path))
+
+        # sheets the workbook lost or that changed format leave files behind
+        if previous is not None:
+            current = {entry['file'] for entry in sheets.values()}
+            for entry in previous.get('sheets', {}).values():
+                if entry['file'] not in current:
+                    try:
+                        os.remove(os.path.join(self.cache_dir,
+                                               entry['file']))
+                    except OSError:
+                        pass
+
+        return meta
+
+    def _meta_path(self, file_path):
+        return os.path.join(self.cache_dir, self._key(file_path) + '.json')
+
+    @staticmethod
+    def _key(file_path):
+        """Cache key of a workbook, unique per absolute path."""
+        abs_path = os.path.abspath(file_path)
+        digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:12]
+        return '{}_{}'.format(os.path.basename(abs_path), digest)
+
+
+def _write_frame(frame, base_path, file_format):
+    """Writes a data frame and returns the format that was actually used.
+
+    Frames feather cannot represent (e.g. non string column names) are
+    written as pickle instead.
+    """
+    if file_format == FEATHER_FORMAT:
+        try:
+            frame.to_feather(base_path + FILE_EXTENSIONS[FEATHER_FORMAT])
+            return FEATHER_FORMAT
+        except (ValueError, TypeError):
+            pass
+
+    frame.to_pickle(base_path + FILE_EXTENSIONS[PICKLE_FORMAT])
+    return PICKLE_FORMAT
+
+
+def _read_frame(path, file_format):
+    pd = _pandas()
+    if file_format == FEATHER_FORMAT:
+        return pd.read_feather(path)
+    return pd.read_pickle(path)
@@ -2,10 +2,12 @@
 into dictionaries of pandas data frames."""
 
 import os
-
-import pandas as pd
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
 from blueark.common import DATA_DIR_PATH
+from blueark.data_aggregation.cache import (SheetCache, _pandas,
+                                            default_cache_dir)
 
 
 def get_all_file_paths(dir_path):
@@ -17,16 +19,19 @@ def get_all_file_paths(dir_path):
     dir_path: absolute dir path holding the blue ark excel data files
     """
     return {file_name: os.path.join(dir_path, file_name)
-            for file_name in os.listdir(dir_path)}
+            for file_name in os.listdir(dir_path)
+            if os.path.isfile(os.path.join(dir_path, file_name))}
 
 
-def load_data_files(file_name_dict):
+def load_data_files(file_name_dict, cache_dir=None):
     """Creates a dict holding file name keys and pandas data frames as values.
 
     Arguments
     ---------
     file_name_dict: dictionary with file_name, file_path key value pairs
     returned by get_all_file_paths
+    cache_dir: optional directory of a SheetCache, if given the sheets are
+    read from their converted copies instead of parsing the excel files
 
     Returns
     -------
@@ -34,30 +39,180 @@ def load_data_files(file_name_dict):
     sheet name, pandas df key value pair
     """
 
+    if cache_dir is not None:
+        cache = SheetCache(cache_dir)
+        return {file_name: cache.load_workbook(file_path)
+                for file_name, file_path in file_name_dict.items()}
+
+    pd = _pandas()
+
     all_data = {}
 
     for file_name, file_path in file_name_dict.items():
         all_data[file_name] = {}
-        xls = pd.ExcelFile(file_path)
-        sheet_names = xls.sheet_names
+        with pd.ExcelFile(file_path) as xls:
+            sheet_names = xls.sheet_names
 
-        for sheet in sheet_names:
-            all_data[file_name][sheet] = pd.read_excel(xls, sheet)
+            for sheet in sheet_names:
+                all_data[file_name][sheet] = pd.read_excel(xls, sheet)
 
     return all_data
 
 
-def load_all_blueark_data(data_dir_path=DATA_DIR_PATH):
+def load_all_blueark_data(data_dir_path=DATA_DIR_PATH, use_cache=True):
     """Loads all blue ark data from the default data folder in the project root
-    directory."""
+    directory.
+
+    With `use_cache` the sheets are converted once into the `.blueark_cache`
+    dir inside `data_dir_path` and reused as long as the excel files are
+    unchanged.
+    """
 
     assert os.path.exists(
         data_dir_path), \
         'provided data_dir_path {} does not exist'.format(data_dir_path)
 
-    return load_data_files(get_all_file_paths(data_dir_path))
+    cache_dir = default_cache_dir(data_dir_path) if use_cache else None
+    return load_data_files(get_all_file_paths(data_dir_path), cache_dir)
+
+
+FILE_COLUMN = 'file_name'
+SHEET_COLUMN = 'sheet_name'
+
 
+class LazyBlueArkData(Mapping):
+    """Read only mapping from (file name, sheet name) keys to pandas data
+    frames. A sheet is only read from disk the first time it is accessed.
 
-# TODO: aggregate all data in one single pandas data frame
-def aggregate_all_data_to_df():
-    return NotImplementedError
+    Arguments
+    ---------
+    data_dir_path: dir path holding the blue ark excel data files
+    use_cache: whether to read the sheets through a SheetCache
+    """
+
+    def __init__(self, data_dir_path=DATA_DIR_PATH, use_cache=True):
+        assert os.path.exists(
+            data_dir_path), \
+            'provided data_dir_path {} does not exist'.format(data_dir_path)
+
+        self.file_paths = get_all_file_paths(data_dir_path)
+        self.cache_dir = default_cache_dir(data_dir_path) if use_cache \
+            else None
+        self._sheet_names = {}
+        self._frames = {}
+
+    def sheet_names(self, file_name):
+        """Returns the sheet names of a single file."""
+        if file_name not in self._sheet_names:
+            file_path = self.file_paths[file_name]
+            if self.cache_dir is not None:
+                names = SheetCache(self.cache_dir).sheet_names(file_path)
+            else:
+                pd = _pandas()
+                with pd.ExcelFile(file_path) as xls:
+                    names = xls.sheet_names
+            self._sheet_names[file_name] = list(names)
+        return self._sheet_names[file_name]
+
+    def prefetch(self, file_names=None, max_workers=None):
+        """Parses many workbooks in parallel on a process pool.
+
+        With a cache the workers only convert stale workbooks into the cache,
+        the frames themselves are still read lazily. Without a cache the
+        parsed frames are sent back and kept in memory.
+
+        Arguments
+        ---------
+        file_names: names of the files to parse, defaults to all files
+        max_workers: number of worker processes, defaults to the cpu count
+        """
+        if file_names is None:
+            file_names = list(self.file_paths)
+        file_paths = [self.file_paths[name] for name in file_names]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_parse_workbook, file_paths,
+                                   [self.cache_dir] * len(file_paths))
+
+            for file_name, result in zip(file_names, results):
+                if self.cache_dir is not None:
+                    self._sheet_names[file_name] = result
+                    continue
+                self._sheet_names[file_name] = list(result)
+                for sheet, frame in result.items():
+                    self._frames[(file_name, sheet)] = frame
+
+    def __getitem__(self, key):
+        if key not in self._frames:
+            file_name, sheet = key
+            if file_name not in self.file_paths or \
+                    sheet not in self.sheet_names(file_name):
+                raise KeyError(key)
+            file_path = self.file_paths[file_name]
+            if self.cache_dir is not None:
+                frame = SheetCache(self.cache_dir).load_sheet(file_path,
+                                                              sheet)
+            else:
+                pd = _pandas()
+                frame = pd.read_excel(file_path, sheet)
+            self._frames[key] = frame
+        return self._frames[key]
+
+    def __iter__(self):
+        for file_name in sorted(self.file_paths):
+            for sheet in self.sheet_names(file_name):
+                yield file_name, sheet
+
+    def __len__(self):
+        return sum(len(self.sheet_names(file_name))
+                   for file_name in self.file_paths)
+
+
+def _parse_workbook(file_path, cache_dir):
+    """Process pool worker, returns the sheet names of a converted workbook
+    or a dict of sheet name, pandas df pairs without a cache."""
+    if cache_dir is not None:
+        return SheetCache(cache_dir).sheet_names(file_path)
+    pd = _pandas()
+    with pd.ExcelFile(file_path) as xls:
+        return {sheet: pd.read_excel(xls, sheet)
+                for sheet in xls.sheet_names}
+
+
+def aggregate_all_data_to_df(data_dir_path=DATA_DIR_PATH, data=None,
+                             max_workers=None):
+    """Concatenates all sheets of all blue ark files into a single pandas
+    data frame with two additional categorical columns holding the file and
+    sheet name of every row. Raises a ValueError if a sheet already has a
+    column of the same name.
+
+    Arguments
+    ---------
+    data_dir_path: dir path holding the blue ark excel data files
+    data: optional LazyBlueArkData instance to aggregate, it is created from
+    `data_dir_path` if not given
+    max_workers: number of processes used to parse the workbooks
+    """
+    pd = _pandas()
+
+    if data is None:
+        data = LazyBlueArkData(data_dir_path)
+    data.prefetch(max_workers=max_workers)
+
+    frames = []
+    for (file_name, sheet), frame in data.items():
+        clashing = [column for column in (FILE_COLUMN, SHEET_COLUMN)
+                    if column in frame.columns]
+        if clashing:
+            raise ValueError('Sheet {} of {} already has the column(s) {}'
+                             .format(sheet, file_name, ', '.join(clashing)))
+        frames.append(frame.assign(**{FILE_COLUMN: file_name,
+                                      SHEET_COLUMN: sheet}))
+    if not frames:
+        return pd.DataFrame(columns=[FILE_COLUMN, SHEET_COLUMN])
+
+    aggregated = pd.concat(frames, ignore_index=True, sort=False)
+    for column in (FILE_COLUMN, SHEET_COLUMN):
+        aggregated[column] = aggregated[column].astype('category')
+
+    return aggregated
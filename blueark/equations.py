@@ -17,6 +17,16 @@ class SymbolGenerator:
     def reset(cls):
         cls._idx = -1
 
+    @classmethod
+    def last_index(cls):
+        """Index of the last generated symbol, -1 if there is none."""
+        return cls._idx
+
+    @classmethod
+    def reserve(cls, idx):
+        """Makes sure that no symbol up to `x_idx` is generated again."""
+        cls._idx = max(cls._idx, idx)
+
 
 class EvalNode(metaclass=abc.ABCMeta):
     """Abstract base class for nodes that can be computationally evaluated."""
@@ -206,8 +216,9 @@ class NaryPlus(EvalNode):
         return False
 
     def __hash__(self):
+        # independent of the order of the children, like __eq__
         evaluated = self.evaluate()
-        return hash(tuple(set(self.children)))
+        return hash(frozenset(evaluated.children))
 
 
 class ConstraintNode(metaclass=abc.ABCMeta):
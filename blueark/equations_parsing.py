@@ -1,4 +1,6 @@
 import os
+import struct
+
 import numpy as np
 
 EQUALITY_OPERATORS = {'equal': {'val': 0, 'symbol': ' ='},
@@ -101,7 +103,7 @@ def write_bounds_file(bounds_equ_dict, turbine_params, file_path, n_equ):
     assert len(turbine_params) == len(bounds_equ_dict.keys())
     with open(file_path, 'w') as outfile:
 
-        outfile.write(str(turbine_params) + ' ' + str(n_equ) + "\n")
+        outfile.write(str(len(turbine_params)) + ' ' + str(n_equ) + "\n")
 
         all_names = bounds_equ_dict.keys()
 
@@ -129,3 +131,95 @@ def write_matrix_file(matrix, equ_vec, rhs_vec, file_path):
     with open(os.path.join(file_path), 'w') as outfile:
         np.savetxt(outfile, stacked, '%5.3f')
 
+
+def build_sparse_matrix(equations, var_names=None):
+    """Given a list of equations build the matrix in coordinate form.
+
+    Arguments
+    ---------
+    equations: list of equation strings
+    var_names: optional column order, defaults to all variables of the
+               equations sorted by symbol index like `build_matrix`
+
+    Returns
+    -------
+    rows, cols, values: the nonzero coefficients as numpy arrays
+    rhs_vector, equality_type_vector: numpy arrays of length m
+    var_names: the variable of every column
+    """
+    parsed = [get_coefficients(equ) for equ in equations]
+    if var_names is None:
+        all_names = {name for coefficients in parsed for name in coefficients}
+        var_names = sorted(all_names, key=lambda x: int(x[2:]))
+    coeff_indices = {name: idx for idx, name in enumerate(var_names)}
+
+    rows = []
+    cols = []
+    values = []
+    for row, coefficients_dict in enumerate(parsed):
+        for name, value in coefficients_dict.items():
+            rows.append(row)
+            cols.append(coeff_indices[name])
+            values.append(value)
+
+    rhs_vector = np.array([get_rhs_value(equ) for equ in equations],
+                          dtype=float)
+    equality_type_vector = np.array([get_equality_type(equ)
+                                     for equ in equations], dtype=np.int8)
+
+    return (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64),
+            np.array(values, dtype=float), rhs_vector, equality_type_vector,
+            list(var_names))
+
+
+SPARSE_TEXT_HEADER = '%%blueark-sparse'
+SPARSE_MAGIC = b'BLUEARKS'
+SPARSE_VERSION = 1
+# magic, version, m, n, nnz
+SPARSE_BINARY_HEADER = struct.Struct('<8sIqqq')
+
+
+def write_sparse_matrix_file(rows, cols, values, equ_vec, rhs_vec, shape,
+                             file_path, binary=False):
+    """Stores the constraint matrix in coordinate form, with the equality
+    and rhs vectors, at full precision.
+
+    Text format
+    -----------
+    line 1: %%blueark-sparse <version>
+    line 2: m n nnz
+    then m lines: equality rhs, one per equation
+    then nnz lines: row col value, zero based
+
+    Binary format (little endian)
+    -----------------------------
+    header: 8 byte magic BLUEARKS, uint32 version, int64 m, n and nnz
+    then: int8 equality[m], float64 rhs[m], int32 row[nnz], int32 col[nnz],
+          float64 value[nnz]
+    """
+    n_rows, n_cols = shape
+    nnz = len(values)
+    assert len(rows) == len(cols) == nnz
+    assert len(equ_vec) == len(rhs_vec) == n_rows
+
+    if binary:
+        if max(n_rows, n_cols) > np.iinfo(np.int32).max:
+            raise ValueError('Matrix of shape {} is too large for 32 bit '
+                             'indices'.format(shape))
+        with open(file_path, 'wb') as outfile:
+            outfile.write(SPARSE_BINARY_HEADER.pack(
+                SPARSE_MAGIC, SPARSE_VERSION, n_rows, n_cols, nnz))
+            for array, dtype in ((equ_vec, '<i1'), (rhs_vec, '<f8'),
+                                 (rows, '<i4'), (cols, '<i4'),
+                                 (values, '<f8')):
+                outfile.write(np.asarray(array).astype(dtype).tobytes())
+        return
+
+    with open(file_path, 'w') as outfile:
+        outfile.write('{} {}\n'.format(SPARSE_TEXT_HEADER, SPARSE_VERSION))
+        outfile.write('{} {} {}\n'.format(n_rows, n_cols, nnz))
+        for equ, rhs in zip(equ_vec, rhs_vec):
+            outfile.write('{} {!r}\n'.format(int(equ), float(rhs)))
+        for row, col, value in zip(rows, cols, values):
+            outfile.write('{} {} {!r}\n'.format(int(row), int(col),
+                                                float(value)))
@@ -0,0 +1,171 @@
+"""Array backed networks.
+
+An `ArrayNetwork` holds the same information as a graph of entities, but as
+a structure of arrays: the type, parameter and generator efficiency of every
+entity live in numpy arrays and the topology is the CSR adjacency matrix
+`A` with `A[p, c] = 1` for every parent `p` of a child `c`. Entity `i` is
+the variable `x_<symbols[i]>`.
+
+Constraints are built with sparse matrix operations instead of per entity
+method calls. They are the ones the entities generate, with the same signs:
+
+- balance of pipes and tanks: sum of parents - sum of children = 0
+- level of tanks: 2 * sum of children - self = 0
+- capacity of pipes and tanks: self <= parameter
+- outflow of sources: sum of children - self = 0
+- production of sources with a throughput: -self = -throughput
+- inflow of consumers: sum of parents - self = 0
+- demand of consumers: self = demand
+
+Rows are grouped by kind instead of by entity.
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix, identity, vstack
+
+from blueark.model.entities import (BALANCE, CAPACITY, DEMAND, INFLOW, LEVEL,
+                                    OUTFLOW, PRODUCTION)
+from blueark.model.network import symbol_index
+from blueark.model.spec import (CONSUMER, ENTITY_TYPES, PARAMETERS, PIPE,
+                                SOURCE, TANK)
+
+TYPE_CODES = {CONSUMER: 0, PIPE: 1, TANK: 2, SOURCE: 3}
+
+KIND_CODES = {kind: code for code, kind in enumerate(
+    (BALANCE, LEVEL, CAPACITY, OUTFLOW, PRODUCTION, INFLOW, DEMAND))}
+
+
+class ArrayNetwork:
+    def __init__(self, types, params, efficiencies, indptr, indices,
+                 symbols=None):
+        """A network given by arrays.
+
+        :param types: type code of every entity, see TYPE_CODES
+        :param params: demand, maximum throughput, capacity or throughput of
+            every entity, nan for sources without a fixed throughput
+        :param efficiencies: generator efficiency of every entity
+        :param indptr: CSR index pointer of the children of every entity
+        :param indices: CSR indices of the children of every entity
+        :param symbols: symbol index of every entity, increasing, defaults
+            to the entity index
+        """
+        self.types = np.asarray(types, dtype=np.int8)
+        self.params = np.asarray(params, dtype=float)
+        self.efficiencies = np.asarray(efficiencies, dtype=float)
+        n_entities = len(self.types)
+        self.adjacency = csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices, dtype=np.int64),
+             np.asarray(indptr, dtype=np.int64)),
+            shape=(n_entities, n_entities))
+        if symbols is None:
+            symbols = np.arange(n_entities)
+        self.symbols = np.asarray(symbols, dtype=np.int64)
+        if np.any(np.diff(self.symbols) <= 0):
+            raise ValueError('Expected entities ordered by symbol')
+
+    @classmethod
+    def from_network(cls, network):
+        """Converts a Network of entities into arrays."""
+        entities = network.entities()
+        index = {id(entity): idx for idx, entity in enumerate(entities)}
+        types = []
+        params = []
+        efficiencies = []
+        indptr = [0]
+        indices = []
+        for entity in entities:
+            entity_type = ENTITY_TYPES[type(entity)]
+            param = getattr(entity, PARAMETERS[entity_type])
+            types.append(TYPE_CODES[entity_type])
+            params.append(np.nan if param is None else param)
+            efficiencies.append(getattr(entity, 'efficiency', 0))
+            indices.extend(index[id(child)] for child in entity.children)
+            indptr.append(len(indices))
+        return cls(types, params, efficiencies, indptr, indices,
+                   [symbol_index(entity) for entity in entities])
+
+    @classmethod
+    def from_structure(cls, types, params, efficiencies, children):
+        """Creates a network from the lists of `random_structure`."""
+        indptr = np.zeros(len(children) + 1, dtype=np.int64)
+        np.cumsum([len(entity_children) for entity_children in children],
+                  out=indptr[1:])
+        indices = np.fromiter((child for entity_children in children
+                               for child in entity_children),
+                              dtype=np.int64, count=indptr[-1])
+        return cls([TYPE_CODES[entity_type] for entity_type in types],
+                   [np.nan if param is None else param for param in params],
+                   efficiencies, indptr, indices)
+
+    def __len__(self):
+        return len(self.types)
+
+    def of_type(self, *entity_types):
+        """Indices of the entities of the given types."""
+        codes = [TYPE_CODES[entity_type] for entity_type in entity_types]
+        return np.flatnonzero(np.isin(self.types, codes))
+
+    @property
+    def var_names(self):
+        return ['x_{}'.format(symbol) for symbol in self.symbols]
+
+    def build_constraints(self):
+        """Builds all constraints.
+
+        Returns
+        -------
+        matrix: scipy csr matrix, one column per entity
+        rhs: right hand side of every row
+        equ: relation of every row, 0 for =, -1 for <= and 1 for >=
+        kinds: kind code of every row, see KIND_CODES
+        """
+        n_entities = len(self)
+        adjacency = self.adjacency
+        # row p of the transpose holds the parents of p
+        parents = adjacency.T.tocsr()
+        eye = identity(n_entities, format='csr')
+
+        conduits = self.of_type(PIPE, TANK)
+        tanks = self.of_type(TANK)
+        sources = self.of_type(SOURCE)
+        producing = sources[~np.isnan(self.params[sources])]
+        consumers = self.of_type(CONSUMER)
+
+        blocks = [
+            (BALANCE, parents[conduits] - adjacency[conduits], 0,
+             np.zeros(len(conduits))),
+            (LEVEL, 2 * adjacency[tanks] - eye[tanks], 0,
+             np.zeros(len(tanks))),
+            (CAPACITY, eye[conduits], -1, self.params[conduits]),
+            (OUTFLOW, adjacency[sources] - eye[sources], 0,
+             np.zeros(len(sources))),
+            (PRODUCTION, -eye[producing], 0, -self.params[producing]),
+            (INFLOW, parents[consumers] - eye[consumers], 0,
+             np.zeros(len(consumers))),
+            (DEMAND, eye[consumers], 0, self.params[consumers]),
+        ]
+
+        matrix = vstack([block for _, block, _, _ in blocks], format='csr')
+        rhs = np.concatenate([block_rhs for _, _, _, block_rhs in blocks])
+        equ = np.concatenate([np.full(block.shape[0], block_equ,
+                                      dtype=np.int8)
+                              for _, block, block_equ, _ in blocks])
+        kinds = np.concatenate([np.full(block.shape[0], KIND_CODES[kind],
+                                        dtype=np.int8)
+                                for kind, block, _, _ in blocks])
+        return matrix, rhs, equ, kinds
+
+    def arrays(self):
+        """Returns the numeric problem with the keys of
+        `CompiledNetwork.arrays`, except for the entity offsets."""
+        matrix, rhs, equ, _ = self.build_constraints()
+        return {'var_names': self.var_names,
+                'indptr': matrix.indptr,
+                'indices': matrix.indices,
+                'data': matrix.data,
+                'rhs': rhs,
+                'equ': equ,
+                'objective': self.efficiencies.copy()}
+
+    def matrix(self):
+        return self.build_constraints()[0]
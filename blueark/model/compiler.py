@@ -0,0 +1,571 @@
+"""Networks compiled into their numeric constraint structure.
+
+Compiling runs the constraint machinery of the entities once and keeps the
+result as rows of coefficients, grouped in one block per entity. Parameters
+of the entities (demands, capacities, throughputs) map to the right hand
+side of a single row each and are patched in place, such that a new step of
+a simulation does not generate any constraint again.
+
+Entities changed after compiling are flagged dirty, `regenerate` rebuilds
+the blocks of the dirty entities and of the entities whose parents changed
+with them and splices them into the numeric arrays. The cost of an edit is
+proportional to the number of rows it touches, not to the network size.
+
+Compiled networks of declarative network files are cached on disk, keyed by
+the sha256 of the file content. Loading a network whose file did not change
+unpickles the compiled network instead of building it.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.equations_parsing import (get_coefficients, get_equality_type,
+                                       get_rhs_value)
+from blueark.model.entities import CAPACITY, DEMAND, PRODUCTION, Consumer
+from blueark.model.network import Network, symbol_index
+from blueark.model import spec as net_spec
+
+CACHE_DIR_NAME = '.network_cache'
+
+# bump whenever the pickled layout of CompiledNetwork changes
+COMPILED_VERSION = 2
+
+# kind of the row holding the parameter of every entity type
+PARAMETER_KINDS = {net_spec.CONSUMER: DEMAND,
+                   net_spec.PIPE: CAPACITY,
+                   net_spec.TANK: CAPACITY,
+                   net_spec.SOURCE: PRODUCTION}
+
+EQUALITY_SYMBOLS = {0: '=', -1: '<=', 1: '>='}
+
+Row = namedtuple('Row', ['kind', 'names', 'coeffs', 'equ', 'rhs', 'text'])
+
+
+def make_row(kind, names, coeffs, equ, rhs):
+    """Creates a row, its text is formatted like the string of the
+    constraint it was created from."""
+    terms = ' + '.join('{} * {}'.format(coeff, name)
+                       for name, coeff in zip(names, coeffs))
+    text = '{} {} {}'.format(terms, EQUALITY_SYMBOLS[equ], rhs)
+    return Row(kind, tuple(names), tuple(coeffs), equ, rhs, text)
+
+
+def parse_row(kind, constraint):
+    """Converts a constraint of an entity into a row."""
+    text = str(constraint)
+    coefficients = get_coefficients(text)
+    return make_row(kind, list(coefficients), list(coefficients.values()),
+                    get_equality_type(text), get_rhs_value(text))
+
+
+def compile_entity(entity):
+    """Returns the rows and maximizer strings of a single entity."""
+    constraints, maximizers = entity.local_equations()
+    rows = [parse_row(kind, constraint) for kind, constraint in constraints]
+    return rows, [str(maximizer) for maximizer in maximizers]
+
+
+class CompiledNetwork:
+    def __init__(self, network, ids=None):
+        """Compiles a network.
+
+        :param network: Network instance
+        :param ids: optional dict of entity id, entity pairs, such that
+            entities can be addressed by id
+        """
+        # entities come first such that pickling them in symbol order never
+        # recurses deeper than a single entity
+        self.entities = list(network.entities())
+        self.index = {id(entity): idx
+                      for idx, entity in enumerate(self.entities)}
+        self.ids = {}
+        if ids is not None:
+            self.ids = {name: self.index[id(entity)]
+                        for name, entity in ids.items()
+                        if id(entity) in self.index}
+        self.source_indices = [self.index[id(source)]
+                               for source in network.sources]
+        self.consumers = [idx for idx, entity in enumerate(self.entities)
+                          if isinstance(entity, Consumer)]
+        self.children_of = [[self.index[id(child)]
+                             for child in entity.children]
+                            for entity in self.entities]
+        # indices of entities no source reaches anymore, their blocks are
+        # empty
+        self.detached = set()
+
+        network.link()
+        self.blocks = []
+        self.maximizer_blocks = []
+        # shared by all entities, which append themselves once they are dirty
+        self.dirty_entities = []
+        for entity in self.entities:
+            rows, maximizers = compile_entity(entity)
+            self.blocks.append(rows)
+            self.maximizer_blocks.append(maximizers)
+            entity.dirty = False
+            entity.tracker = self.dirty_entities
+        self._arrays = None
+        self._var_index = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # ids of objects are only meaningful in the process creating them
+        del state['index']
+        state['_arrays'] = None
+        state['_var_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index = {id(entity): idx
+                      for idx, entity in enumerate(self.entities)}
+
+    def entity_index(self, entity):
+        """Index of an entity given as entity, id or index."""
+        if isinstance(entity, (int, np.integer)):
+            return entity
+        if isinstance(entity, str):
+            if entity not in self.ids:
+                raise ValueError('Unknown entity id {}'.format(entity))
+            return self.ids[entity]
+        return self.index[id(entity)]
+
+    def network(self):
+        """The compiled entities as Network, like the sample models."""
+        return Network([self.entities[idx] for idx in self.source_indices])
+
+    def rows(self):
+        """Returns all rows in entity order."""
+        return [row for rows in self.blocks for row in rows]
+
+    def gen_constraints(self):
+        """Retrieves the constraints and maximisation requirements as
+        strings, like `Network.gen_constraints`. Dirty entities are
+        regenerated first."""
+        if self.dirty_entities:
+            self.regenerate()
+        constraints = list(dict.fromkeys(row.text for row in self.rows()))
+        maximizers = [maximizer for maximizers in self.maximizer_blocks
+                      for maximizer in maximizers]
+        return constraints, maximizers
+
+    def set_parameter(self, entity, value):
+        """Sets the demand, capacity or throughput of an entity and patches
+        the right hand side of its parameter row.
+
+        :param entity: entity, entity id or entity index
+        :param value: new value of the parameter
+        """
+        idx = self.entity_index(entity)
+        entity = self.entities[idx]
+        if idx in self.detached:
+            raise ValueError('Entity {} is detached from the network'
+                             .format(entity.my_symbol))
+        entity_type = net_spec.ENTITY_TYPES[type(entity)]
+        was_dirty = entity.dirty
+        setattr(entity, net_spec.PARAMETERS[entity_type], value)
+
+        kind = PARAMETER_KINDS[entity_type]
+        rows = self.blocks[idx]
+        for row_idx, row in enumerate(rows):
+            if row.kind == kind:
+                break
+        else:
+            raise ValueError('Entity {} has no {} constraint to patch'
+                             .format(entity.my_symbol, kind))
+
+        # parameter rows are `c * x_i = c * value`
+        rhs = float(row.coeffs[0] * value)
+        rows[row_idx] = make_row(kind, row.names, row.coeffs, row.equ, rhs)
+        if self._arrays is not None:
+            self._arrays['rhs'][self._arrays['offsets'][idx] + row_idx] = rhs
+        # the patch already brought the entity up to date
+        entity.dirty = was_dirty
+
+    def regenerate(self):
+        """Rebuilds the blocks of all dirty entities and patches them into
+        the compiled system.
+
+        Entities whose children changed also rebuild the blocks of the
+        children they gained or lost, since those list their parents. New
+        entities reachable from dirty ones are added to the network.
+        Entities no source reaches anymore are detached: their blocks are
+        dropped until they are reachable again.
+
+        Returns
+        -------
+        changed: sorted indices of the entities whose blocks were rebuilt
+        """
+        dirty = [entity for entity in self.dirty_entities if entity.dirty]
+        del self.dirty_entities[:]
+        n_blocks = len(self.blocks)
+
+        # register new entities, children before parents is not required
+        stack = list(dirty)
+        while stack:
+            entity = stack.pop()
+            for child in entity.children:
+                if id(child) not in self.index:
+                    self._add_entity(child)
+                    dirty.append(child)
+                    stack.append(child)
+
+        changed = set()
+        structural = False
+        for entity in dirty:
+            idx = self.index[id(entity)]
+            changed.add(idx)
+            children = [self.index[id(child)] for child in entity.children]
+            old_children = set(self.children_of[idx])
+            new_children = set(children)
+            structural = structural or old_children != new_children
+            symbol = entity.my_symbol.get_symbol()
+            for child_idx in old_children - new_children:
+                child = self.entities[child_idx]
+                child.parents = {parent for parent in child.parents
+                                 if parent.get_symbol() != symbol}
+                changed.add(child_idx)
+            for child_idx in new_children - old_children:
+                self.entities[child_idx].parents.add(entity.get_symbol())
+                changed.add(child_idx)
+            self.children_of[idx] = children
+
+        newly_detached = set()
+        if structural:
+            newly_detached = self._update_reachability(changed)
+        for entity in dirty:
+            entity.dirty = False
+        # detached entities keep their empty blocks
+        changed = sorted(idx for idx in changed
+                         if idx not in self.detached or
+                         idx in newly_detached)
+
+        old_blocks = {idx: self.blocks[idx] for idx in changed}
+        for idx in changed:
+            entity = self.entities[idx]
+            if idx in self.detached:
+                self.blocks[idx], self.maximizer_blocks[idx] = [], []
+            else:
+                self.blocks[idx], self.maximizer_blocks[idx] = \
+                    compile_entity(entity)
+
+        if newly_detached:
+            # the variables of detached entities leave the columns, rebuild
+            # lazily
+            self._arrays = None
+            self._var_index = None
+        if self._arrays is not None:
+            self._patch_arrays(changed, old_blocks, n_blocks)
+        return changed
+
+    def _update_reachability(self, changed):
+        """Detaches the entities no source reaches and lets every reachable
+        entity list exactly its reachable parents. Entities whose blocks
+        have to be rebuilt are added to `changed`.
+
+        Returns
+        -------
+        newly_detached: indices of the entities detached by this call
+        """
+        reachable = set()
+        stack = list(self.source_indices)
+        while stack:
+            idx = stack.pop()
+            if idx in reachable:
+                continue
+            reachable.add(idx)
+            stack.extend(self.children_of[idx])
+
+        detached = set(range(len(self.entities))) - reachable
+        newly_detached = detached - self.detached
+        changed.update(newly_detached)
+        changed.update(self.detached - detached)
+        self.detached = detached
+
+        parents_of = {idx: [] for idx in reachable}
+        for idx in reachable:
+            for child_idx in self.children_of[idx]:
+                parents_of[child_idx].append(idx)
+        for idx, parents in parents_of.items():
+            entity = self.entities[idx]
+            symbols = {self.entities[parent].my_symbol.get_symbol()
+                       for parent in parents}
+            if {parent.get_symbol() for parent in entity.parents} != symbols:
+                entity.parents = {self.entities[parent].get_symbol()
+                                  for parent in parents}
+                changed.add(idx)
+
+        self.consumers = [idx for idx, entity in enumerate(self.entities)
+                          if isinstance(entity, Consumer) and
+                          idx not in detached]
+        return newly_detached
+
+    def _add_entity(self, entity):
+        idx = len(self.entities)
+        self.entities.append(entity)
+        self.index[id(entity)] = idx
+        self.children_of.append([])
+        self.blocks.append([])
+        self.maximizer_blocks.append([])
+        if isinstance(entity, Consumer):
+            self.consumers.append(idx)
+        entity.tracker = self.dirty_entities
+
+    def _patch_arrays(self, changed, old_blocks, n_blocks):
+        """Splices the rebuilt blocks into the arrays, `n_blocks` is the
+        number of blocks the arrays were built from."""
+        arrays = self._arrays
+        var_names = arrays['var_names']
+        var_index = self._var_index
+
+        new_names = sorted({name for idx in changed
+                            for row in self.blocks[idx]
+                            for name in row.names if name not in var_index},
+                           key=lambda name: int(name[2:]))
+        if new_names and var_names and \
+                int(new_names[0][2:]) < int(var_names[-1][2:]):
+            # columns would no longer be ordered by symbol, rebuild lazily
+            self._arrays = None
+            self._var_index = None
+            return
+        for name in new_names:
+            var_index[name] = len(var_names)
+            var_names.append(name)
+
+        objective = np.concatenate([arrays['objective'],
+                                    np.zeros(len(new_names))])
+        for idx in changed:
+            objective[var_index[self.entities[idx].my_symbol.get_symbol()]] \
+                = 0.0
+            for maximizer in self.maximizer_blocks[idx]:
+                value, name = maximizer.split('*')
+                objective[var_index[name.strip()]] = float(value)
+        arrays['objective'] = objective
+
+        indptr = arrays['indptr']
+        offsets = arrays['offsets']
+        n_rows = len(arrays['rhs'])
+
+        same_shape = all(
+            idx < n_blocks and
+            [row.names for row in old_blocks[idx]] ==
+            [row.names for row in self.blocks[idx]]
+            for idx in changed)
+        if same_shape:
+            for idx in changed:
+                for row_idx, row in enumerate(self.blocks[idx]):
+                    row_pos = offsets[idx] + row_idx
+                    arrays['data'][indptr[row_pos]:indptr[row_pos + 1]] = \
+                        row.coeffs
+                    arrays['rhs'][row_pos] = row.rhs
+                    arrays['equ'][row_pos] = row.equ
+            return
+
+        starts = np.append(offsets, [n_rows] * (len(self.blocks) - n_blocks))
+        ends = np.append(offsets[1:], n_rows)
+        ends = np.append(ends, [n_rows] * (len(self.blocks) - n_blocks))
+        lengths = np.diff(indptr)
+        pieces = {key: [] for key in ('lengths', 'indices', 'data', 'rhs',
+                                      'equ')}
+
+        def keep(first_row, last_row):
+            pieces['lengths'].append(lengths[first_row:last_row])
+            first, last = indptr[first_row], indptr[last_row]
+            pieces['indices'].append(arrays['indices'][first:last])
+            pieces['data'].append(arrays['data'][first:last])
+            pieces['rhs'].append(arrays['rhs'][first_row:last_row])
+            pieces['equ'].append(arrays['equ'][first_row:last_row])
+
+        sizes = ends - starts
+        position = 0
+        for idx in changed:
+            keep(position, starts[idx])
+            rows = self.blocks[idx]
+            pieces['lengths'].append(np.array([len(row.names)
+                                               for row in rows],
+                                              dtype=np.int64))
+            pieces['indices'].append(np.array(
+                [var_index[name] for row in rows for name in row.names],
+                dtype=np.int64))
+            pieces['data'].append(np.array(
+                [coeff for row in rows for coeff in row.coeffs], dtype=float))
+            pieces['rhs'].append(np.array([row.rhs for row in rows],
+                                          dtype=float))
+            pieces['equ'].append(np.array([row.equ for row in rows],
+                                          dtype=np.int8))
+            position = ends[idx]
+            sizes[idx] = len(rows)
+        keep(position, n_rows)
+
+        arrays['indptr'] = np.concatenate(
+            [[0], np.cumsum(np.concatenate(pieces['lengths']))]
+        ).astype(np.int64)
+        for key in ('indices', 'data', 'rhs', 'equ'):
+            arrays[key] = np.concatenate(pieces[key])
+        arrays['offsets'] = np.concatenate(
+            [[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    def set_consumer_usage(self, *weights):
+        """Sets the demand of all consumers, ordered by symbol."""
+        consumers = self.consumers
+        if len(weights) != len(consumers):
+            raise ValueError('Expected {} consumer weights, got {}'
+                             .format(len(consumers), len(weights)))
+        for idx, weight in zip(consumers, weights):
+            self.set_parameter(idx, weight)
+
+    def arrays(self):
+        """Returns the numeric problem as a dict of numpy arrays.
+
+        Keys
+        ----
+        var_names: variable names ordered by symbol index
+        indptr, indices, data: the constraint matrix in CSR layout
+        rhs: right hand side of every row
+        equ: relation of every row, 0 for =, -1 for <= and 1 for >=
+        objective: turbine efficiency of every variable
+        offsets: index of the first row of every entity block
+        """
+        if self.dirty_entities:
+            self.regenerate()
+        if self._arrays is not None:
+            return self._arrays
+
+        names = set()
+        for rows in self.blocks:
+            for row in rows:
+                names.update(row.names)
+        var_names = sorted(names, key=lambda name: int(name[2:]))
+        var_index = {name: idx for idx, name in enumerate(var_names)}
+        self._var_index = var_index
+
+        indptr = [0]
+        indices = []
+        data = []
+        rhs = []
+        equ = []
+        offsets = []
+        for rows in self.blocks:
+            offsets.append(len(rhs))
+            for row in rows:
+                indices.extend(var_index[name] for name in row.names)
+                data.extend(row.coeffs)
+                indptr.append(len(indices))
+                rhs.append(row.rhs)
+                equ.append(row.equ)
+
+        objective = np.zeros(len(var_names))
+        for maximizers in self.maximizer_blocks:
+            for maximizer in maximizers:
+                value, name = maximizer.split('*')
+                objective[var_index[name.strip()]] = float(value)
+
+        self._arrays = {'var_names': var_names,
+                        'indptr': np.array(indptr, dtype=np.int64),
+                        'indices': np.array(indices, dtype=np.int64),
+                        'data': np.array(data, dtype=float),
+                        'rhs': np.array(rhs, dtype=float),
+                        'equ': np.array(equ, dtype=np.int8),
+                        'objective': objective,
+                        'offsets': np.array(offsets, dtype=np.int64)}
+        return self._arrays
+
+    def matrix(self):
+        """Returns the constraint matrix as scipy csr matrix."""
+        from scipy.sparse import csr_matrix
+
+        arrays = self.arrays()
+        return csr_matrix((arrays['data'], arrays['indices'],
+                           arrays['indptr']),
+                          shape=(len(arrays['rhs']),
+                                 len(arrays['var_names'])))
+
+    def last_symbol_index(self):
+        return max(symbol_index(entity) for entity in self.entities)
+
+
+def compile_spec(spec):
+    """Builds and compiles the network of a spec dict."""
+    network, ids = net_spec.build_network(spec)
+    return CompiledNetwork(network, ids)
+
+
+def spec_digest(content):
+    """Cache key of the content of a network file."""
+    digest = hashlib.sha256()
+    digest.update('compiled network v{}\n'.format(COMPILED_VERSION)
+                  .encode('utf-8'))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def load_network(file_path, cache_dir=None, use_cache=True):
+    """Returns the compiled network of a JSON or TOML network file.
+
+    Arguments
+    ---------
+    file_path: path to the network file
+    cache_dir: directory of the compiled networks, defaults to a
+               `.network_cache` directory next to the network file
+    use_cache: whether to load and store compiled networks
+
+    Returns
+    -------
+    compiled: a CompiledNetwork
+    """
+    with open(file_path, 'rb') as infile:
+        content = infile.read()
+    file_format = net_spec.file_format_of(file_path)
+
+    if not use_cache:
+        return compile_spec(net_spec.parse_spec(content, file_format))
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)),
+                                 CACHE_DIR_NAME)
+    prefix = os.path.basename(file_path) + '_'
+    cache_path = os.path.join(cache_dir, '{}{}.pkl'.format(
+        prefix, spec_digest(content)[:24]))
+
+    try:
+        with open(cache_path, 'rb') as infile:
+            compiled = pickle.load(infile)
+    except (IOError, EOFError, pickle.UnpicklingError, AttributeError):
+        compiled = None
+
+    if compiled is not None:
+        # symbols created afterwards must not collide with the cached ones
+        SymbolGenerator.reserve(compiled.last_symbol_index())
+        return compiled
+
+    compiled = compile_spec(net_spec.parse_spec(content, file_format))
+
+    # concurrent processes may compile the same file, e.g. launcher, sweep
+    # and scenario workers
+    os.makedirs(cache_dir, exist_ok=True)
+    # compiled versions of previous contents of the file are stale
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith('.pkl') and \
+                name != os.path.basename(cache_path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+    # every process writes its own temporary file, replacing is atomic
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=prefix,
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            pickle.dump(compiled, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return compiled
@@ -2,30 +2,80 @@ from blueark.equations import *
 import abc
 from copy import deepcopy
 
+# kinds of the constraints an entity generates for itself
+BALANCE = 'balance'
+LEVEL = 'level'
+CAPACITY = 'capacity'
+OUTFLOW = 'outflow'
+PRODUCTION = 'production'
+INFLOW = 'inflow'
+DEMAND = 'demand'
+
 
 class Entity:
     __metaclass__ = abc.ABCMeta
 
+    # attributes whose change invalidates the constraints of the entity
+    TRACKED = ('children',)
+
     def __init__(self, children):
         """An entity is a node in the graph, it is connected
         to several downstream children entities, it has a symbolic
         demand in water
         :param children: downstream nodes in the graph
         """
+        # entities are dirty until their constraints are compiled, the
+        # tracker is a list collecting entities as they become dirty
+        self.dirty = True
+        self.tracker = None
         self.children = children
         # initially empty, will be filled afterwards by
         # propagate_symbols_downstream
         self.parents = set()
         self.my_symbol = SymbolicNode(SymbolGenerator.gen())
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self.TRACKED:
+            self.mark_dirty()
+
+    def mark_dirty(self):
+        """Flags the constraints of this entity as outdated. Needs to be
+        called explicitly after changing the list of children in place."""
+        if self.dirty:
+            return
+        self.dirty = True
+        if self.tracker is not None:
+            self.tracker.append(self)
+
     def get_symbol(self):
         return deepcopy(self.my_symbol)
 
+    def parent_symbols(self):
+        """The symbols of the parents ordered by symbol index, such that
+        constraints do not depend on the iteration order of the set."""
+        return sorted(self.parents,
+                      key=lambda symbol: int(symbol.get_symbol()[2:]))
+
     @abc.abstractmethod
-    def demand_equations(self):
-        """The demand carried by this node as an EvalNode instance"""
+    def local_equations(self):
+        """The constraints and maximizers of this node alone, without the
+        ones of its children. Constraints are (kind, constraint) pairs."""
         pass
 
+    def demand_equations(self):
+        """The demand carried by this node and all its descendants"""
+        constraint_res = []
+        maximizer_res = []
+        for child in self.children:
+            constraints, maximizers = child.demand_equations()
+            constraint_res += constraints
+            maximizer_res += maximizers
+        constraints, maximizers = self.local_equations()
+        constraint_res += [constraint for _, constraint in constraints]
+        maximizer_res += maximizers
+        return constraint_res, maximizer_res
+
     def propagate_symbols_downstream(self, parent_symbol=None):
         """Finishes to initialize the graph by propagating parent symbols
         to child nodes
@@ -40,6 +90,8 @@ class Entity:
 
 
 class Tank(Entity):
+    TRACKED = ('children', 'capacity')
+
     def __init__(self, children, capacity):
         """A tank stores water
 
@@ -49,29 +101,30 @@ class Tank(Entity):
         Entity.__init__(self, children)
         self.capacity = capacity
 
-    def demand_equations(self):
+    def local_equations(self):
         constraint_res = []
-        maximizer_res = []
-        for child in self.children:
-            constraints, maximizers = child.demand_equations()
-            constraint_res += constraints
-            maximizer_res += maximizers
         # throughput constraint
         child_sum = NaryPlus(*[child.my_symbol for child in self.children])
-        parent_sum = NaryPlus(*self.parents)
-        constraint_res += [EqualityConstraint(child_sum, parent_sum)]
+        parent_sum = NaryPlus(*self.parent_symbols())
+        constraint_res += [(BALANCE,
+                            EqualityConstraint(child_sum, parent_sum))]
         # level constraint
         child_sum = deepcopy(child_sum)
         child_sum.scalar_mul(2)
-        constraint_res += [EqualityConstraint(self.get_symbol(), child_sum)]
+        constraint_res += [(LEVEL,
+                            EqualityConstraint(self.get_symbol(), child_sum))]
         # capacity constraint
         capacity = LiteralNode(self.capacity)
-        constraint_res += [GreaterThanConstraint(capacity, self.get_symbol())]
+        constraint_res += [(CAPACITY,
+                            GreaterThanConstraint(capacity,
+                                                  self.get_symbol()))]
 
-        return constraint_res, maximizer_res
+        return constraint_res, []
 
 
 class Pipe(Entity):
+    TRACKED = ('children', 'max_throughput', 'efficiency')
+
     def __init__(self, children, max_throughput, efficiency=0):
         """A pipe route water from one point to another. It can
         generate electricity if it has a generator going through.
@@ -87,20 +140,18 @@ class Pipe(Entity):
         self.max_throughput = max_throughput
         self.efficiency = efficiency
 
-    def demand_equations(self):
+    def local_equations(self):
         constraint_res = []
         maximizer_res = []
-        for child in self.children:
-            constraints, maximizers = child.demand_equations()
-            constraint_res += constraints
-            maximizer_res += maximizers
         # throughput constraint
         child_sum = NaryPlus(*[child.my_symbol for child in self.children])
-        parent_sum = NaryPlus(*self.parents)
-        constraint_res += [EqualityConstraint(child_sum, parent_sum)]
+        parent_sum = NaryPlus(*self.parent_symbols())
+        constraint_res += [(BALANCE,
+                            EqualityConstraint(child_sum, parent_sum))]
         # contraint capacity
         lhs = LiteralNode(self.max_throughput)
-        constraint_res += [GreaterThanConstraint(lhs, self.get_symbol())]
+        constraint_res += [(CAPACITY,
+                            GreaterThanConstraint(lhs, self.get_symbol()))]
 
         # add generator power maximizer
         if self.efficiency != 0:
@@ -112,6 +163,8 @@ class Pipe(Entity):
 
 
 class Source(Entity):
+    TRACKED = ('children', 'throughput')
+
     def __init__(self, child, throughput=None):
         """A source produces water.
 
@@ -122,23 +175,20 @@ class Source(Entity):
         Entity.__init__(self, [child])
         self.throughput = throughput
 
-    def demand_equations(self):
-        constraint_res = []
-        maximizer_res = []
-        for child in self.children:
-            constraints, maximizers = child.demand_equations()
-            constraint_res += constraints
-            maximizer_res += maximizers
+    def local_equations(self):
         child_sum = NaryPlus(*[child.my_symbol for child in self.children])
-        constraint_res += [EqualityConstraint(self.get_symbol(), child_sum)]
+        constraint_res = [(OUTFLOW,
+                           EqualityConstraint(self.get_symbol(), child_sum))]
         if self.throughput is not None:
-            constraint_res += [EqualityConstraint(
-                self.get_symbol(), LiteralNode(self.throughput))]
+            constraint_res += [(PRODUCTION, EqualityConstraint(
+                self.get_symbol(), LiteralNode(self.throughput)))]
 
-        return constraint_res, maximizer_res
+        return constraint_res, []
 
 
 class Consumer(Entity):
+    TRACKED = ('children', 'demand')
+
     def __init__(self, demand):
         """A consumer requires water.
 
@@ -147,10 +197,12 @@ class Consumer(Entity):
         Entity.__init__(self, [])
         self.demand = demand
 
-    def demand_equations(self):
+    def local_equations(self):
         rhs = LiteralNode(self.demand)
-        parent_sum = NaryPlus(*self.parents)
-        constraint_res = [EqualityConstraint(self.get_symbol(), parent_sum)]
-        constraint_res += [EqualityConstraint(rhs, self.get_symbol())]
+        parent_sum = NaryPlus(*self.parent_symbols())
+        constraint_res = [(INFLOW,
+                           EqualityConstraint(self.get_symbol(), parent_sum))]
+        constraint_res += [(DEMAND,
+                            EqualityConstraint(rhs, self.get_symbol()))]
 
         return constraint_res, []
@@ -0,0 +1,185 @@
+"""Generator of random water networks of arbitrary size.
+
+Networks are layered DAGs: every source feeds one entity of the first layer,
+`depth` layers of pipes and tanks fan out towards the consumers of the last
+layer. Every entity has exactly one primary parent in the layer above, such
+that everything is reachable from a source, and with probability `sharing`
+an additional parent, like `consumers[0]` in `Model2`. Capacities are drawn
+relative to the demand downstream of each entity.
+
+Entities are created bottom up, such that consumers get the lowest symbols
+as in the sample models.
+"""
+
+import random
+
+from blueark.model.entities import Consumer, Pipe, Source, Tank
+from blueark.model.network import Network
+from blueark.model.spec import CONSUMER, PARAMETERS, PIPE, SOURCE, TANK
+
+MIN_DEMAND = 100
+MAX_DEMAND = 300
+
+
+def layer_sizes(n_entities, depth, fan_out):
+    """Returns the number of entities of every layer, from the sources down
+    to the consumers, summing up to roughly `n_entities`."""
+    if depth < 1:
+        raise ValueError('Expected a depth of at least 1, got {}'
+                         .format(depth))
+    if fan_out < 1:
+        raise ValueError('Expected a fan out of at least 1, got {}'
+                         .format(fan_out))
+
+    # one source per first layer entity, then fan out layer by layer
+    weights = [1.0, 1.0] + [fan_out ** level for level in range(1, depth + 1)]
+    n_sources = max(1, int(round(n_entities / sum(weights))))
+    sizes = [max(1, int(round(n_sources * weight))) for weight in weights]
+    for idx in range(1, len(sizes)):
+        # every parent needs at least one child of its own
+        sizes[idx] = max(sizes[idx], sizes[idx - 1])
+    return sizes
+
+
+def random_structure(n_entities, depth=4, fan_out=3.0, sharing=0.1,
+                     turbine_density=0.3, tank_fraction=0.3, seed=None):
+    """Draws a random network without creating any entity.
+
+    Arguments are the ones of `generate_network`.
+
+    Returns
+    -------
+    types: type of every entity, one of 'consumer', 'pipe', 'tank', 'source'
+    params: demand, maximum throughput, capacity or throughput (None)
+    efficiencies: generator efficiency of every entity
+    children: indices of the children of every entity
+
+    Entities are ordered bottom up, such that children come before their
+    parents and consumers first.
+    """
+    rng = random.Random(seed)
+    sizes = layer_sizes(n_entities, depth, fan_out)
+
+    # children[layer][idx] lists the indices in layer + 1 of the children,
+    # sources have exactly one child
+    layer_children = [[[idx] for idx in range(sizes[0])]]
+    for upper, lower in zip(sizes[1:-1], sizes[2:]):
+        order = list(range(lower))
+        rng.shuffle(order)
+        upper_children = [[] for _ in range(upper)]
+        for position, child in enumerate(order):
+            upper_children[position % upper].append(child)
+        if upper > 1:
+            for child in range(lower):
+                if rng.random() < sharing:
+                    parent = rng.randrange(upper)
+                    if child not in upper_children[parent]:
+                        upper_children[parent].append(child)
+        layer_children.append(upper_children)
+
+    demands = [rng.uniform(MIN_DEMAND, MAX_DEMAND) for _ in range(sizes[-1])]
+    types = [CONSUMER] * sizes[-1]
+    params = list(demands)
+    efficiencies = [0] * sizes[-1]
+    children = [[] for _ in range(sizes[-1])]
+    # flat index of the first entity of the layer below
+    below = 0
+    downstream = demands
+
+    for layer in range(len(sizes) - 2, 0, -1):
+        first = len(types)
+        layer_downstream = []
+        for child_indices in layer_children[layer]:
+            demand = sum(downstream[child] for child in child_indices)
+            children.append([below + child for child in child_indices])
+            efficiency = 0
+            if rng.random() < tank_fraction:
+                # the level of a tank is twice its throughput
+                types.append(TANK)
+                params.append(round(2 * demand * rng.uniform(1.5, 3.0)))
+            else:
+                if rng.random() < turbine_density:
+                    efficiency = rng.randint(10, 60)
+                types.append(PIPE)
+                params.append(round(demand * rng.uniform(1.2, 2.0)))
+            efficiencies.append(efficiency)
+            layer_downstream.append(demand)
+        below = first
+        downstream = layer_downstream
+
+    for child_indices in layer_children[0]:
+        types.append(SOURCE)
+        params.append(None)
+        efficiencies.append(0)
+        children.append([below + child_indices[0]])
+
+    return types, params, efficiencies, children
+
+
+def generate_network(n_entities, depth=4, fan_out=3.0, sharing=0.1,
+                     turbine_density=0.3, tank_fraction=0.3, seed=None):
+    """Generates a random but structurally valid network.
+
+    Arguments
+    ---------
+    n_entities: approximate number of entities of the network
+    depth: number of pipe and tank layers between sources and consumers
+    fan_out: average number of children of a pipe or tank
+    sharing: probability that an entity has a second parent
+    turbine_density: fraction of the pipes that hold a generator
+    tank_fraction: fraction of the pipe and tank layers that are tanks
+    seed: seed of the random generator, for reproducible networks
+
+    Returns
+    -------
+    network: a Network instance
+    """
+    types, params, efficiencies, children = random_structure(
+        n_entities, depth, fan_out, sharing, turbine_density, tank_fraction,
+        seed)
+
+    entities = []
+    sources = []
+    for entity_type, param, efficiency, child_indices in zip(
+            types, params, efficiencies, children):
+        entity_children = [entities[child] for child in child_indices]
+        if entity_type == CONSUMER:
+            entity = Consumer(param)
+        elif entity_type == TANK:
+            entity = Tank(entity_children, param)
+        elif entity_type == PIPE:
+            entity = Pipe(entity_children, param, efficiency)
+        else:
+            entity = Source(entity_children[0], param)
+            sources.append(entity)
+        entities.append(entity)
+    return Network(sources)
+
+
+def generate_spec(n_entities, depth=4, fan_out=3.0, sharing=0.1,
+                  turbine_density=0.3, tank_fraction=0.3, seed=None,
+                  name='generated'):
+    """Generates the same network as `generate_network` as a spec, which
+    can be stored as JSON network file, see `blueark.model.spec`.
+
+    Returns
+    -------
+    spec: dict with the name and the entities of the network
+    """
+    types, params, efficiencies, children = random_structure(
+        n_entities, depth, fan_out, sharing, turbine_density, tank_fraction,
+        seed)
+
+    items = []
+    for idx, (entity_type, param, efficiency, child_indices) in enumerate(
+            zip(types, params, efficiencies, children)):
+        item = {'id': 'entity_{}'.format(idx), 'type': entity_type}
+        if child_indices:
+            item['children'] = ['entity_{}'.format(child)
+                                for child in child_indices]
+        if param is not None:
+            item[PARAMETERS[entity_type]] = param
+        if efficiency:
+            item['efficiency'] = efficiency
+        items.append(item)
+    return {'name': name, 'entities': items}
@@ -0,0 +1,81 @@
+"""Water network made of arbitrary entities.
+
+Unlike the hand written sample models, a `Network` never recurses through
+the entity graph. Entities are collected once with an explicit stack and
+every entity generates its own constraints exactly once, even if it is
+shared by several parents. This keeps constraint generation linear in the
+size of the network and independent of its depth.
+"""
+
+from blueark.model.entities import Consumer
+
+
+def symbol_index(entity):
+    """Index of the symbol of an entity, e.g. 12 for `x_12`."""
+    return int(entity.my_symbol.get_symbol()[2:])
+
+
+class Network:
+    def __init__(self, sources):
+        """A network given by its sources, all other entities are found by
+        following the children of the sources.
+
+        :param sources: list of Source entities
+        """
+        self.sources = list(sources)
+        self._entities = None
+
+    def entities(self):
+        """Returns all entities of the network ordered by symbol index."""
+        if self._entities is None:
+            seen = {}
+            stack = list(self.sources)
+            while stack:
+                entity = stack.pop()
+                if id(entity) in seen:
+                    continue
+                seen[id(entity)] = entity
+                stack.extend(entity.children)
+            self._entities = sorted(seen.values(), key=symbol_index)
+        return self._entities
+
+    def consumers(self):
+        """Returns the consumers of the network ordered by symbol index."""
+        return [entity for entity in self.entities()
+                if isinstance(entity, Consumer)]
+
+    def link(self):
+        """Lets every entity know the symbols of its parents, like
+        `propagate_symbols_downstream` but visiting every edge once."""
+        for entity in self.entities():
+            for child in entity.children:
+                child.parents.add(entity.get_symbol())
+
+    def local_equations(self):
+        """Returns the (kind, constraint) pairs and maximizers of every
+        entity, in entity order."""
+        self.link()
+        constraints = []
+        maximizers = []
+        for entity in self.entities():
+            entity_constraints, entity_maximizers = entity.local_equations()
+            constraints += entity_constraints
+            maximizers += entity_maximizers
+        return constraints, maximizers
+
+    def gen_constraints(self):
+        """Retrieves the constraints on the network and the maximisation
+        requirements as strings.
+
+        The order is canonical: rows follow the symbol index of the entity
+        generating them and then the kind of the constraint in the order the
+        entity generates its kinds, terms of parents follow their symbol
+        index. It is the same in every step and in every process, whatever
+        the hash seed.
+        """
+        constraints, maximizers = self.local_equations()
+        # identical constraints are only kept once
+        constraints = list(dict.fromkeys(
+            str(constraint) for _, constraint in constraints))
+        maximizers = [str(maximizer) for maximizer in maximizers]
+        return constraints, maximizers
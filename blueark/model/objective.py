@@ -0,0 +1,100 @@
+"""Objective of a network as a coefficient vector.
+
+Models return their maximizers as strings like `"30.0 * x_8"`. An
+`Objective` parses them once into a vector of turbine efficiencies aligned
+with the columns of the constraint matrix, i.e. with the variables ordered
+by symbol index, which is also the column order of the variable output of a
+run. The generated power of a whole run is then a single matrix vector
+product of its (n_steps x n_vars) solution matrix with that vector.
+"""
+
+import numpy as np
+
+
+class Objective:
+    def __init__(self, var_names, coefficients):
+        """Maximisation of `coefficients . x`.
+
+        :param var_names: name of every variable, i.e. column
+        :param coefficients: turbine efficiency of every variable, 0 for
+            variables without a turbine
+        """
+        self.var_names = list(var_names)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        if self.coefficients.shape != (len(self.var_names),):
+            raise ValueError('Expected %i coefficients, got %s'
+                             % (len(self.var_names), self.coefficients.shape))
+        self.turbines = np.flatnonzero(self.coefficients)
+        self._turbine_dict = None
+
+    @classmethod
+    def from_maximizers(cls, maximizers, var_names):
+        """Parses maximizer strings of `gen_constraints`.
+
+        :param maximizers: strings like `"30.0 * x_8"`, several maximizers
+            of the same variable add up
+        :param var_names: the column order of the vector
+        """
+        index = {name: idx for idx, name in enumerate(var_names)}
+        coefficients = np.zeros(len(index))
+        for maximizer in maximizers:
+            value, name = maximizer.split('*')
+            name = name.strip()
+            if name not in index:
+                raise ValueError('Maximizer of unknown variable %s' % name)
+            coefficients[index[name]] += float(value)
+        return cls(var_names, coefficients)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """The objective of the `arrays()` of a CompiledNetwork or an
+        ArrayNetwork, which is compiled already."""
+        return cls(arrays['var_names'], arrays['objective'])
+
+    @property
+    def turbine_names(self):
+        return [self.var_names[idx] for idx in self.turbines]
+
+    def turbine_dict(self):
+        """Efficiency of every variable by name, as `write_bounds_file`
+        expects it. The dict is built once and shared."""
+        if self._turbine_dict is None:
+            self._turbine_dict = dict(zip(self.var_names,
+                                          self.coefficients.tolist()))
+        return self._turbine_dict
+
+    def power(self, values):
+        """Total generated power.
+
+        :param values: solution of a single step, of length n_vars, or
+            solutions of many steps as (n_steps x n_vars) matrix
+        :return: the power of the step or the power of every step
+        """
+        return np.asarray(values, dtype=float).dot(self.coefficients)
+
+    def turbine_power(self, values):
+        """Power generated by every turbine, in the order of `turbines`.
+
+        :param values: solution of a single step, of length n_vars, or
+            solutions of many steps as (n_steps x n_vars) matrix
+        :return: array of length n_turbines or (n_steps x n_turbines) matrix
+        """
+        values = np.asarray(values, dtype=float)
+        return values[..., self.turbines] * self.coefficients[self.turbines]
+
+    def __eq__(self, other):
+        return isinstance(other, Objective) and \
+            self.var_names == other.var_names and \
+            np.array_equal(self.coefficients, other.coefficients)
+
+    def save(self, file_path):
+        """Stores the objective as npz file, see `load`."""
+        with open(file_path, 'wb') as outfile:
+            np.savez(outfile, var_names=np.array(self.var_names),
+                     coefficients=self.coefficients)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as content:
+            return cls(content['var_names'].tolist(),
+                       content['coefficients'])
@@ -3,6 +3,7 @@
 """Sample model."""
 
 from blueark.model.entities import *
+from blueark.model.network import Network
 
 class Model:
     def __init__(self):
@@ -52,16 +53,11 @@ class Model:
 
     def gen_constraints(self):
         """Retrieves the constraints on the model and the maximisation
-        requirements."""
-        self.natural_source.propagate_symbols_downstream()
-        self.controlled_source.propagate_symbols_downstream()
-        constraints1, maximizers1 = self.natural_source.demand_equations()
-        constraints2, maximizers2 = self.controlled_source.demand_equations()
-        constraints = set(constraints1).union(set(constraints2))
-        constraints = [str(constraint) for constraint in constraints]
-        maximizers = maximizers1 + maximizers2
-        maximizers = [str(maximizer) for maximizer in maximizers]
-        return constraints, maximizers
+        requirements, in the canonical order of `Network.gen_constraints`."""
+        return self.network().gen_constraints()
+
+    def network(self):
+        return Network([self.natural_source, self.controlled_source])
 
 
 class Model2:
@@ -107,12 +103,11 @@ class Model2:
 
     def gen_constraints(self):
         """Retrieves the constraints on the model and the maximisation
-        requirements."""
-        self.source.propagate_symbols_downstream()
-        constraints, maximizers = self.source.demand_equations()
-        constraints = [str(constraint) for constraint in set(constraints)]
-        maximizers = [str(maximizer) for maximizer in maximizers]
-        return constraints, maximizers
+        requirements, in the canonical order of `Network.gen_constraints`."""
+        return self.network().gen_constraints()
+
+    def network(self):
+        return Network([self.source])
 
 
 
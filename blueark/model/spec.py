@@ -0,0 +1,147 @@
+"""Declarative network definitions.
+
+A network is described in a JSON or TOML file listing its entities:
+
+    {"name": "model2",
+     "entities": [
+        {"id": "consumer_0", "type": "consumer", "demand": 0},
+        {"id": "pipe", "type": "pipe", "children": ["consumer_0"],
+         "max_throughput": 200, "efficiency": 30},
+        {"id": "tank", "type": "tank", "children": ["pipe"],
+         "capacity": 1500},
+        {"id": "source", "type": "source", "children": ["tank"],
+         "throughput": 600}
+     ]}
+
+In TOML every entity is an `[[entities]]` table. Children have to be listed
+before their parents. Entities get their symbols in the order of the file,
+such that `x_0` is the first entity, like in the sample models. Every source
+has exactly one child, `throughput` of a source and `efficiency` of a pipe
+are optional.
+"""
+
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from blueark.equations import SymbolGenerator
+from blueark.model.entities import Consumer, Pipe, Source, Tank
+from blueark.model.network import Network
+
+CONSUMER = 'consumer'
+PIPE = 'pipe'
+TANK = 'tank'
+SOURCE = 'source'
+
+# parameter of every entity type, patched in place by the compiled network
+PARAMETERS = {CONSUMER: 'demand',
+              PIPE: 'max_throughput',
+              TANK: 'capacity',
+              SOURCE: 'throughput'}
+
+ENTITY_TYPES = {Consumer: CONSUMER, Pipe: PIPE, Tank: TANK, Source: SOURCE}
+
+
+def parse_spec(content, file_format):
+    """Parses the content of a network file, `file_format` is either 'json'
+    or 'toml'."""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    if file_format == 'json':
+        return json.loads(content)
+    if file_format == 'toml':
+        if tomllib is None:
+            raise ValueError('Reading TOML networks requires Python 3.11')
+        return tomllib.loads(content)
+    raise ValueError('Unknown network file format {}'.format(file_format))
+
+
+def file_format_of(file_path):
+    """Returns the format of a network file from its extension."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ('.json', '.toml'):
+        raise ValueError('Expected a .json or .toml network file, got {}'
+                         .format(file_path))
+    return extension[1:]
+
+
+def read_spec(file_path):
+    """Reads a network file into its spec dict."""
+    with open(file_path, 'rb') as infile:
+        return parse_spec(infile.read(), file_format_of(file_path))
+
+
+def _create_entity(item, ids):
+    entity_type = item.get('type')
+    if entity_type not in PARAMETERS:
+        raise ValueError('Entity {} has unknown type {}'
+                         .format(item.get('id'), entity_type))
+
+    children = []
+    for child_id in item.get('children', []):
+        if child_id not in ids:
+            raise ValueError('Child {} of {} is not defined before it'
+                             .format(child_id, item['id']))
+        children.append(ids[child_id])
+
+    if entity_type == CONSUMER:
+        if children:
+            raise ValueError('Consumer {} cannot have children'
+                             .format(item['id']))
+        return Consumer(item['demand'])
+    if not children:
+        raise ValueError('Entity {} needs at least one child'
+                         .format(item['id']))
+    if entity_type == PIPE:
+        return Pipe(children, item['max_throughput'],
+                    item.get('efficiency', 0))
+    if entity_type == TANK:
+        return Tank(children, item['capacity'])
+    if len(children) != 1:
+        raise ValueError('Source {} needs exactly one child'
+                         .format(item['id']))
+    return Source(children[0], item.get('throughput'))
+
+
+def build_network(spec):
+    """Creates the entities of a spec.
+
+    Symbols are numbered from `x_0` whatever symbols were generated before,
+    the symbol generator is then moved past both.
+
+    Returns
+    -------
+    network: Network made of all sources of the spec
+    ids: dict of entity id, entity pairs
+    """
+    entities = spec.get('entities')
+    if not entities:
+        raise ValueError('The network {} has no entities'
+                         .format(spec.get('name')))
+
+    previous = SymbolGenerator.last_index()
+    SymbolGenerator.reset()
+    try:
+        ids = {}
+        sources = []
+        for item in entities:
+            if 'id' not in item:
+                raise ValueError('Every entity needs an id, got {}'
+                                 .format(item))
+            if item['id'] in ids:
+                raise ValueError('Duplicate entity id {}'.format(item['id']))
+            entity = _create_entity(item, ids)
+            ids[item['id']] = entity
+            if isinstance(entity, Source):
+                sources.append(entity)
+    finally:
+        SymbolGenerator.reserve(previous)
+
+    if not sources:
+        raise ValueError('The network {} has no source'
+                         .format(spec.get('name')))
+    return Network(sources), ids
@@ -1,8 +1,10 @@
-import numpy as np
+"""Solvers based on scipy.optimize.
+
+scipy is only imported once a solver is used, such that importing this module
+stays cheap.
+"""
 
-from scipy.optimize import LinearConstraint
-from scipy.optimize import minimize
-from scipy.optimize import Bounds
+import numpy as np
 
 
 class ScipySolver:
@@ -27,6 +29,7 @@ class ScipySolver:
                 lower_bound.append(-np.inf)
         upper_bound = self.rhs_vec
 
+        from scipy.optimize import LinearConstraint
         return LinearConstraint(self.matrix, lower_bound, upper_bound)
 
     @staticmethod
@@ -60,6 +63,7 @@ class ScipySolver:
             constraints.append({'type': self.get_eq_type(equ_val),
                                 'fun': lambda x: rhs_val - np.dot(row, x)})
 
+        from scipy.optimize import Bounds
         bounds = Bounds(self.low_bounds, self.upper_bounds)
 
         return constraints, bounds
@@ -72,6 +76,8 @@ class ScipySolver:
         result: an OptimizedResult objects holding information about optimizer
         """
 
+        from scipy.optimize import minimize
+
         constrains, bounds = self.init_constraint_list()
         result = minimize(self.objective_function,
                           x0=self.init_guess,
@@ -99,3 +105,63 @@ class ScipySolver:
             return 'eq'
         else:
             return 'ineq'
+
+
+class ScipyLinprogSolver:
+
+    def __init__(self, turbine_params, matrix, rhs_vec, equ_vec,
+                 upper_bounds=None):
+        """Linear program maximising the generated power.
+
+        Arguments
+        ---------
+        turbine_params: turbine efficiency of every variable
+        matrix: m x n constraint matrix, dense or scipy sparse
+        rhs_vec: list of length m, the right hand sides
+        equ_vec: list of m relations as returned by get_equality_type,
+                 0 for =, -1 for <= and 1 for >=
+        upper_bounds: optional upper bound of every variable, negative or
+                      infinite values mean unbounded. Variables are >= 0.
+        """
+        from scipy.sparse import csr_matrix
+
+        self.turbine_params = np.asarray(turbine_params, dtype=float)
+        self.matrix = csr_matrix(matrix)
+        self.rhs_vec = np.asarray(rhs_vec, dtype=float)
+        self.equ_vec = np.asarray(equ_vec)
+        self.upper_bounds = upper_bounds
+
+    def solve(self):
+        """Solves the program with scipy.optimize.linprog.
+
+        Returns
+        -------
+        result: an OptimizeResult, `result.fun` is the negated power
+        """
+        from scipy.optimize import linprog
+        from scipy.sparse import csr_matrix
+
+        equalities = self.equ_vec == 0
+        smaller = self.equ_vec < 0
+        larger = self.equ_vec > 0
+
+        # >= rows are negated into <= rows
+        a_ub = self.matrix[smaller | larger]
+        b_ub = self.rhs_vec[smaller | larger]
+        signs = np.where(larger[smaller | larger], -1.0, 1.0)
+        a_ub = csr_matrix(a_ub.multiply(signs[:, np.newaxis]))
+        b_ub = b_ub * signs
+
+        bounds = (0, None)
+        if self.upper_bounds is not None:
+            bounds = [(0, upper if 0 <= upper < np.inf else None)
+                      for upper in self.upper_bounds]
+
+        return linprog(-self.turbine_params,
+                       A_ub=a_ub if a_ub.shape[0] else None,
+                       b_ub=b_ub if a_ub.shape[0] else None,
+                       A_eq=self.matrix[equalities]
+                       if equalities.any() else None,
+                       b_eq=self.rhs_vec[equalities]
+                       if equalities.any() else None,
+                       bounds=bounds)
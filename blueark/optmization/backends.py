@@ -0,0 +1,195 @@
+"""Registry of the solver backends, imported lazily by name.
+
+A backend turns a compiled network into a linear program (`prepare`) and
+solves it (`solve`), see `decomposition.LinearProgram` and
+`decomposition.Solution`. Backends are registered with a loader that is only
+called on the first `get_backend` of their name, such that importing the
+simulator does not import scipy, picos or cvxopt. Registered backends:
+
+- scipy: scipy.optimize.linprog, independent parts of the network are solved
+  concurrently
+- picos: picos with the cvxopt solver, the program is solved at once
+- cgal: the compiled cpp optimizer in a subprocess, the program is solved at
+  once
+
+`solve_within` solves a program with any backend in a child process that
+is terminated once a deadline passes, such that the time a step waits for
+the solver is bounded.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import blueark.equations_parsing as equ_parse
+
+Backend = namedtuple('Backend', ['name', 'prepare', 'solve'])
+Backend.__doc__ = """`prepare(compiled, fix_demands=False)` returns the
+LinearProgram of a compiled network and `solve(program, max_workers=None,
+executor=None)` its Solution."""
+
+SCIPY = 'scipy'
+PICOS = 'picos'
+CGAL = 'cgal'
+
+DEFAULT_BACKEND = SCIPY
+
+CPP_EXE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'main')
+CPP_BOUNDS_FILE_NAME = 'bounds.dat'
+CPP_MATRIX_FILE_NAME = 'matrix.spm'
+CPP_OUT_FILE_NAME = 'cpp_out.dat'
+
+_LOADERS = OrderedDict()
+_BACKENDS = {}
+
+
+def register_backend(name, loader):
+    """Registers a backend, replacing any backend of the same name.
+
+    Arguments
+    ---------
+    name: name the backend is looked up by
+    loader: function without arguments returning the Backend, called on the
+            first lookup of `name`
+    """
+    _LOADERS[name] = loader
+    _BACKENDS.pop(name, None)
+
+
+def get_backend(name):
+    """Returns the backend registered as `name`, loading it on first use.
+
+    Raises a ValueError for unknown names and an ImportError if the modules
+    the backend needs are not installed.
+    """
+    if name not in _BACKENDS:
+        if name not in _LOADERS:
+            raise ValueError('Unknown solver backend %r, expected one of %s'
+                             % (name, ', '.join(_LOADERS)))
+        _BACKENDS[name] = _LOADERS[name]()
+    return _BACKENDS[name]
+
+
+def backend_names():
+    """Names of all registered backends, loaded or not."""
+    return list(_LOADERS)
+
+
+def solve_within(backend, program, timeout, max_workers=None):
+    """Solves a linear program in a child process, giving up after
+    `timeout` seconds.
+
+    The child solves with `max_workers` processes of its own, a process
+    pool of the caller cannot be shared with it. Errors of the solver are
+    raised again in the caller.
+
+    Returns
+    -------
+    solution: the Solution, None if the solver missed the deadline
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_solve_into, args=(backend.name, program, max_workers, sender))
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            return None
+        failed, result = receiver.recv()
+    except EOFError:
+        raise RuntimeError('The %s solver died without a solution'
+                           % backend.name)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        receiver.close()
+    if failed:
+        raise result
+    return result
+
+
+def _solve_into(name, program, max_workers, connection):
+    try:
+        backend = get_backend(name)
+        result = (False, backend.solve(program, max_workers))
+    except Exception as error:
+        result = (True, error)
+    connection.send(result)
+    connection.close()
+
+
+def _load_scipy():
+    from blueark.optmization import decomposition
+    return Backend(SCIPY, decomposition.linear_program,
+                   decomposition.solve_decomposed)
+
+
+def _load_picos():
+    import picos  # noqa: F401, fails on lookup instead of on the first solve
+    from blueark.optmization import decomposition, opt
+    return Backend(PICOS, decomposition.linear_program, opt.solve_program)
+
+
+def _load_cgal():
+    from blueark.optmization import decomposition
+    return Backend(CGAL, decomposition.linear_program, solve_cpp)
+
+
+def solve_cpp(program, max_workers=None, executor=None,
+              exe_path=CPP_EXE_PATH):
+    """Solves a linear program with the cpp optimizer.
+
+    The program is written into the bounds and sparse matrix files the
+    optimizer reads in a temporary directory. `max_workers` and `executor`
+    are ignored, the program is solved at once.
+
+    Returns
+    -------
+    solution: a Solution with status 0
+    """
+    from blueark.optmization.decomposition import Solution
+
+    if program.fixed:
+        raise ValueError('The cpp optimizer cannot fix variables')
+    if not os.path.isfile(exe_path):
+        raise IOError('Cpp executable does not exist, needs to be compiled.')
+
+    var_names = program.var_names
+    coo = program.matrix.tocoo()
+    bounds_equ_dict = dict(zip(var_names, program.upper_bounds.tolist()))
+    turbine_dict = dict(zip(var_names, program.objective.tolist()))
+
+    with tempfile.TemporaryDirectory() as tmpdirpath:
+        equ_parse.write_sparse_matrix_file(
+            coo.row, coo.col, coo.data, program.equ, program.rhs,
+            program.matrix.shape,
+            os.path.join(tmpdirpath, CPP_MATRIX_FILE_NAME), binary=True)
+        equ_parse.write_bounds_file(
+            bounds_equ_dict, turbine_dict,
+            os.path.join(tmpdirpath, CPP_BOUNDS_FILE_NAME),
+            program.matrix.shape[0])
+        subprocess.check_call([exe_path, CPP_BOUNDS_FILE_NAME,
+                               CPP_MATRIX_FILE_NAME, CPP_OUT_FILE_NAME],
+                              cwd=tmpdirpath)
+        with open(os.path.join(tmpdirpath, CPP_OUT_FILE_NAME)) as infile:
+            lines = infile.read().split('\n')
+
+    objective = float(lines[0])
+    index = {name: idx for idx, name in enumerate(var_names)}
+    values = np.zeros(len(var_names))
+    for line in lines[1:]:
+        if line.strip():
+            var_name, value = line.split(',')
+            values[index[var_name.strip()]] = float(value)
+    return Solution(var_names, values, objective, 0, 1)
+
+
+register_backend(SCIPY, _load_scipy)
+register_backend(PICOS, _load_picos)
+register_backend(CGAL, _load_cgal)
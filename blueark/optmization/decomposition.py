@@ -0,0 +1,227 @@
+"""Decomposition of compiled networks into independent linear programs.
+
+Networks made of parts that never exchange water, e.g. valleys with their
+own sources, result in a block diagonal constraint matrix. Every block is a
+linear program of its own: it is solved separately, blocks are solved
+concurrently on a process pool and their solutions are merged into the
+solution of the whole network. Since the objective is a sum over the
+variables, the merged solution is optimal for the whole network.
+
+Problems use the formulation of the simulator: rows with a single variable
+are upper bounds, variables are non negative. With `fix_demands` demand and
+production rows pin their variable to the value instead, as the constraint
+equalities literally say. Pinned variables are substituted into the right
+hand sides, which also splits blocks that are only linked through consumers
+of fixed demand.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import bmat, csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from blueark.optmization.ScipyMinimizer import ScipyLinprogSolver
+
+LinearProgram = namedtuple('LinearProgram', ['var_names', 'objective',
+                                             'matrix', 'rhs', 'equ',
+                                             'upper_bounds', 'fixed'])
+LinearProgram.__doc__ = """Maximisation of `objective` subject to rows of
+`matrix` related by `equ` to `rhs` and 0 <= x <= `upper_bounds`, where
+negative upper bounds mean unbounded. `fixed` maps the indices of the
+variables eliminated beforehand to their value."""
+
+Solution = namedtuple('Solution', ['var_names', 'values', 'objective',
+                                   'status', 'n_components'])
+
+# components are batched such that every worker receives a few batches
+BATCHES_PER_WORKER = 4
+
+
+def linear_program(compiled, fix_demands=False):
+    """Returns the linear program of a compiled network.
+
+    Arguments
+    ---------
+    compiled: a CompiledNetwork or ArrayNetwork
+    fix_demands: whether single variable equalities fix their variable
+                 instead of bounding it from above
+    """
+    arrays = compiled.arrays()
+    n_vars = len(arrays['var_names'])
+    indptr = arrays['indptr']
+    lengths = np.diff(indptr)
+    single = lengths == 1
+
+    upper_bounds = np.full(n_vars, -1.0)
+    fixed = {}
+    for row in np.flatnonzero(single):
+        pos = indptr[row]
+        var = arrays['indices'][pos]
+        value = arrays['rhs'][row] / arrays['data'][pos]
+        if fix_demands and arrays['equ'][row] == 0:
+            fixed[int(var)] = value
+        else:
+            upper_bounds[var] = value
+
+    matrix = csr_matrix((arrays['data'], arrays['indices'], indptr),
+                        shape=(len(lengths), n_vars))[~single]
+    rhs = arrays['rhs'][~single]
+    if fixed:
+        columns = np.array(sorted(fixed))
+        values = np.array([fixed[column] for column in columns])
+        rhs = rhs - matrix[:, columns].dot(values)
+        keep = np.ones(n_vars, dtype=bool)
+        keep[columns] = False
+        matrix = csr_matrix(matrix.multiply(keep[np.newaxis, :]))
+        matrix.eliminate_zeros()
+
+    return LinearProgram(arrays['var_names'], arrays['objective'], matrix,
+                         rhs, arrays['equ'][~single], upper_bounds, fixed)
+
+
+def find_components(program):
+    """Splits a linear program into independent blocks.
+
+    Returns
+    -------
+    components: list of (row indices, variable indices) pairs. Fixed
+                variables and rows without any free variable belong to no
+                component.
+    """
+    matrix = csr_matrix(program.matrix)
+    n_rows, n_vars = matrix.shape
+    pattern = csr_matrix((np.ones(matrix.nnz), matrix.indices,
+                          matrix.indptr), shape=matrix.shape)
+    graph = bmat([[None, pattern], [pattern.T, None]], format='csr')
+    _, labels = connected_components(graph, directed=False)
+
+    row_labels = labels[:n_rows]
+    var_labels = labels[n_rows:]
+    free = np.ones(n_vars, dtype=bool)
+    free[list(program.fixed)] = False
+
+    components = {}
+    for var in np.flatnonzero(free):
+        components.setdefault(var_labels[var], ([], []))[1].append(var)
+    for row in range(n_rows):
+        if row_labels[row] in components:
+            components[row_labels[row]][0].append(row)
+    return [(np.array(rows, dtype=np.int64), np.array(variables,
+                                                      dtype=np.int64))
+            for rows, variables in components.values()]
+
+
+def sub_program(program, rows, variables):
+    """Returns the objective, matrix, rhs, equ and bounds of a block."""
+    matrix = csr_matrix(program.matrix)[rows][:, variables]
+    return (program.objective[variables], matrix, program.rhs[rows],
+            program.equ[rows], program.upper_bounds[variables])
+
+
+def solve_block(block):
+    """Solves a single block and returns its status and variable values."""
+    objective, matrix, rhs, equ, upper_bounds = block
+    if matrix.shape[0] == 0:
+        # only bounded by its bounds, free variables sit at their bound
+        values = np.where((objective > 0) & (upper_bounds >= 0),
+                          upper_bounds, 0.0)
+        unbounded = (objective > 0) & (upper_bounds < 0)
+        return (3 if unbounded.any() else 0), values
+    result = ScipyLinprogSolver(objective, matrix, rhs, equ,
+                                upper_bounds).solve()
+    if result.x is None:
+        return result.status, np.full(len(objective), np.nan)
+    return result.status, result.x
+
+
+def _solve_batch(blocks):
+    return [solve_block(block) for block in blocks]
+
+
+def _batches(components, n_batches):
+    """Distributes components over batches of similar total size, largest
+    components first."""
+    order = sorted(range(len(components)),
+                   key=lambda idx: -len(components[idx][0]))
+    batches = [[] for _ in range(min(n_batches, len(components)))]
+    sizes = [0] * len(batches)
+    for idx in order:
+        smallest = sizes.index(min(sizes))
+        batches[smallest].append(idx)
+        sizes[smallest] += len(components[idx][0]) + \
+            len(components[idx][1])
+    return batches
+
+
+def _solve_parallel(executor, components, blocks, n_workers):
+    batches = _batches(components, BATCHES_PER_WORKER * n_workers)
+    futures = [executor.submit(_solve_batch, [blocks[idx] for idx in batch])
+               for batch in batches]
+    results = [None] * len(blocks)
+    for batch, future in zip(batches, futures):
+        for idx, result in zip(batch, future.result()):
+            results[idx] = result
+    return results
+
+
+def _residual_status(program, components):
+    """Status of the rows without any free variable, 2 (infeasible) if one
+    of them is violated by the fixed variables."""
+    covered = np.zeros(len(program.rhs), dtype=bool)
+    for rows, _ in components:
+        covered[rows] = True
+    rhs = program.rhs[~covered]
+    equ = program.equ[~covered]
+    # the rows read 0 <relation> rhs once the fixed variables are moved over
+    violated = ((equ == 0) & (np.abs(rhs) > 1e-9)) | \
+        ((equ < 0) & (rhs < -1e-9)) | ((equ > 0) & (rhs > 1e-9))
+    return 2 if violated.any() else 0
+
+
+def solve_decomposed(program, max_workers=None, executor=None):
+    """Solves every block of a linear program and merges the solutions.
+
+    Arguments
+    ---------
+    program: a LinearProgram
+    max_workers: number of worker processes, defaults to the cpu count. With
+                 a single worker or a single block nothing is forked.
+    executor: optional process pool to reuse, e.g. over many steps of a
+              simulation, `max_workers` is then only used for batching
+
+    Returns
+    -------
+    solution: a Solution, `values` holds the value of every variable and
+              `status` is 0 if all blocks were solved to optimality or else
+              the linprog status of the first failing block
+    """
+    components = find_components(program)
+    values = np.zeros(len(program.var_names))
+    for var, value in program.fixed.items():
+        values[var] = value
+
+    blocks = [sub_program(program, rows, variables)
+              for rows, variables in components]
+    n_workers = max_workers or os.cpu_count() or 1
+    if len(blocks) <= 1 or (n_workers == 1 and executor is None):
+        results = _solve_batch(blocks)
+    elif executor is not None:
+        results = _solve_parallel(executor, components, blocks, n_workers)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = _solve_parallel(executor, components, blocks,
+                                      n_workers)
+
+    status = _residual_status(program, components)
+    for (_, variables), (block_status, block_values) in zip(components,
+                                                            results):
+        values[variables] = block_values
+        if status == 0 and block_status != 0:
+            status = block_status
+
+    return Solution(program.var_names, values,
+                    float(np.dot(program.objective, values)), status,
+                    len(components))
@@ -0,0 +1,197 @@
+"""Max-flow feasibility check of the consumer demands.
+
+Before a step is solved, the maximum flow from the sources to the consumers
+is computed on the entity graph. Every entity is split into an in and an out
+node joined by an arc of its limit: the throughput of a source (unbounded if
+it has none), the maximum throughput of a pipe, half the capacity of a tank
+and the demand of a consumer, as the level of a tank is twice the flow
+through it in the linear program. Children are joined to their parents by
+unbounded arcs. The demands can be delivered if and only if the maximum
+flow equals the total demand. Otherwise the sources, pipes and tanks on a
+minimum cut are the bottlenecks: raising any of their limits is necessary
+to deliver more.
+
+The flow is computed with Dinic's algorithm, in O(V^2 E) in general and far
+less on the shallow graphs of water networks. The structure is built once,
+only the limits are read again on every check.
+"""
+
+from collections import deque, namedtuple
+
+import numpy as np
+
+from blueark.model.entities import Consumer, Pipe, Source, Tank
+
+FeasibilityResult = namedtuple('FeasibilityResult', ['feasible', 'demand',
+                                                     'max_flow', 'shortfall',
+                                                     'delivered',
+                                                     'bottlenecks'])
+FeasibilityResult.__doc__ = """Result of a check. `delivered` holds the flow
+reaching every consumer in a maximum flow, ordered by symbol, and
+`bottlenecks` the entities on a minimum cut if the demands cannot be
+delivered."""
+
+# relative tolerance on the total demand
+TOLERANCE = 1e-9
+
+
+def entity_limit(entity):
+    """Flow an entity lets through, inf if unbounded."""
+    if isinstance(entity, Consumer):
+        return float(entity.demand)
+    if isinstance(entity, Pipe):
+        return float(entity.max_throughput)
+    if isinstance(entity, Tank):
+        # the LEVEL row sets the level to twice the flow to the children
+        return float(entity.capacity) / 2
+    if isinstance(entity, Source) and entity.throughput is not None:
+        return float(entity.throughput)
+    return np.inf
+
+
+class FlowCheck:
+    def __init__(self, network):
+        """Builds the flow graph of a network.
+
+        :param network: Network instance, its entities must not change
+            their children afterwards
+        """
+        self.entities = list(network.entities())
+        index = {id(entity): idx for idx, entity in enumerate(self.entities)}
+        self.consumers = [idx for idx, entity in enumerate(self.entities)
+                          if isinstance(entity, Consumer)]
+        self.var_names = [entity.my_symbol.get_symbol()
+                          for entity in self.entities]
+
+        # node 0 is the super source, node 1 the super sink, entity i has
+        # the in node 2 + 2i and the out node 3 + 2i
+        self.n_nodes = 2 + 2 * len(self.entities)
+        self._heads = []
+        self._capacities = []
+        self._adjacency = [[] for _ in range(self.n_nodes)]
+        # arc from the in to the out node of every entity
+        self._entity_arcs = []
+        for idx, entity in enumerate(self.entities):
+            self._entity_arcs.append(len(self._heads))
+            self._add_arc(2 + 2 * idx, 3 + 2 * idx, 0.0)
+            for child in entity.children:
+                self._add_arc(3 + 2 * idx, 2 + 2 * index[id(child)], np.inf)
+        for source in network.sources:
+            self._add_arc(0, 2 + 2 * index[id(source)], np.inf)
+        for idx in self.consumers:
+            self._add_arc(3 + 2 * idx, 1, np.inf)
+        self._flows = [0.0] * len(self._heads)
+
+    def _add_arc(self, tail, head, capacity):
+        """Adds an arc and its reverse arc, arc k is reversed by k ^ 1."""
+        self._adjacency[tail].append(len(self._heads))
+        self._heads.append(head)
+        self._capacities.append(capacity)
+        self._adjacency[head].append(len(self._heads))
+        self._heads.append(tail)
+        self._capacities.append(0.0)
+
+    def check(self, demands=None):
+        """Computes a maximum flow for the current limits of the entities.
+
+        :param demands: optional demand of every consumer, ordered by symbol,
+            overriding the demands of the consumer entities
+        :return: a FeasibilityResult
+        """
+        limits = [entity_limit(entity) for entity in self.entities]
+        if demands is not None:
+            if len(demands) != len(self.consumers):
+                raise ValueError('Expected {} demands, got {}'
+                                 .format(len(self.consumers), len(demands)))
+            for idx, demand in zip(self.consumers, demands):
+                limits[idx] = float(demand)
+        for idx, limit in enumerate(limits):
+            self._capacities[self._entity_arcs[idx]] = max(limit, 0.0)
+        self._flows = [0.0] * len(self._heads)
+
+        total_demand = sum(limits[idx] for idx in self.consumers)
+        epsilon = TOLERANCE * max(1.0, total_demand)
+        max_flow = self._max_flow(epsilon)
+
+        delivered = np.array([self._flows[self._entity_arcs[idx]]
+                              for idx in self.consumers])
+        shortfall = max(0.0, total_demand - max_flow)
+        feasible = shortfall <= epsilon
+        bottlenecks = [] if feasible else self._min_cut(epsilon)
+        return FeasibilityResult(feasible, total_demand, max_flow, shortfall,
+                                 delivered, bottlenecks)
+
+    def _residual(self, arc):
+        return self._capacities[arc] - self._flows[arc]
+
+    def _levels(self, epsilon):
+        """Breadth first distances from the super source in the residual
+        graph, -1 for unreachable nodes."""
+        levels = [-1] * self.n_nodes
+        levels[0] = 0
+        queue = deque([0])
+        while queue:
+            node = queue.popleft()
+            for arc in self._adjacency[node]:
+                head = self._heads[arc]
+                if levels[head] < 0 and self._residual(arc) > epsilon:
+                    levels[head] = levels[node] + 1
+                    queue.append(head)
+        return levels
+
+    def _max_flow(self, epsilon):
+        total = 0.0
+        while True:
+            levels = self._levels(epsilon)
+            if levels[1] < 0:
+                return total
+            pointers = [0] * self.n_nodes
+            while True:
+                pushed = self._augment(levels, pointers, epsilon)
+                if pushed <= epsilon:
+                    break
+                total += pushed
+
+    def _augment(self, levels, pointers, epsilon):
+        """Finds one augmenting path in the level graph with an explicit
+        stack and pushes its bottleneck, returns the pushed flow."""
+        path = []
+        node = 0
+        while node != 1:
+            adjacency = self._adjacency[node]
+            while pointers[node] < len(adjacency):
+                arc = adjacency[pointers[node]]
+                head = self._heads[arc]
+                if levels[head] == levels[node] + 1 and \
+                        self._residual(arc) > epsilon:
+                    break
+                pointers[node] += 1
+            else:
+                # dead end, retreat and never enter this node again
+                if not path:
+                    return 0.0
+                levels[node] = -1
+                arc = path.pop()
+                node = self._heads[arc ^ 1]
+                pointers[node] += 1
+                continue
+            path.append(arc)
+            node = self._heads[arc]
+
+        pushed = min(self._residual(arc) for arc in path)
+        for arc in path:
+            self._flows[arc] += pushed
+            self._flows[arc ^ 1] -= pushed
+        return pushed
+
+    def _min_cut(self, epsilon):
+        """Indices of the sources, pipes and tanks whose arc crosses the
+        minimum cut of the last flow."""
+        reachable = self._levels(epsilon)
+        return [idx for idx, entity in enumerate(self.entities)
+                if not isinstance(entity, Consumer) and
+                reachable[2 + 2 * idx] >= 0 and reachable[3 + 2 * idx] < 0]
+
+    def bottleneck_names(self, result):
+        """Symbols of the bottlenecks of a result."""
+        return [self.var_names[idx] for idx in result.bottlenecks]
@@ -0,0 +1,161 @@
+"""Greedy routing of the consumer demands, a fast approximation of the
+optimal flow.
+
+Water is routed along the path from a source to a consumer with the highest
+sum of turbine efficiencies first, as much as the entities on the path let
+through, then along the best path with spare capacity left, until no source
+reaches a consumer whose demand is left. The limits are the ones of the
+max-flow check, see `feasibility.entity_limit`. Every routed path uses up
+the limit of one of its entities, such that at most as many paths as
+entities are routed, each found in a single pass over the entities. The
+routing is not optimal in general: flow is never rerouted, e.g. when the
+best path takes a shared pipe two slightly worse paths would fill.
+
+Along with the routing an upper bound of the power is computed, which gives
+the optimality gap of the routing without solving the step.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from blueark.model.entities import Consumer, Pipe, Tank
+from blueark.optmization.feasibility import TOLERANCE, entity_limit
+
+Routing = namedtuple('Routing', ['values', 'objective', 'bound', 'gap'])
+Routing.__doc__ = """Result of a greedy routing. `values` holds the flow
+through every entity, ordered by symbol, and the level of every tank, twice
+its flow as in the linear program, `objective` the power it generates
+and `bound` an upper bound of the power of any routing. `gap` is the
+optimality gap of the routing relative to the bound, between 0 and 1."""
+
+
+class GreedyRouter:
+    def __init__(self, network):
+        """Prepares the routing of a network.
+
+        :param network: Network instance, its entities must not change
+            their children afterwards
+        """
+        self.entities = list(network.entities())
+        index = {id(entity): idx for idx, entity in enumerate(self.entities)}
+        self.var_names = [entity.my_symbol.get_symbol()
+                          for entity in self.entities]
+        self.consumers = [idx for idx, entity in enumerate(self.entities)
+                          if isinstance(entity, Consumer)]
+        self.sources = [index[id(source)] for source in network.sources]
+        self.tanks = [idx for idx, entity in enumerate(self.entities)
+                      if isinstance(entity, Tank)]
+        self.children = [[index[id(child)] for child in entity.children]
+                         for entity in self.entities]
+        self.order = self._children_first()
+
+    def _children_first(self):
+        """Indices of the entities such that every entity comes after all
+        its children."""
+        order = []
+        visited = [False] * len(self.entities)
+        for root in self.sources:
+            if visited[root]:
+                continue
+            visited[root] = True
+            stack = [(root, iter(self.children[root]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if not visited[child]:
+                        visited[child] = True
+                        stack.append((child, iter(self.children[child])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        return order
+
+    def efficiencies(self):
+        """Current turbine efficiency of every entity, 0 without turbine."""
+        return [float(entity.efficiency) if isinstance(entity, Pipe) else 0.0
+                for entity in self.entities]
+
+    def route(self, demands=None):
+        """Routes the demands along the most efficient paths first.
+
+        :param demands: optional demand of every consumer, ordered by symbol,
+            overriding the demands of the consumer entities
+        :return: a Routing
+        """
+        residual = [entity_limit(entity) for entity in self.entities]
+        if demands is not None:
+            if len(demands) != len(self.consumers):
+                raise ValueError('Expected {} demands, got {}'
+                                 .format(len(self.consumers), len(demands)))
+            for idx, demand in zip(self.consumers, demands):
+                residual[idx] = float(demand)
+        residual = [max(limit, 0.0) for limit in residual]
+        efficiencies = self.efficiencies()
+        bound = self._bound(residual, efficiencies)
+        epsilon = TOLERANCE * max(1.0, sum(residual[idx]
+                                           for idx in self.consumers))
+
+        flows = np.zeros(len(self.entities))
+        while True:
+            path = self._best_path(residual, efficiencies, epsilon)
+            if path is None:
+                break
+            amount = min(residual[idx] for idx in path)
+            for idx in path:
+                residual[idx] -= amount
+                flows[idx] += amount
+
+        objective = float(np.dot(efficiencies, flows))
+        gap = (bound - objective) / bound if bound > 0 else 0.0
+        flows[self.tanks] *= 2
+        return Routing(flows, objective, bound, max(gap, 0.0))
+
+    def _best_path(self, residual, efficiencies, epsilon):
+        """The source to consumer path of the highest efficiency through
+        entities with spare capacity, None if there is none."""
+        best = [-np.inf] * len(self.entities)
+        choice = [None] * len(self.entities)
+        consumers = set(self.consumers)
+        for idx in self.order:
+            if residual[idx] <= epsilon:
+                continue
+            if idx in consumers:
+                best[idx] = 0.0
+                continue
+            for child in self.children[idx]:
+                if best[child] > best[idx] - efficiencies[idx]:
+                    best[idx] = efficiencies[idx] + best[child]
+                    choice[idx] = child
+
+        start = max(self.sources, key=lambda idx: best[idx])
+        if best[start] == -np.inf:
+            return None
+        path = [start]
+        while choice[path[-1]] is not None:
+            path.append(choice[path[-1]])
+        return path
+
+    def _bound(self, limits, efficiencies):
+        """Upper bound of the power: no turbine carries more than its limit
+        or the demand downstream of it, and no unit of water passes turbines
+        of more than the best path efficiency."""
+        downstream = [0.0] * len(self.entities)
+        path_efficiency = [0.0] * len(self.entities)
+        for idx in self.consumers:
+            downstream[idx] = limits[idx]
+        for idx in self.order:
+            if self.children[idx]:
+                downstream[idx] = sum(downstream[child]
+                                      for child in self.children[idx])
+                path_efficiency[idx] = efficiencies[idx] + max(
+                    path_efficiency[child] for child in self.children[idx])
+
+        turbine_bound = sum(efficiency * min(limits[idx], downstream[idx])
+                            for idx, efficiency in enumerate(efficiencies)
+                            if efficiency != 0)
+        demand = sum(limits[idx] for idx in self.consumers)
+        path_bound = demand * max([path_efficiency[idx]
+                                   for idx in self.sources] or [0.0])
+        return min(turbine_bound, path_bound)
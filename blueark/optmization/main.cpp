@@ -1,5 +1,6 @@
 #include <iostream>
 #include <cassert>
+#include <cstdint>
 #include <CGAL/QP_models.h>
 #include <CGAL/QP_functions.h>
 #include <CGAL/Gmpq.h>
@@ -18,6 +19,113 @@ using namespace std;
 using std::cin;
 using std::cout;
 
+// written by equations_parsing.write_sparse_matrix_file
+const std::string SPARSE_TEXT_HEADER = "%%blueark-sparse";
+const std::string SPARSE_MAGIC = "BLUEARKS";
+
+void set_relation(Program &lp, int constraint, int eq)
+{
+  // 0 is =, -1 is <= and 1 is >=, as in get_equality_type
+  if (eq == 0)
+  {
+    lp.set_r(constraint, CGAL::EQUAL);
+  }
+  else if (eq == 1)
+  {
+    lp.set_r(constraint, CGAL::LARGER);
+  }
+  else
+  {
+    lp.set_r(constraint, CGAL::SMALLER);
+  }
+}
+
+template <typename T>
+std::vector<T> read_array(std::ifstream &in_file, std::int64_t count)
+{
+  // the binary format is little endian, like the machines we run on
+  std::vector<T> values(count);
+  in_file.read(reinterpret_cast<char *>(values.data()), count * sizeof(T));
+  return values;
+}
+
+// binary: magic, uint32 version, int64 m, n, nnz, int8 eq[m],
+// double b[m], int32 row[nnz], int32 col[nnz], double value[nnz]
+int read_sparse_binary(std::ifstream &in_file, Program &lp, int n)
+{
+  char magic[8];
+  std::uint32_t version;
+  std::int64_t m, n_file, nnz;
+  in_file.read(magic, 8);
+  in_file.read(reinterpret_cast<char *>(&version), sizeof(version));
+  in_file.read(reinterpret_cast<char *>(&m), sizeof(m));
+  in_file.read(reinterpret_cast<char *>(&n_file), sizeof(n_file));
+  in_file.read(reinterpret_cast<char *>(&nnz), sizeof(nnz));
+  assert(n_file == n);
+
+  std::vector<std::int8_t> eqs = read_array<std::int8_t>(in_file, m);
+  std::vector<double> rhs = read_array<double>(in_file, m);
+  std::vector<std::int32_t> rows = read_array<std::int32_t>(in_file, nnz);
+  std::vector<std::int32_t> cols = read_array<std::int32_t>(in_file, nnz);
+  std::vector<double> values = read_array<double>(in_file, nnz);
+  assert(in_file);
+
+  for (std::int64_t constraint = 0; constraint < m; ++constraint)
+  {
+    lp.set_b(constraint, rhs[constraint]);
+    set_relation(lp, constraint, eqs[constraint]);
+  }
+  for (std::int64_t entry = 0; entry < nnz; ++entry)
+  {
+    lp.set_a(cols[entry], rows[entry], values[entry]);
+  }
+  return m;
+}
+
+// text: header line, "m n nnz", m lines "eq b", nnz lines "row col value"
+int read_sparse_text(std::ifstream &in_file, Program &lp, int n)
+{
+  std::string header;
+  int version, m, n_file, nnz, eq, row, col;
+  double a, b;
+  in_file >> header >> version >> m >> n_file >> nnz;
+  assert(n_file == n);
+
+  for (int constraint = 0; constraint < m; ++constraint)
+  {
+    in_file >> eq >> b;
+    lp.set_b(constraint, b);
+    set_relation(lp, constraint, eq);
+  }
+  for (int entry = 0; entry < nnz; ++entry)
+  {
+    in_file >> row >> col >> a;
+    lp.set_a(col, row, a);
+  }
+  return m;
+}
+
+// legacy dense format of write_matrix_file, m lines:
+// a[i][0] ... a[i][n-1] eq b[i]
+int read_dense(std::ifstream &in_file, Program &lp, int n, int m)
+{
+  double a, b, eq;
+  for (int constraint = 0; constraint < m; ++constraint)
+  {
+    for (int variable = 0; variable < n; ++variable)
+    {
+
+      in_file >> a;
+
+      lp.set_a(variable, constraint, a);
+    }
+    in_file >> eq >> b;
+    lp.set_b(constraint, b);
+    set_relation(lp, constraint, eq);
+  }
+  return m;
+}
+
 
 int main(int argc, char *argv[])
 {
@@ -31,7 +139,7 @@ int main(int argc, char *argv[])
   in_file >> n >> m;
   std::vector<std::string> names(n);
   Program lp(CGAL::SMALLER, true, 0, false, 0);
-  double a, b, c, eq;
+  double a, b, c;
 
   for (int var = 0; var < n; ++var)
   {
@@ -50,27 +158,26 @@ int main(int argc, char *argv[])
   }
 
   in_file.close();
-  // each of t)he following m lines is:
-  // a[i][0] ... a[i][n-1] <= b[i]
-  // where "<=" is an integer, 0 if equal
 
-  in_file.open(argv[2]);
-  for (int constraint = 0; constraint < m; ++constraint)
-  {
-    for (int variable = 0; variable < n; ++variable)
-    {
-
-      in_file >> a;
-
-      lp.set_a(variable, constraint, a);
-    }
-    in_file >> eq >> b;
-    lp.set_b(constraint, b);
+  in_file.open(argv[2], std::ifstream::in | std::ifstream::binary);
+  char start[8] = {0};
+  in_file.read(start, 8);
+  std::string prefix(start, in_file.gcount());
+  in_file.clear();
+  in_file.seekg(0);
 
-    if (eq == 1)
-    {
-      lp.set_r(constraint, CGAL::SMALLER);
-    }
+  if (prefix == SPARSE_MAGIC)
+  {
+    m = read_sparse_binary(in_file, lp, n);
+  }
+  else if (prefix.size() == 8 &&
+           SPARSE_TEXT_HEADER.compare(0, 8, prefix) == 0)
+  {
+    m = read_sparse_text(in_file, lp, n);
+  }
+  else
+  {
+    m = read_dense(in_file, lp, n, m);
   }
 
   in_file.close();
@@ -1,5 +1,9 @@
-import picos as pic
-import cvxopt as cvx
+"""Linear programs solved with picos and cvxopt.
+
+picos and cvxopt are only imported once a problem is created, such that the
+module can be imported, e.g. by the backend registry, without them.
+"""
+
 import numpy as np
 
 # min 0.5*x1 +  x2
@@ -35,6 +39,9 @@ class OptimizationProblem:
             P.set_objective(obj)
             P.solve()
         """
+        import picos as pic
+        import cvxopt as cvx
+
         self.__status = "unsolved"
         self.__value = None
         self.__variables = None
@@ -99,6 +106,8 @@ class OptimizationProblem:
                              % (num_equ, num_vars,
                                 len(rhs_vector), len(equality_vector)))
 
+        import picos as pic
+
         rhs_vector = pic.new_param('rhs_vec', rhs_vector)
         equality_vector = np.array(equality_vector)
 
@@ -137,9 +146,50 @@ class OptimizationProblem:
                 raise ValueError("Expected a real value, got %s",
                                  type(coeff_idx))
 
+        import cvxopt as cvx
         self.objective_function = cvx.matrix(coeff_indices)
 
 
+def solve_program(program, max_workers=None, executor=None):
+    """Solves a LinearProgram of the decomposition module with picos.
+
+    Rows relating by >= are negated, upper bounds, non negativity and fixed
+    variables are added as rows. `max_workers` and `executor` are ignored,
+    the program is solved at once.
+
+    Returns
+    -------
+    solution: a Solution with status 0 if picos found the optimum and 4
+              otherwise
+    """
+    from blueark.optmization.decomposition import Solution
+
+    n_vars = len(program.var_names)
+    eye = np.eye(n_vars)
+    bounded = np.flatnonzero(program.upper_bounds >= 0)
+    fixed = sorted(program.fixed)
+    signs = np.where(program.equ > 0, -1.0, 1.0)
+
+    matrix = np.vstack([program.matrix.toarray() * signs[:, np.newaxis],
+                        eye[bounded], -eye, eye[fixed]])
+    rhs_vector = np.concatenate([program.rhs * signs,
+                                 program.upper_bounds[bounded],
+                                 np.zeros(n_vars),
+                                 [program.fixed[var] for var in fixed]])
+    equality_vector = np.concatenate([np.where(program.equ == 0, 0, -1),
+                                      np.full(len(bounded) + n_vars, -1),
+                                      np.zeros(len(fixed), dtype=int)])
+
+    problem = OptimizationProblem(n_vars, matrix.tolist(),
+                                  rhs_vector.tolist(),
+                                  equality_vector.tolist(),
+                                  program.objective.tolist())
+    problem.solve()
+    values = np.array(problem.variables.value, dtype=float).ravel()
+    return Solution(program.var_names, values, float(problem.value),
+                    0 if problem.status == 'optimal' else 4, 1)
+
+
 """
 P = OptimizationProblem(2)
 A = [
@@ -0,0 +1,223 @@
+"""Capacity planning sweeps over the compiled structure of a network.
+
+A sweep computes the optimal power of a network on a grid of values of one
+or more capacities, the max throughput of pipes or the capacity of tanks.
+The linear program of the network and its independent blocks are built
+once. Every capacity is the upper bound of a single variable, such that a
+grid point only patches upper bounds and no constraint is generated, parsed
+or assembled again.
+
+Grid points are visited in a serpentine order, such that consecutive points
+differ in a single capacity by a single grid step, and start from the
+solution of the previous point. Blocks whose bounds did not change keep
+their solution. So do blocks whose changed bounds were not binding at the
+previous solution and still hold: an optimal dual solution vanishes on
+bounds that are not binding, hence it still certifies the optimality of the
+previous solution. Only the remaining blocks are solved again. The visiting
+order is split into contiguous chunks, which are swept concurrently.
+"""
+
+import itertools
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from blueark.model import spec as net_spec
+from blueark.model.compiler import PARAMETER_KINDS
+from blueark.optmization.decomposition import (find_components,
+                                               linear_program, solve_block,
+                                               sub_program)
+
+# entity types whose parameter is a capacity
+CAPACITY_TYPES = (net_spec.PIPE, net_spec.TANK)
+
+POWER_COLUMN = 'power'
+STATUS_COLUMN = 'status'
+SOLVED_COLUMN = 'solved_blocks'
+
+# every chunk starts without previous solution, a few per worker balance
+CHUNKS_PER_WORKER = 4
+# relative distance below which a variable sits at its bound
+BOUND_TOLERANCE = 1e-9
+
+Axis = namedtuple('Axis', ['name', 'var', 'values'])
+Axis.__doc__ = """A swept capacity: the name of its column, the index of the
+variable it bounds and its values on the grid."""
+
+
+def capacity_axis(compiled, program, entity, values):
+    """Returns the Axis of the capacity of a pipe or tank.
+
+    :param compiled: the CompiledNetwork `program` was built from
+    :param program: LinearProgram of the network
+    :param entity: entity, entity id or entity index
+    :param values: capacities to sweep
+    """
+    idx = compiled.entity_index(entity)
+    entity_type = net_spec.ENTITY_TYPES[type(compiled.entities[idx])]
+    symbol = compiled.entities[idx].my_symbol.get_symbol()
+    if entity_type not in CAPACITY_TYPES:
+        raise ValueError('Entity {} is a {}, only the capacities of pipes '
+                         'and tanks can be swept'.format(symbol, entity_type))
+
+    kind = PARAMETER_KINDS[entity_type]
+    for row in compiled.blocks[idx]:
+        if row.kind == kind:
+            break
+    else:
+        raise ValueError('Entity {} has no {} constraint'.format(symbol,
+                                                                 kind))
+    # parameter rows are `c * x_i <= c * value`, bounding x_i by the value
+    names = {index: name for name, index in compiled.ids.items()}
+    return Axis(names.get(idx, symbol), program.var_names.index(row.names[0]),
+                np.asarray(values, dtype=float))
+
+
+def _keeps_solution(values, changes):
+    """Whether a block solution stays optimal once the upper bounds of some
+    of its variables change.
+
+    :param changes: list of (variable, old bound, new bound), negative
+        bounds mean unbounded
+    """
+    for var, old, new in changes:
+        if old >= 0 and \
+                values[var] >= old - BOUND_TOLERANCE * max(1.0, abs(old)):
+            return False
+        if new >= 0 and \
+                values[var] > new + BOUND_TOLERANCE * max(1.0, abs(new)):
+            return False
+    return True
+
+
+def serpentine_order(shape):
+    """Flat indices of the points of a grid in the order of a reflected
+    Gray code, consecutive points differ in one axis by one step."""
+    digits = np.indices(shape).reshape(len(shape), -1)
+    reflected = np.empty_like(digits)
+    # an axis runs backwards whenever the axes before it stand at an odd
+    # sum of positions
+    before = np.zeros(digits.shape[1], dtype=np.int64)
+    for axis, size in enumerate(shape):
+        reflected[axis] = np.where(before % 2 == 1, size - 1 - digits[axis],
+                                   digits[axis])
+        before += reflected[axis]
+    return np.ravel_multi_index(tuple(reflected), shape)
+
+
+def sweep_points(program, components, variables, points):
+    """Solves consecutive grid points, each starting from the solution of
+    the previous one.
+
+    Arguments
+    ---------
+    program: LinearProgram of the network
+    components: its blocks, see `decomposition.find_components`
+    variables: index of the variable bounded by every axis
+    points: (n_points x n_axes) array of the values of the axes
+
+    Returns
+    -------
+    powers, statuses, solved: power, status and number of blocks solved of
+                              every point
+    """
+    block_of = np.full(len(program.var_names), -1, dtype=np.int64)
+    for block, (_, block_vars) in enumerate(components):
+        block_of[block_vars] = block
+
+    upper_bounds = program.upper_bounds.copy()
+    program = program._replace(upper_bounds=upper_bounds)
+    values = np.zeros(len(program.var_names))
+    for var, value in program.fixed.items():
+        values[var] = value
+    statuses = [None] * len(components)
+
+    powers = np.empty(len(points))
+    point_statuses = np.empty(len(points), dtype=np.int64)
+    solved = np.empty(len(points), dtype=np.int64)
+    for point_idx, point in enumerate(points):
+        changes = {}
+        for var, new in zip(variables, point):
+            if upper_bounds[var] != new:
+                changes.setdefault(block_of[var], []).append(
+                    (var, upper_bounds[var], new))
+        upper_bounds[variables] = point
+
+        n_solved = 0
+        for block, (rows, block_vars) in enumerate(components):
+            if statuses[block] is not None and (
+                    block not in changes or statuses[block] == 0 and
+                    _keeps_solution(values, changes[block])):
+                continue
+            statuses[block], values[block_vars] = solve_block(
+                sub_program(program, rows, block_vars))
+            n_solved += 1
+
+        powers[point_idx] = np.dot(program.objective, values)
+        point_statuses[point_idx] = next(
+            (status for status in statuses if status != 0), 0)
+        solved[point_idx] = n_solved
+    return powers, point_statuses, solved
+
+
+def sweep_capacities(compiled, axes, demands=None, max_workers=None):
+    """Optimal power of a network on the grid of some capacities.
+
+    Arguments
+    ---------
+    compiled: a CompiledNetwork, e.g. of `load_network`, only its demands
+              are changed
+    axes: list of (entity, values) pairs, the entities being pipes or tanks
+          given as entity, entity id or entity index. The grid is the
+          cartesian product of the values.
+    demands: optional demand of every consumer, ordered by symbol, defaults
+             to the current demands of the network
+    max_workers: number of worker processes, defaults to the cpu count. With
+                 a single worker nothing is forked.
+
+    Returns
+    -------
+    table: OrderedDict of column name, array pairs with a row per grid
+           point, the last axis varying fastest: the value of every axis in
+           a column named by the entity id, or symbol without id, the
+           `power`, the linprog `status` of the first failing block, 0 if
+           all were solved to optimality, and the number of blocks solved
+           for the point, `solved_blocks`
+    """
+    if demands is not None:
+        compiled.set_consumer_usage(*demands)
+    program = linear_program(compiled)
+    components = find_components(program)
+    axes = [capacity_axis(compiled, program, entity, values)
+            for entity, values in axes]
+    variables = [axis.var for axis in axes]
+    if len(set(variables)) != len(variables):
+        raise ValueError('Every capacity can only be swept once')
+
+    points = np.array(list(itertools.product(*(axis.values
+                                               for axis in axes))),
+                      dtype=float).reshape(-1, len(axes))
+    order = serpentine_order([len(axis.values) for axis in axes])
+    n_workers = max_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        results = [sweep_points(program, components, variables,
+                                points[order])]
+    else:
+        chunks = [chunk for chunk in np.array_split(
+            points[order], CHUNKS_PER_WORKER * n_workers) if len(chunk)]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(
+                sweep_points, [program] * len(chunks),
+                [components] * len(chunks), [variables] * len(chunks),
+                chunks))
+
+    table = OrderedDict((axis.name, points[:, idx])
+                        for idx, axis in enumerate(axes))
+    for column, part in ((POWER_COLUMN, 0), (STATUS_COLUMN, 1),
+                         (SOLVED_COLUMN, 2)):
+        visited = np.concatenate([result[part] for result in results])
+        table[column] = np.empty_like(visited)
+        table[column][order] = visited
+    return table
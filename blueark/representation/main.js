@@ -120,7 +120,73 @@ function get_data(path, chart) {
         .then(m => add_data_point(chart, 0, labels, matrix));
 }
 
-get_data('./data/fake_power.txt', powerchart);
-get_data('./data/fake_pipes.txt', pipeschart);
-get_data('./data/fake_tanks.txt', tankschart);
-get_data('./data/fake_consumers.txt', consumerschart);
+function ensure_datasets(chart, cols, template) {
+    var m = chart.data.datasets.length;
+
+    while (m < cols) {
+        chart.data.datasets.push({
+            backgroundColor: backgroundcolors[m % 6],
+            borderColor: bordercolors[m % 6],
+            label: template + m,
+            data: [],
+            borderWidth: 1
+        });
+        m++;
+    }
+}
+
+function append_rows(chart, steps, template, get_row) {
+    if (steps.length == 0) { return; }
+    ensure_datasets(chart, get_row(steps[0]).length, template);
+
+    // steps rewritten by a resumed run replace the ones shown
+    chart.steps = chart.steps || [];
+    var first = chart.steps.findIndex(step => step >= steps[0].step);
+    if (first >= 0) {
+        chart.steps.splice(first);
+        chart.data.labels.splice(first);
+        for (var k = 0; k < chart.data.datasets.length; k++) {
+            chart.data.datasets[k].data.splice(first);
+        }
+    }
+
+    for (var i = 0; i < steps.length; i++) {
+        var row = get_row(steps[i]);
+        chart.steps.push(steps[i].step);
+        chart.data.labels.push("Step " + steps[i].step);
+        for (var j = 0; j < row.length; j++) {
+            chart.data.datasets[j].data.push(row[j]);
+        }
+    }
+}
+
+// Live mode: the page is served by blueark/representation/server.py, which
+// pushes only the newly written steps of a running simulation.
+function stream_run() {
+    var source = new EventSource('/events');
+
+    source.addEventListener('steps', function (event) {
+        var steps = JSON.parse(event.data);
+        append_rows(powerchart, steps, 'Power ', s => [s.objective]);
+        append_rows(consumerschart, steps, 'Consumer ', s => s.consumptions);
+        append_rows(pipeschart, steps, 'Variable ', s => s.variables);
+        // redraw once per batch instead of once per step
+        powerchart.update();
+        consumerschart.update();
+        pipeschart.update();
+    });
+
+    source.addEventListener('gap', function (event) {
+        console.warn('dashboard fell behind, skipped',
+                     JSON.parse(event.data).dropped, 'steps');
+    });
+}
+
+if (window.location.protocol.startsWith('http') && window.EventSource) {
+    stream_run();
+} else {
+    get_data('./data/fake_power.txt', powerchart);
+    get_data('./data/fake_pipes.txt', pipeschart);
+    get_data('./data/fake_tanks.txt', tankschart);
+    get_data('./data/fake_consumers.txt', consumerschart);
+}
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""Local dashboard server streaming the results of a running simulation.
+
+The server serves the dashboard page and pushes newly written steps of a run
+to every connected page as server-sent events. A single poller follows the
+result files of the run, new steps are batched and fanned out to all clients.
+Each client has a bounded buffer of pending steps, a slow client therefore
+only ever holds `max_pending` steps and is told how many it missed instead of
+stalling the other clients or growing memory without bound.
+
+Usage: python -m blueark.representation.server RUN_DIR [--port 8000]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import mimetypes
+import os
+from collections import deque
+
+from blueark.simulation.stream import ResultTailer
+
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+EVENTS_PATH = '/events'
+
+
+class _Client:
+    """Pending steps of a single connected page."""
+
+    def __init__(self, max_pending):
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+
+    def push(self, steps):
+        overflow = len(self.pending) + len(steps) - self.pending.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self.pending.extend(steps)
+        self.wakeup.set()
+
+
+class DashboardServer:
+    """Serves the dashboard and streams the steps of a run.
+
+    Arguments
+    ---------
+    run_dir_path: run directory of the simulation to follow
+    poll_interval: seconds between two reads of the result files
+    max_batch: maximal number of steps sent in a single event
+    max_pending: maximal number of steps buffered per client
+    history: number of recent steps sent to a page when it connects
+    """
+
+    def __init__(self, run_dir_path, poll_interval=0.5, max_batch=500,
+                 max_pending=10000, history=1000):
+        self.tailer = ResultTailer(run_dir_path)
+        self.poll_interval = poll_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.history = deque(maxlen=history)
+        self.clients = set()
+
+    async def poll(self):
+        """Follows the result files and distributes new steps."""
+        loop = asyncio.get_event_loop()
+        while True:
+            # a long backlog of a running simulation takes a while to parse,
+            # the clients are served meanwhile
+            steps = await loop.run_in_executor(None,
+                                               self.tailer.read_new_steps)
+            if steps:
+                # steps of a resumed run replace the ones after its
+                # checkpoint
+                while self.history and \
+                        self.history[-1]['step'] >= steps[0]['step']:
+                    self.history.pop()
+                self.history.extend(steps)
+                for client in self.clients:
+                    client.push(steps)
+            await asyncio.sleep(self.poll_interval)
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # skip the request headers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await _respond(writer, 405, b'method not allowed')
+                return
+
+            path = parts[1].split('?')[0]
+            if path == EVENTS_PATH:
+                await self.stream(writer)
+            else:
+                await self.serve_static(writer, path)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_static(self, writer, path):
+        if path == '/':
+            path = '/index.html'
+        file_path = os.path.normpath(os.path.join(STATIC_DIR,
+                                                  path.lstrip('/')))
+        # a prefix check would accept sibling directories of STATIC_DIR
+        if os.path.commonpath([file_path, STATIC_DIR]) != STATIC_DIR or \
+                not os.path.isfile(file_path):
+            await _respond(writer, 404, b'not found')
+            return
+
+        with open(file_path, 'rb') as infile:
+            body = infile.read()
+        content_type = mimetypes.guess_type(file_path)[0] or \
+            'application/octet-stream'
+        await _respond(writer, 200, body, content_type)
+
+    async def stream(self, writer):
+        """Sends the recent history, then all new steps as they arrive."""
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Connection: keep-alive\r\n\r\n')
+        await writer.drain()
+
+        client = _Client(self.max_pending)
+        client.push(list(self.history))
+        self.clients.add(client)
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+
+                if client.dropped:
+                    await _send_event(writer, 'gap',
+                                      {'dropped': client.dropped})
+                    client.dropped = 0
+
+                while client.pending:
+                    batch = [client.pending.popleft() for _ in range(
+                        min(self.max_batch, len(client.pending)))]
+                    # waits for the socket, slow clients buffer in `pending`
+                    await _send_event(writer, 'steps', batch)
+        finally:
+            self.clients.discard(client)
+
+
+def _finite(payload):
+    """Replaces nan and infinite values by None, which JSON.parse reads as
+    null, e.g. the objective and variables of skipped steps."""
+    if isinstance(payload, float):
+        return payload if math.isfinite(payload) else None
+    if isinstance(payload, dict):
+        return {key: _finite(value) for key, value in payload.items()}
+    if isinstance(payload, (list, tuple)):
+        return [_finite(value) for value in payload]
+    return payload
+
+
+async def _send_event(writer, event, payload):
+    writer.write('event: {}\ndata: {}\n\n'.format(
+        event, json.dumps(_finite(payload), allow_nan=False)).encode('utf-8'))
+    await writer.drain()
+
+
+async def _respond(writer, status, body, content_type='text/plain'):
+    reasons = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed'}
+    writer.write('HTTP/1.1 {} {}\r\nContent-Type: {}\r\n'
+                 'Content-Length: {}\r\nConnection: close\r\n\r\n'.format(
+                     status, reasons[status], content_type,
+                     len(body)).encode('latin-1') + body)
+    await writer.drain()
+
+
+async def serve(server, host='127.0.0.1', port=8000):
+    """Runs the dashboard server until cancelled."""
+    tcp_server = await asyncio.start_server(server.handle, host, port)
+    poller = asyncio.ensure_future(server.poll())
+    print('Serving dashboard on http://{}:{}/'.format(host, port))
+    try:
+        # the poller never returns, connections are accepted meanwhile
+        await poller
+    finally:
+        poller.cancel()
+        tcp_server.close()
+        await tcp_server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streams the results of a '
+                                                 'simulation run.')
+    parser.add_argument('run_dir', help='run directory to follow')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    # asyncio.run needs Python 3.7
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = DashboardServer(args.run_dir, poll_interval=args.poll_interval)
+    try:
+        loop.run_until_complete(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
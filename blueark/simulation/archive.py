@@ -0,0 +1,250 @@
+"""Compressed archive of simulation results with random access by step.
+
+Most variables barely change from one step to the next: saturated pipes
+stay at their capacity and demands follow a smooth walk. Rows are therefore
+stored as the XOR of their float64 bit patterns with the previous row, such
+that unchanged values become zero and values that changed a little share
+their sign, exponent and leading mantissa bits with the previous value. The
+deltas of a chunk of steps are laid out column after column and byte by
+byte, which turns unchanged values into long runs of zero bytes, and are
+compressed with zlib or lzma.
+
+Every chunk starts from a zero row, so it decodes on its own: a query of a
+step range only decompresses the chunks overlapping it. The file is a
+header followed by the chunks, every chunk with the number of steps and the
+size of its payload in front, such that the chunk index is rebuilt by
+hopping over the chunk headers and a file cut off while a chunk was written
+is read up to its last complete chunk.
+"""
+
+import json
+import lzma
+import os
+import struct
+import zlib
+
+import numpy as np
+
+ARCHIVE_FILE_NAME = 'results.arc'
+ARCHIVE_MAGIC = b'BLUEARC1'
+# magic, length of the json meta data
+ARCHIVE_HEADER = struct.Struct('<8sI')
+# number of steps, size of the compressed payload
+CHUNK_HEADER = struct.Struct('<II')
+
+ZLIB = 'zlib'
+LZMA = 'lzma'
+CODECS = {ZLIB: (lambda data: zlib.compress(data, 6), zlib.decompress),
+          LZMA: (lzma.compress, lzma.decompress)}
+
+DEFAULT_CHUNK_STEPS = 1024
+
+
+def encode_chunk(rows, codec=ZLIB):
+    """Compresses a (n_steps x n_cols) float64 array, see the module
+    documentation."""
+    bits = np.ascontiguousarray(rows, dtype='<f8').view('<u8')
+    deltas = bits.copy()
+    deltas[1:] ^= bits[:-1]
+    shuffled = deltas.T.copy().view(np.uint8).reshape(-1, 8).T
+    return CODECS[codec][0](shuffled.tobytes())
+
+
+def decode_chunk(payload, n_steps, n_cols, codec=ZLIB):
+    """Inverse of `encode_chunk`."""
+    shuffled = np.frombuffer(CODECS[codec][1](payload), dtype=np.uint8)
+    deltas = shuffled.reshape(8, -1).T.copy().view('<u8')
+    deltas = deltas.reshape(n_cols, n_steps)
+    return np.bitwise_xor.accumulate(deltas, axis=1).T.view('<f8')
+
+
+class ArchiveWriter:
+    """Appends steps to an archive, see the module documentation.
+
+    Arguments
+    ---------
+    file_path: path of the archive, an existing file is replaced
+    names: names of the columns, e.g. the variable names of a run
+    chunk_steps: number of steps compressed together
+    codec: `ZLIB` or `LZMA`, lzma compresses better and slower
+    """
+
+    def __init__(self, file_path, names, chunk_steps=DEFAULT_CHUNK_STEPS,
+                 codec=ZLIB):
+        if codec not in CODECS:
+            raise ValueError('Unknown codec %r, expected one of %s'
+                             % (codec, ', '.join(CODECS)))
+        self.file_path = file_path
+        self.names = list(names)
+        self.chunk_steps = chunk_steps
+        self.codec = codec
+        self.n_steps = 0
+        self._pending = []
+
+        meta = json.dumps({'names': self.names, 'chunk_steps': chunk_steps,
+                           'codec': codec}).encode()
+        with open(file_path, 'wb') as outfile:
+            outfile.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, len(meta)))
+            outfile.write(meta)
+
+    @classmethod
+    def resume(cls, file_path, n_steps):
+        """Reopens an archive, dropping everything after the first `n_steps`
+        steps, e.g. to continue a simulation from a checkpoint."""
+        archive = Archive(file_path)
+        if n_steps > archive.n_steps:
+            raise ValueError('{} only holds {} steps'
+                             .format(file_path, archive.n_steps))
+        writer = cls.__new__(cls)
+        writer.file_path = file_path
+        writer.names = archive.names
+        writer.chunk_steps = archive.chunk_steps
+        writer.codec = archive.codec
+
+        # the chunk holding step n_steps is decoded into the pending rows
+        chunk = np.searchsorted(archive.starts, n_steps, side='right') - 1
+        chunk_start = archive.starts[chunk] if len(archive.starts) else 0
+        writer._pending = list(archive.read(chunk_start, n_steps))
+        writer.n_steps = n_steps
+        offset = archive.offsets[chunk] if len(archive.offsets) else \
+            archive.data_offset
+        with open(file_path, 'r+b') as outfile:
+            outfile.truncate(offset)
+        return writer
+
+    def append(self, row):
+        """Appends the values of a single step."""
+        self.append_rows(np.asarray(row, dtype=np.float64)[np.newaxis, :])
+
+    def append_rows(self, rows):
+        """Appends the values of many steps, one row per step. Full chunks
+        are written right away."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != len(self.names):
+            raise ValueError('Expected rows with {} columns, got shape {}'
+                             .format(len(self.names), rows.shape))
+        self._pending.extend(rows)
+        self.n_steps += len(rows)
+        if len(self._pending) >= self.chunk_steps:
+            n_full = len(self._pending) // self.chunk_steps * \
+                self.chunk_steps
+            self._write(self._pending[:n_full])
+            self._pending = self._pending[n_full:]
+
+    def flush(self):
+        """Writes the pending steps as a chunk of their own, such that every
+        step appended so far is on disk."""
+        if self._pending:
+            self._write(self._pending)
+            self._pending = []
+
+    def _write(self, rows):
+        rows = np.array(rows, dtype=np.float64).reshape(-1, len(self.names))
+        with open(self.file_path, 'ab') as outfile:
+            for start in range(0, len(rows), self.chunk_steps):
+                chunk = rows[start:start + self.chunk_steps]
+                payload = encode_chunk(chunk, self.codec)
+                outfile.write(CHUNK_HEADER.pack(len(chunk), len(payload)))
+                outfile.write(payload)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Archive:
+    """Read access to an archive written by an ArchiveWriter."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, 'rb') as infile:
+            magic, meta_size = ARCHIVE_HEADER.unpack(
+                infile.read(ARCHIVE_HEADER.size))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError('{} is not a result archive'
+                                 .format(file_path))
+            meta = json.loads(infile.read(meta_size).decode())
+            self.data_offset = infile.tell()
+            starts, offsets, counts, sizes = self._scan(infile)
+        self.names = meta['names']
+        self.chunk_steps = meta['chunk_steps']
+        self.codec = meta['codec']
+        self.starts = np.array(starts, dtype=np.int64)
+        self.offsets = offsets
+        self.counts = counts
+        self.sizes = sizes
+        self.n_steps = int(sum(counts))
+        self._cached = (None, None)
+
+    def _scan(self, infile):
+        """Chunk index from the chunk headers, a chunk cut off at the end of
+        the file is ignored."""
+        file_size = os.fstat(infile.fileno()).st_size
+        starts, offsets, counts, sizes = [], [], [], []
+        offset, step = self.data_offset, 0
+        while offset + CHUNK_HEADER.size <= file_size:
+            infile.seek(offset)
+            count, size = CHUNK_HEADER.unpack(infile.read(CHUNK_HEADER.size))
+            if offset + CHUNK_HEADER.size + size > file_size:
+                break
+            starts.append(step)
+            offsets.append(offset)
+            counts.append(count)
+            sizes.append(size)
+            offset += CHUNK_HEADER.size + size
+            step += count
+        return starts, offsets, counts, sizes
+
+    def _chunk(self, infile, chunk):
+        """Decoded rows of a chunk, the last decoded chunk is kept."""
+        if self._cached[0] != chunk:
+            infile.seek(self.offsets[chunk] + CHUNK_HEADER.size)
+            rows = decode_chunk(infile.read(self.sizes[chunk]),
+                                self.counts[chunk], len(self.names),
+                                self.codec)
+            self._cached = (chunk, rows)
+        return self._cached[1]
+
+    def read(self, start=0, stop=None, columns=None):
+        """Returns the values of steps [start, stop).
+
+        Arguments
+        ---------
+        start, stop: step range, `stop` defaults to the last step
+        columns: optional list of column names, defaults to all columns
+
+        Returns
+        -------
+        values: (n_steps x n_columns) array
+        """
+        stop = self.n_steps if stop is None else min(stop, self.n_steps)
+        start = max(start, 0)
+        col_idx = slice(None) if columns is None else \
+            [self.names.index(name) for name in columns]
+        n_cols = len(self.names) if columns is None else len(columns)
+        if start >= stop:
+            return np.empty((0, n_cols))
+
+        first = np.searchsorted(self.starts, start, side='right') - 1
+        last = np.searchsorted(self.starts, stop, side='left')
+        parts = []
+        with open(self.file_path, 'rb') as infile:
+            for chunk in range(first, last):
+                chunk_start = self.starts[chunk]
+                rows = self._chunk(infile, chunk)
+                parts.append(rows[max(start - chunk_start, 0):
+                                  stop - chunk_start, col_idx])
+        return np.concatenate(parts)
+
+
+def build_archive(values, file_path, names, chunk_steps=DEFAULT_CHUNK_STEPS,
+                  codec=ZLIB):
+    """Archives a full (n_steps x n_cols) result matrix."""
+    with ArchiveWriter(file_path, names, chunk_steps, codec) as writer:
+        writer.append_rows(values)
+    return writer
@@ -0,0 +1,94 @@
+"""Checkpoints of long simulation runs.
+
+A checkpoint records the next step to run, the state of the numpy random
+number generator and the sizes of the output files. Resuming a run
+truncates the output files to these sizes, such that steps written after the
+last checkpoint are simply recomputed.
+"""
+
+import os
+import pickle
+
+CHECKPOINT_FILE_NAME = 'checkpoint.pkl'
+INPUT_FILE_NAME = 'simulation_input.pkl'
+
+
+class Checkpoint:
+    def __init__(self, step, rng_state, file_offsets):
+        """Position of a simulation run.
+
+        :param step: index of the next step to run
+        :param rng_state: state as returned by `np.random.get_state`
+        :param file_offsets: dict of output file name, size in bytes pairs
+        """
+        self.step = step
+        self.rng_state = rng_state
+        self.file_offsets = file_offsets
+
+
+def get_file_offsets(run_dir_path, file_names):
+    """Returns the current size of every output file of a run."""
+    return {name: os.path.getsize(os.path.join(run_dir_path, name))
+            for name in file_names}
+
+
+def sync_outputs(run_dir_path, file_names):
+    """Forces the output files of a run to disk, such that a checkpoint never
+    records offsets beyond what survives a crash of the machine."""
+    for name in file_names:
+        with open(os.path.join(run_dir_path, name), 'ab') as outfile:
+            os.fsync(outfile.fileno())
+
+
+def truncate_outputs(run_dir_path, file_offsets):
+    """Drops everything written to the output files after the offsets."""
+    for name, offset in file_offsets.items():
+        with open(os.path.join(run_dir_path, name), 'r+b') as outfile:
+            outfile.truncate(offset)
+
+
+def save_checkpoint(run_dir_path, checkpoint):
+    """Atomically replaces the checkpoint of a run."""
+    _atomic_dump(os.path.join(run_dir_path, CHECKPOINT_FILE_NAME), checkpoint)
+
+
+def load_checkpoint(run_dir_path):
+    """Returns the last checkpoint of a run or None if there is none."""
+    path = os.path.join(run_dir_path, CHECKPOINT_FILE_NAME)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as infile:
+        return pickle.load(infile)
+
+
+def save_inputs(run_dir_path, consumer_data, n_steps, checkpoint_interval,
+                network_path=None, options=None):
+    """Stores the inputs of a run, which are needed to resume it.
+
+    :param options: dict of the other keyword arguments of the Simulator
+        the run is resumed with, e.g. how steps are solved
+    """
+    _atomic_dump(os.path.join(run_dir_path, INPUT_FILE_NAME),
+                 {'consumer_data': consumer_data, 'n_steps': n_steps,
+                  'checkpoint_interval': checkpoint_interval,
+                  'network_path': network_path,
+                  'options': dict(options or {})})
+
+
+def load_inputs(run_dir_path):
+    """Returns the consumer data, number of steps, checkpoint interval,
+    network file and options of a run."""
+    with open(os.path.join(run_dir_path, INPUT_FILE_NAME), 'rb') as infile:
+        inputs = pickle.load(infile)
+    return (inputs['consumer_data'], inputs['n_steps'],
+            inputs['checkpoint_interval'], inputs.get('network_path'),
+            inputs.get('options', {}))
+
+
+def _atomic_dump(path, obj):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        pickle.dump(obj, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(tmp_path, path)
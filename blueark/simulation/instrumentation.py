@@ -0,0 +1,245 @@
+"""Per phase timing of the simulation loop.
+
+A `PhaseTimer` measures the wall and cpu time of every phase of every step.
+Totals and log2 histograms are kept per phase, the per step trace is stored
+in compact typed arrays. Hooks derived from `TimingHook` are notified when
+steps and phases start and finish.
+
+When instrumentation is off the simulator uses a `NullTimer`, whose context
+managers do nothing, such that the loop pays a single method call per phase.
+"""
+
+import csv
+import json
+import os
+import time
+from array import array
+
+FEASIBILITY = 'feasibility'
+CONSTRAINTS = 'constraints'
+PARSING = 'parsing'
+MATRIX = 'matrix'
+WRITE = 'write'
+SOLVE = 'solve'
+FALLBACK = 'fallback'
+OUTPUT = 'output'
+
+PHASES = (FEASIBILITY, CONSTRAINTS, PARSING, MATRIX, WRITE, SOLVE,
+          FALLBACK, OUTPUT)
+
+SUMMARY_FILE_NAME = 'timing_summary.json'
+TRACE_FILE_NAME = 'timing_trace.csv'
+
+# histogram bucket i counts durations in [2**(i-1), 2**i) microseconds
+N_BUCKETS = 40
+
+
+class TimingHook:
+    """Base class of timing hooks, every method is a no-op by default."""
+
+    def step_started(self, step):
+        pass
+
+    def phase_started(self, step, phase):
+        pass
+
+    def phase_finished(self, step, phase, wall, cpu):
+        pass
+
+    def step_finished(self, step, wall, cpu):
+        pass
+
+    def run_finished(self, run_dir_path):
+        """Called once the timings are exported into the run directory."""
+        pass
+
+
+class _PhaseStats:
+    __slots__ = ('count', 'wall', 'cpu', 'min_wall', 'max_wall', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.min_wall = float('inf')
+        self.max_wall = 0.0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, wall, cpu):
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.min_wall = min(self.min_wall, wall)
+        self.max_wall = max(self.max_wall, wall)
+        bucket = int(wall * 1e6).bit_length()
+        self.buckets[min(bucket, N_BUCKETS - 1)] += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the `fraction` quantile."""
+        threshold = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= threshold:
+                return min(2 ** bucket * 1e-6, self.max_wall)
+        return self.max_wall
+
+    def as_dict(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count,
+                'wall_total': self.wall,
+                'cpu_total': self.cpu,
+                'wall_mean': self.wall / self.count,
+                'cpu_mean': self.cpu / self.count,
+                'wall_min': self.min_wall,
+                'wall_max': self.max_wall,
+                'wall_p50': self.quantile(0.5),
+                'wall_p90': self.quantile(0.9),
+                'wall_p99': self.quantile(0.99),
+                'histogram_us_log2': self.buckets}
+
+
+class _Timed:
+    """Context manager timing a single step or phase."""
+    __slots__ = ('timer', 'step', 'phase', 'wall', 'cpu')
+
+    def __init__(self, timer, step, phase):
+        self.timer = timer
+        self.step = step
+        self.phase = phase
+
+    def __enter__(self):
+        self.timer._started(self.step, self.phase)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        self.timer._finished(self.step, self.phase, wall, cpu)
+        return False
+
+
+class PhaseTimer:
+    """Collects per phase timings of the simulation loop.
+
+    Arguments
+    ---------
+    hooks: iterable of TimingHook instances to notify
+    keep_trace: whether to keep the per step timings for the trace export
+    """
+
+    def __init__(self, hooks=(), keep_trace=True):
+        self.hooks = list(hooks)
+        self.keep_trace = keep_trace
+        self.current_step = None
+        self.stats = {}
+        self.step_stats = _PhaseStats()
+        self._phase_ids = {}
+        self._trace_step = array('q')
+        self._trace_phase = array('B')
+        self._trace_wall = array('d')
+        self._trace_cpu = array('d')
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def step(self, step):
+        """Context manager timing a whole step."""
+        return _Timed(self, step, None)
+
+    def phase(self, name):
+        """Context manager timing a phase of the current step."""
+        return _Timed(self, self.current_step, name)
+
+    def _started(self, step, phase):
+        if phase is None:
+            self.current_step = step
+            for hook in self.hooks:
+                hook.step_started(step)
+        else:
+            for hook in self.hooks:
+                hook.phase_started(step, phase)
+
+    def _finished(self, step, phase, wall, cpu):
+        if phase is None:
+            self.step_stats.add(wall, cpu)
+            for hook in self.hooks:
+                hook.step_finished(step, wall, cpu)
+            return
+
+        if phase not in self.stats:
+            self.stats[phase] = _PhaseStats()
+            self._phase_ids[phase] = len(self._phase_ids)
+        self.stats[phase].add(wall, cpu)
+
+        if self.keep_trace:
+            self._trace_step.append(step if step is not None else -1)
+            self._trace_phase.append(self._phase_ids[phase])
+            self._trace_wall.append(wall)
+            self._trace_cpu.append(cpu)
+
+        for hook in self.hooks:
+            hook.phase_finished(step, phase, wall, cpu)
+
+    def summary(self):
+        """Returns a dict of per phase statistics plus whole step ones."""
+        summary = {phase: stats.as_dict()
+                   for phase, stats in self.stats.items()}
+        summary['step'] = self.step_stats.as_dict()
+        return summary
+
+    def export(self, run_dir_path):
+        """Writes the summary as json and the per step trace as csv."""
+        with open(os.path.join(run_dir_path, SUMMARY_FILE_NAME), 'w') as out:
+            json.dump(self.summary(), out, indent=2)
+
+        for hook in self.hooks:
+            hook.run_finished(run_dir_path)
+
+        if not self.keep_trace:
+            return
+
+        names = {idx: phase for phase, idx in self._phase_ids.items()}
+        with open(os.path.join(run_dir_path, TRACE_FILE_NAME), 'w',
+                  newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['step', 'phase', 'wall', 'cpu'])
+            for row in zip(self._trace_step, self._trace_phase,
+                           self._trace_wall, self._trace_cpu):
+                writer.writerow((row[0], names[row[1]], row[2], row[3]))
+
+
+class _NullContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class NullTimer:
+    """Timer used when instrumentation is off, records nothing."""
+    hooks = ()
+
+    def step(self, step):
+        return _NULL_CONTEXT
+
+    def phase(self, name):
+        return _NULL_CONTEXT
+
+    def add_hook(self, hook):
+        raise ValueError('Instrumentation is disabled, cannot add hooks')
+
+    def summary(self):
+        return {}
+
+    def export(self, run_dir_path):
+        pass
@@ -1,8 +1,280 @@
+import json
+import os
+import warnings
+from collections import namedtuple
+
 import numpy as np
 
+from blueark.equations_parsing import (SPARSE_BINARY_HEADER, SPARSE_MAGIC,
+                                       SPARSE_TEXT_HEADER)
+
+# names of the columns of the text outputs of a run, keyed by file name
+COLUMNS_FILE_NAME = 'columns.json'
+# binary copies of parsed text outputs, keyed on their size and mtime
+LOADER_CACHE_DIR_NAME = '.loader_cache'
+
+CHUNK_BYTES = 1 << 24
+NEWLINE = ord('\n')
+
+Table = namedtuple('Table', ['names', 'values'])
+Table.__doc__ = """Columns of a result file: their names, None if they are
+unknown, and a (n_rows x n_cols) float64 array, possibly memory mapped."""
+
+
+def _chunks(infile, chunk_bytes):
+    """Yields the content of a file in chunks of whole lines."""
+    rest = b''
+    while True:
+        data = infile.read(chunk_bytes)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b'\n') + 1
+        rest = data[cut:]
+        if cut:
+            yield data[:cut]
+    if rest.strip():
+        yield rest + b'\n'
+
+
+def _line_bounds(chunk):
+    """Start and end offsets of the non empty lines of a chunk, such as the
+    blank first line written by `init_data_files`."""
+    ends = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == NEWLINE)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def _parse_rows(text, n_rows, n_cols, data_path):
+    with warnings.catch_warnings():
+        # older numpy versions only warn about unparsable data
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            raise ValueError('{} holds values that are no numbers'
+                             .format(data_path))
+    if len(values) != n_rows * n_cols:
+        raise ValueError('{} holds rows of different lengths'
+                         .format(data_path))
+    return values.reshape(n_rows, n_cols)
+
+
+def read_table(data_path, usecols=None, start=0, stop=None,
+               chunk_bytes=CHUNK_BYTES):
+    """Reads a whitespace separated text file of numbers in chunks, blank
+    lines are skipped.
+
+    Only the rows of the range are parsed and the reading stops at its
+    end, only the selected columns of every chunk are kept.
+
+    Arguments
+    ---------
+    data_path: path of the text file, e.g. the var_output.dat of a run
+    usecols: optional list of the indices of the columns to keep
+    start, stop: range of the rows to read, stop defaults to the last row
+    chunk_bytes: number of bytes parsed at once
+
+    Returns
+    -------
+    values: (n_rows x n_cols) float64 array
+    """
+    parts = []
+    n_cols = None
+    row = 0
+    with open(data_path, 'rb') as infile:
+        for chunk in _chunks(infile, chunk_bytes):
+            starts, ends = _line_bounds(chunk)
+            if not len(starts):
+                continue
+            if n_cols is None:
+                n_cols = len(chunk[starts[0]:ends[0]].split())
+
+            first = max(start - row, 0)
+            last = len(starts) if stop is None else \
+                min(stop - row, len(starts))
+            row += len(starts)
+            if first < last:
+                values = _parse_rows(chunk[starts[first]:ends[last - 1]],
+                                     last - first, n_cols, data_path)
+                parts.append(values if usecols is None
+                             else values[:, usecols])
+            if stop is not None and row >= stop:
+                break
+
+    if not parts:
+        width = len(usecols) if usecols is not None else n_cols or 0
+        return np.empty((0, width))
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def load_data(data_path, usecols=None, start=0, stop=None):
+    """Reads a result file like `np.genfromtxt`, i.e. single rows and
+    columns are returned as 1-d arrays, but several times faster and with
+    a fraction of its memory. See `read_table` for the arguments."""
+    return read_table(data_path, usecols, start, stop).squeeze()
 
-def load_data(data_path):
-    return np.genfromtxt(data_path)
 
 def store_system_state():
-    raise NotImplementedError
\ No newline at end of file
+    raise NotImplementedError
+
+
+def read_sparse_matrix_file(file_path):
+    """Reads a matrix file written by `write_sparse_matrix_file`, in text
+    or binary format.
+
+    Returns
+    -------
+    rows, cols, values: the nonzero coefficients as numpy arrays
+    equ_vec, rhs_vec: the equality and rhs vectors
+    shape: (m, n)
+    """
+    with open(file_path, 'rb') as infile:
+        content = infile.read()
+
+    if content.startswith(SPARSE_MAGIC):
+        _, _, n_rows, n_cols, nnz = SPARSE_BINARY_HEADER.unpack_from(content)
+        offset = SPARSE_BINARY_HEADER.size
+        arrays = []
+        for dtype, count in (('<i1', n_rows), ('<f8', n_rows),
+                             ('<i4', nnz), ('<i4', nnz), ('<f8', nnz)):
+            arrays.append(np.frombuffer(content, dtype=dtype, count=count,
+                                        offset=offset))
+            offset += np.dtype(dtype).itemsize * count
+        equ_vec, rhs_vec, rows, cols, values = arrays
+        return (rows.astype(np.int64), cols.astype(np.int64), values,
+                equ_vec.astype(np.int8), rhs_vec, (n_rows, n_cols))
+
+    header, sizes, body = content.split(b'\n', 2)
+    if not header.decode().startswith(SPARSE_TEXT_HEADER):
+        raise ValueError('{} is not a sparse matrix file'.format(file_path))
+    n_rows, n_cols, nnz = (int(size) for size in sizes.split())
+    numbers = np.array(body.split(), dtype=float)
+    if len(numbers) != 2 * n_rows + 3 * nnz:
+        raise ValueError('{} is truncated'.format(file_path))
+    row_part = numbers[:2 * n_rows].reshape(n_rows, 2)
+    entries = numbers[2 * n_rows:].reshape(nnz, 3)
+    return (entries[:, 0].astype(np.int64), entries[:, 1].astype(np.int64),
+            entries[:, 2], row_part[:, 0].astype(np.int8), row_part[:, 1],
+            (n_rows, n_cols))
+
+
+def write_columns(run_dir_path, columns):
+    """Stores the column names of the text outputs of a run.
+
+    :param columns: dict of file name, list of names pairs
+    """
+    with open(os.path.join(run_dir_path, COLUMNS_FILE_NAME), 'w') as outfile:
+        json.dump(columns, outfile)
+
+
+def read_columns(run_dir_path):
+    """Returns the dict stored by `write_columns`, an empty dict for runs
+    without one."""
+    path = os.path.join(run_dir_path, COLUMNS_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as infile:
+        return json.load(infile)
+
+
+def _cache_path(data_path):
+    stat = os.stat(data_path)
+    directory, file_name = os.path.split(data_path)
+    return os.path.join(directory, LOADER_CACHE_DIR_NAME, '{}.{}_{}.npy'
+                        .format(file_name, stat.st_size, stat.st_mtime_ns))
+
+
+def _read_cached(data_path):
+    """Memory maps the binary copy of a text file, parsing the file and
+    replacing stale copies first if needed. Directories that cannot be
+    written to are read without copy."""
+    cache_path = _cache_path(data_path)
+    if os.path.exists(cache_path):
+        return np.load(cache_path, mmap_mode='r')
+
+    values = read_table(data_path)
+    cache_dir, cache_name = os.path.split(cache_path)
+    prefix = os.path.basename(data_path) + '.'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(cache_dir, name))
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as outfile:
+            np.save(outfile, values)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return values
+
+
+def load_run(run_dir_path, file_name=None, usecols=None, start=0,
+             stop=None, cache=True):
+    """Loads an output of a run with the names of its columns.
+
+    The objective and the variables are memory mapped from the raw level of
+    the pyramid of the run if it has one. Other files are read with
+    `read_table`, or with `cache` memory mapped from a binary copy made the
+    first time the whole file is read, which is reused as long as the file
+    is unchanged.
+
+    Arguments
+    ---------
+    run_dir_path: directory of the run
+    file_name: one of the text outputs of the run, defaults to the
+               variables
+    usecols: optional list of column names or indices
+    start, stop: range of the steps to load
+    cache: whether to use binary copies of the text outputs
+
+    Returns
+    -------
+    table: Table of the selected columns and steps
+    """
+    from blueark.simulation.pyramid import PYRAMID_DIR_NAME, Pyramid
+    from blueark.simulation.simulator import OBJ_FILE_NAME, VAR_FILE_NAME
+
+    if file_name is None:
+        file_name = VAR_FILE_NAME
+    data_path = os.path.join(run_dir_path, file_name)
+    pyramid_dir = os.path.join(run_dir_path, PYRAMID_DIR_NAME)
+
+    pyramid = None
+    if file_name in (OBJ_FILE_NAME, VAR_FILE_NAME) and \
+            os.path.isdir(pyramid_dir):
+        pyramid = Pyramid(pyramid_dir)
+
+    if file_name == OBJ_FILE_NAME:
+        names = ['objective']
+    elif pyramid is not None:
+        names = pyramid.names[1:]
+    else:
+        names = read_columns(run_dir_path).get(file_name)
+    if usecols is not None:
+        usecols = [_column_index(names, col, data_path) for col in usecols]
+
+    if pyramid is not None:
+        columns = slice(0, 1) if file_name == OBJ_FILE_NAME else slice(1, None)
+        values = pyramid.raw()[start:stop, columns]
+    elif cache and (start == 0 and stop is None or
+                    os.path.exists(_cache_path(data_path))):
+        values = _read_cached(data_path)[start:stop]
+    else:
+        values = None
+
+    if usecols is not None:
+        names = None if names is None else [names[idx] for idx in usecols]
+    if values is None:
+        return Table(names, read_table(data_path, usecols, start, stop))
+    return Table(names, values if usecols is None else values[:, usecols])
+
+
+def _column_index(names, column, data_path):
+    if not isinstance(column, str):
+        return column
+    if names is None or column not in names:
+        raise ValueError('{} has no column {!r}'.format(data_path, column))
+    return names.index(column)
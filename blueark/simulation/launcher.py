@@ -0,0 +1,178 @@
+"""Concurrent launcher of many simulation runs.
+
+Runs are described by a `RunConfig`, their demands are drawn from the seed
+of the config with `scenarios.draw_demands`. Every run gets a unique run id
+up front, is recorded in a `RunIndex` and executed on a process pool, one
+run per worker, each solving in process with a single worker such that the
+runs use the whole machine. The output of a run is stored in the log file
+of its run directory. Once a run completes, its timings and the summary
+statistics of its results are written into the index by the launching
+process, which is the only writer of the database.
+"""
+
+import contextlib
+import io
+import os
+import time
+import traceback
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from blueark.model.compiler import load_network
+from blueark.optmization import backends
+from blueark.simulation.run_index import FAILED, FINISHED, RunIndex
+from blueark.simulation.scenarios import draw_demands
+from blueark.simulation.simulator import (APPROXIMATE_FILE_NAME,
+                                          INFEASIBLE_FILE_NAME,
+                                          OBJ_FILE_NAME, Simulator,
+                                          new_run_id)
+
+LOG_FILE_NAME = 'simulation.log'
+
+RunConfig = namedtuple('RunConfig', ['network_path', 'n_steps', 'seed',
+                                     'solve_backend', 'on_infeasible',
+                                     'deadline', 'archive'])
+RunConfig.__new__.__defaults__ = (0, backends.DEFAULT_BACKEND, None, None,
+                                  False)
+RunConfig.__doc__ = """Parameters of a run: the network file, the number of
+steps and the seed of the demands, the others are passed on to the
+Simulator."""
+
+
+def _count_lines(file_path):
+    """Number of records of a log file started by init_data_files."""
+    with open(file_path) as infile:
+        return max(len(infile.read().split('\n')) - 2, 0)
+
+
+def summarize_run(run_dir_path):
+    """Summary statistics of the results of a run.
+
+    Returns
+    -------
+    summary: dict of the generated energy, i.e. the power summed over all
+    steps, the mean, min and max power of the solved steps, the number of
+    steps without solution and the number of steps logged as infeasible and
+    as approximate
+    """
+    with open(os.path.join(run_dir_path, OBJ_FILE_NAME)) as infile:
+        objective = np.array(infile.read().split(), dtype=float)
+    solved = objective[~np.isnan(objective)]
+    summary = {'energy': float(solved.sum()),
+               'mean_power': float(solved.mean()) if len(solved) else None,
+               'min_power': float(solved.min()) if len(solved) else None,
+               'max_power': float(solved.max()) if len(solved) else None,
+               'failed_steps': int(len(objective) - len(solved))}
+    for key, file_name in (('infeasible_steps', INFEASIBLE_FILE_NAME),
+                           ('approximate_steps', APPROXIMATE_FILE_NAME)):
+        summary[key] = _count_lines(os.path.join(run_dir_path, file_name))
+    return summary
+
+
+def run_config(config, data_dir, run_id):
+    """Executes a single run, in a pool worker or in process.
+
+    Returns
+    -------
+    run_id: the id of the run
+    summary: dict of summarize_run
+    wall_time, cpu_time: duration of the run in seconds
+    """
+    start, cpu_start = time.perf_counter(), time.process_time()
+    n_consumers = len(load_network(config.network_path).consumers)
+    demands = draw_demands(1, n_consumers, config.n_steps,
+                           seed=config.seed)[0]
+    consumer_data = OrderedDict((idx, demands[:, idx])
+                                for idx in range(n_consumers))
+
+    output = io.StringIO()
+    simulator = None
+    try:
+        with contextlib.redirect_stdout(output):
+            simulator = Simulator(consumer_data, config.n_steps, data_dir,
+                                  network_path=config.network_path,
+                                  solve_workers=1,
+                                  solve_backend=config.solve_backend,
+                                  on_infeasible=config.on_infeasible,
+                                  deadline=config.deadline,
+                                  archive=config.archive, run_id=run_id)
+            simulator.execute_main_loop()
+    finally:
+        if simulator is not None:
+            with open(os.path.join(simulator.run_dir_path, LOG_FILE_NAME),
+                      'w') as outfile:
+                outfile.write(output.getvalue())
+
+    return (run_id, summarize_run(simulator.run_dir_path),
+            time.perf_counter() - start, time.process_time() - cpu_start)
+
+
+def _run_dir_path(data_dir, run_id):
+    return os.path.join(data_dir, 'run_{}'.format(run_id))
+
+
+def launch_runs(configs, data_dir, index_path, max_workers=None,
+                on_finished=None):
+    """Runs all configs concurrently and records them in the run index.
+
+    Arguments
+    ---------
+    configs: list of RunConfig
+    data_dir: directory the run directories are created in
+    index_path: path of the SQLite run index, created if needed
+    max_workers: number of runs executed at once, defaults to the cpu
+                 count. With a single worker nothing is forked.
+    on_finished: optional function called with the run id and the status
+                 of every run as it completes
+
+    Returns
+    -------
+    run_ids: the ids of the runs, in the order of the configs
+    """
+    run_ids = [new_run_id() for _ in configs]
+    n_workers = max_workers or os.cpu_count() or 1
+    os.makedirs(data_dir, exist_ok=True)
+    with RunIndex(index_path) as index:
+        for run_id, config in zip(run_ids, configs):
+            parameters = config._asdict()
+            if parameters['network_path'] is not None:
+                parameters['network_path'] = os.path.abspath(
+                    parameters['network_path'])
+            index.add_run(run_id, _run_dir_path(data_dir, run_id),
+                          parameters, time.time())
+
+    if n_workers == 1 or len(configs) == 1:
+        with RunIndex(index_path) as index:
+            for run_id, config in zip(run_ids, configs):
+                _record(index, run_id,
+                        lambda: run_config(config, data_dir, run_id),
+                        on_finished)
+        return run_ids
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(run_config, config, data_dir,
+                                   run_id): run_id
+                   for run_id, config in zip(run_ids, configs)}
+        # the workers are forked on submit, the index is only opened
+        # afterwards such that no connection is shared with them
+        with RunIndex(index_path) as index:
+            for future in as_completed(futures):
+                _record(index, futures[future], future.result, on_finished)
+    return run_ids
+
+
+def _record(index, run_id, result, on_finished):
+    """Writes the outcome of a run into the index, `result` returns the
+    result of `run_config` or raises its error."""
+    try:
+        _, summary, wall_time, cpu_time = result()
+    except Exception:
+        index.fail_run(run_id, traceback.format_exc())
+        status = FAILED
+    else:
+        index.finish_run(run_id, summary, wall_time, cpu_time)
+        status = FINISHED
+    if on_finished is not None:
+        on_finished(run_id, status)
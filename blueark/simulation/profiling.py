@@ -0,0 +1,163 @@
+"""Sampling profiler of the simulation loop.
+
+Every `every`-th step is run under `cProfile` and, optionally, under
+`tracemalloc`. Memory snapshots are taken around each phase of a sampled
+step, such that allocations still alive after a phase (e.g. EvalNode trees
+or symbols copied by `Entity.get_symbol`) are attributed to the phase and
+the allocation site. Steps in between run without any profiling overhead.
+
+The profiler is a TimingHook and writes its results into the run directory
+once the run finishes:
+
+- profile_calls.prof: aggregated call statistics, loadable with pstats
+- profile_calls.txt: the same statistics sorted by cumulative time
+- profile_memory.json: top allocation sites per phase
+- profile_memory_samples.csv: traced and peak memory of every sampled step
+"""
+
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import tracemalloc
+
+from blueark.simulation.instrumentation import TimingHook
+
+CALLS_FILE_NAME = 'profile_calls.prof'
+CALLS_TEXT_FILE_NAME = 'profile_calls.txt'
+MEMORY_FILE_NAME = 'profile_memory.json'
+MEMORY_SAMPLES_FILE_NAME = 'profile_memory_samples.csv'
+
+
+class _SiteStats:
+    __slots__ = ('size', 'count', 'samples')
+
+    def __init__(self):
+        self.size = 0
+        self.count = 0
+        self.samples = 0
+
+
+class SamplingProfiler(TimingHook):
+    """Profiles every `every`-th step of a simulation.
+
+    Arguments
+    ---------
+    every: profile the steps whose index is a multiple of `every`
+    trace_memory: whether to trace allocations of the sampled steps
+    n_frames: number of stack frames kept per allocation site
+    top: number of functions and allocation sites written to the reports
+    """
+
+    def __init__(self, every=100, trace_memory=True, n_frames=4, top=25):
+        if every < 1:
+            raise ValueError('Expected a positive sampling interval, got {}'
+                             .format(every))
+        self.every = every
+        self.trace_memory = trace_memory
+        self.n_frames = n_frames
+        self.top = top
+
+        self.n_samples = 0
+        self._profile = None
+        self._calls = None
+        self._owns_tracing = False
+        self._before = None
+        self._sites = {}
+        self._memory_samples = []
+
+    def step_started(self, step):
+        if step % self.every != 0:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.n_frames)
+            self._owns_tracing = True
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def phase_started(self, step, phase):
+        if self._profile is not None and self.trace_memory:
+            # keep the snapshot itself out of the call statistics
+            self._profile.disable()
+            self._before = tracemalloc.take_snapshot()
+            self._profile.enable()
+
+    def phase_finished(self, step, phase, wall, cpu):
+        if self._profile is None or not self.trace_memory:
+            return
+
+        self._profile.disable()
+        after = tracemalloc.take_snapshot()
+        sites = self._sites.setdefault(phase, {})
+        for diff in after.compare_to(self._before, 'traceback'):
+            if diff.size_diff <= 0:
+                continue
+            # most recent frame first
+            key = tuple('{}:{}'.format(frame.filename, frame.lineno)
+                        for frame in reversed(diff.traceback))
+            site = sites.setdefault(key, _SiteStats())
+            site.size += diff.size_diff
+            site.count += diff.count_diff
+            site.samples += 1
+        self._before = None
+        self._profile.enable()
+
+    def step_finished(self, step, wall, cpu):
+        if self._profile is None:
+            return
+
+        self._profile.disable()
+        if self._calls is None:
+            self._calls = pstats.Stats(self._profile)
+        else:
+            self._calls.add(self._profile)
+        self._profile = None
+        self.n_samples += 1
+
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self._memory_samples.append((step, current, peak))
+            if self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+    def run_finished(self, run_dir_path):
+        if self._calls is not None:
+            self._calls.dump_stats(os.path.join(run_dir_path,
+                                                CALLS_FILE_NAME))
+            text = io.StringIO()
+            pstats.Stats(os.path.join(run_dir_path, CALLS_FILE_NAME),
+                         stream=text).sort_stats('cumulative').print_stats(
+                self.top)
+            with open(os.path.join(run_dir_path,
+                                   CALLS_TEXT_FILE_NAME), 'w') as outfile:
+                outfile.write(text.getvalue())
+
+        if not self.trace_memory:
+            return
+
+        with open(os.path.join(run_dir_path, MEMORY_FILE_NAME), 'w') as out:
+            json.dump(self.memory_report(), out, indent=2)
+
+        with open(os.path.join(run_dir_path, MEMORY_SAMPLES_FILE_NAME), 'w',
+                  newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['step', 'traced_bytes', 'peak_bytes'])
+            writer.writerows(self._memory_samples)
+
+    def memory_report(self):
+        """Returns the top allocation sites per phase, largest first. Sizes
+        are bytes still allocated at the end of the phase, averaged over the
+        sampled steps."""
+        report = {}
+        for phase, sites in self._sites.items():
+            ranked = sorted(sites.items(), key=lambda item: -item[1].size)
+            report[phase] = [
+                {'traceback': list(key),
+                 'mean_size': site.size / max(self.n_samples, 1),
+                 'mean_count': site.count / max(self.n_samples, 1),
+                 'samples': site.samples}
+                for key, site in ranked[:self.top]]
+        return report
@@ -0,0 +1,222 @@
+"""Multi-resolution downsampling pyramid of simulation results.
+
+Level 0 holds the raw value of every column at every step. Level `k` holds
+the min, max and mean of every column over aligned windows of `2 ** k`
+steps, built by merging pairs of windows of level `k - 1`. All levels are
+flat binary float64 files which are memory mapped for queries, such that a
+query only touches the few windows it returns.
+
+The pyramid can be written while a simulation runs (`PyramidWriter.append`)
+or afterwards from the full result matrix (`build_pyramid`).
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+PYRAMID_DIR_NAME = 'pyramid'
+META_FILE_NAME = 'meta.json'
+
+MIN, MAX, MEAN = 0, 1, 2
+
+
+def _level_path(out_dir, level):
+    return os.path.join(out_dir, 'level_{}.bin'.format(level))
+
+
+def _stats_of_rows(rows):
+    """Level 0 entries seen as (n, 3, n_cols) min, max, mean windows."""
+    return np.repeat(rows[:, np.newaxis, :], 3, axis=1)
+
+
+def _merge_pairs(stats):
+    """Merges consecutive pairs of windows of equal size."""
+    first, second = stats[0::2], stats[1::2]
+    merged = np.empty_like(first)
+    merged[:, MIN] = np.minimum(first[:, MIN], second[:, MIN])
+    merged[:, MAX] = np.maximum(first[:, MAX], second[:, MAX])
+    merged[:, MEAN] = 0.5 * (first[:, MEAN] + second[:, MEAN])
+    return merged
+
+
+class PyramidWriter:
+    """Appends steps to a pyramid stored in `out_dir`.
+
+    Arguments
+    ---------
+    out_dir: directory holding the pyramid files, created if needed
+    names: names of the columns, e.g. the variable names of a run
+    n_levels: number of aggregated levels above the raw level 0
+    """
+
+    def __init__(self, out_dir, names, n_levels=24):
+        self.out_dir = out_dir
+        self.names = list(names)
+        self.n_levels = n_levels
+        self.n_steps = 0
+        # window of level k - 1 waiting for its pair, one slot per level
+        self._carry = [None] * (n_levels + 1)
+
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        with open(os.path.join(out_dir, META_FILE_NAME), 'w') as outfile:
+            json.dump({'names': self.names, 'n_levels': n_levels}, outfile)
+        for level in range(n_levels + 1):
+            open(_level_path(out_dir, level), 'wb').close()
+
+    @classmethod
+    def resume(cls, out_dir, n_steps):
+        """Reopens a pyramid, dropping everything after the first `n_steps`
+        steps, e.g. to continue a simulation from a checkpoint."""
+        with open(os.path.join(out_dir, META_FILE_NAME), 'r') as infile:
+            meta = json.load(infile)
+
+        writer = cls.__new__(cls)
+        writer.out_dir = out_dir
+        writer.names = meta['names']
+        writer.n_levels = meta['n_levels']
+        writer.n_steps = n_steps
+        writer._carry = [None] * (writer.n_levels + 1)
+
+        n_cols = len(writer.names)
+        for level in range(writer.n_levels + 1):
+            n_windows = n_steps >> level
+            width = n_cols if level == 0 else 3 * n_cols
+            with open(_level_path(out_dir, level), 'r+b') as outfile:
+                outfile.truncate(n_windows * width * 8)
+
+            if level > 0 and (n_steps >> (level - 1)) % 2 == 1:
+                # the last window of the level below is not yet paired
+                below = _read_level(out_dir, level - 1, n_cols)
+                last = below[-1:]
+                writer._carry[level] = _stats_of_rows(last) if level == 1 \
+                    else np.array(last)
+        return writer
+
+    def append(self, row):
+        """Appends the values of a single step."""
+        self.append_rows(np.asarray(row, dtype=np.float64)[np.newaxis, :])
+
+    def append_rows(self, rows):
+        """Appends the values of many steps, one row per step."""
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[1] != len(self.names):
+            raise ValueError('Expected rows with {} columns, got shape {}'
+                             .format(len(self.names), rows.shape))
+        if not len(rows):
+            return
+
+        with open(_level_path(self.out_dir, 0), 'ab') as outfile:
+            outfile.write(rows.tobytes())
+        self.n_steps += len(rows)
+
+        stats = _stats_of_rows(rows)
+        for level in range(1, self.n_levels + 1):
+            if self._carry[level] is not None:
+                stats = np.concatenate((self._carry[level], stats))
+                self._carry[level] = None
+            if len(stats) % 2 == 1:
+                self._carry[level] = stats[-1:].copy()
+                stats = stats[:-1]
+            if not len(stats):
+                break
+
+            stats = _merge_pairs(stats)
+            with open(_level_path(self.out_dir, level), 'ab') as outfile:
+                outfile.write(np.ascontiguousarray(stats).tobytes())
+
+
+def build_pyramid(values, out_dir, names, n_levels=None):
+    """Builds the pyramid of a full (n_steps x n_cols) result matrix."""
+    values = np.asarray(values, dtype=np.float64)
+    if n_levels is None:
+        n_levels = max(1, int(math.log2(max(len(values), 2))))
+    writer = PyramidWriter(out_dir, names, n_levels)
+    writer.append_rows(values)
+    return writer
+
+
+def _read_level(out_dir, level, n_cols):
+    path = _level_path(out_dir, level)
+    width = n_cols if level == 0 else 3 * n_cols
+    n_windows = os.path.getsize(path) // (8 * width)
+    if n_windows == 0:
+        shape = (0, n_cols) if level == 0 else (0, 3, n_cols)
+        return np.empty(shape)
+    shape = (n_windows, n_cols) if level == 0 else (n_windows, 3, n_cols)
+    return np.memmap(path, dtype=np.float64, mode='r', shape=shape)
+
+
+class Pyramid:
+    """Read access to a pyramid written by a PyramidWriter."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, META_FILE_NAME), 'r') as infile:
+            meta = json.load(infile)
+        self.names = meta['names']
+        self.n_levels = meta['n_levels']
+
+    @property
+    def n_steps(self):
+        return os.path.getsize(_level_path(self.out_dir, 0)) // \
+            (8 * len(self.names))
+
+    def raw(self):
+        """Memory map of the raw level 0, one row per step."""
+        return _read_level(self.out_dir, 0, len(self.names))
+
+    def level_for(self, start, stop, width):
+        """Returns the coarsest level yielding at least one window per
+        pixel for a range of `stop - start` steps drawn `width` pixels
+        wide."""
+        n_steps = max(stop - start, 1)
+        if n_steps <= width:
+            return 0
+        return min(int(math.floor(math.log2(n_steps / width))),
+                   self.n_levels)
+
+    def query(self, start, stop, width, columns=None):
+        """Returns the windows covering steps [start, stop) at the
+        resolution fitting `width` pixels.
+
+        Arguments
+        ---------
+        start, stop: step range to plot
+        width: number of pixels the range is drawn on
+        columns: optional list of column names, defaults to all columns
+
+        Returns
+        -------
+        steps: first step of every window
+        minima, maxima, means: (n_windows x n_columns) arrays
+        """
+        stop = min(stop, self.n_steps)
+        col_idx = slice(None) if columns is None else \
+            [self.names.index(name) for name in columns]
+        level = self.level_for(start, stop, width)
+        window = 2 ** level
+        first, last = start // window, (stop + window - 1) // window
+
+        if level == 0:
+            raw = _read_level(self.out_dir, 0, len(self.names))
+            values = np.array(raw[start:stop][:, col_idx])
+            return np.arange(start, stop), values, values, values
+
+        stats = _read_level(self.out_dir, level, len(self.names))
+        windows = np.array(stats[first:min(last, len(stats))][:, :, col_idx])
+
+        if last > len(stats):
+            # the still incomplete tail window is aggregated from raw steps
+            raw = _read_level(self.out_dir, 0, len(self.names))
+            tail = np.array(raw[max(len(stats), first) * window:stop]
+                            [:, col_idx])
+            if len(tail):
+                tail_stats = np.stack((tail.min(axis=0), tail.max(axis=0),
+                                       tail.mean(axis=0)))
+                windows = np.concatenate((windows, tail_stats[np.newaxis]))
+
+        steps = (first + np.arange(len(windows))) * window
+        return (steps, windows[:, MIN], windows[:, MAX], windows[:, MEAN])
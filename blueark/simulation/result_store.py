@@ -0,0 +1,190 @@
+"""Indexed store of the per step results of a simulation run in SQLite.
+
+Every value of every step is a row of `(var_id, step, value)` in a table
+clustered on the variable and the step, with a second index on the variable
+and the value. Step ranges of a variable, e.g. the mean objective over steps
+10000 to 20000, and threshold queries, e.g. the steps a pipe ran at its
+capacity:
+
+    store.where('x_12', low=0.999 * capacity)
+
+are answered from the indices without reading the other variables or
+steps. Steps are inserted in batches within a single transaction and the
+database is in WAL mode, such that the store can be queried by other
+processes while the simulation appends to it. Values without solution are
+stored as NULL and ignored by the aggregates.
+"""
+
+import sqlite3
+
+import numpy as np
+
+STORE_FILE_NAME = 'results.sqlite'
+DEFAULT_BATCH_STEPS = 1000
+
+AGGREGATES = ('avg', 'min', 'max', 'sum', 'count')
+
+
+class ResultStore:
+    def __init__(self, file_path, names=None,
+                 batch_steps=DEFAULT_BATCH_STEPS):
+        """Opens a store, creating the database if needed.
+
+        :param file_path: path of the SQLite database
+        :param names: names of the columns of the steps appended, e.g.
+            'objective' and the variable names, required to append to a
+            new store
+        :param batch_steps: number of steps inserted per transaction
+        """
+        self.file_path = file_path
+        self.batch_steps = batch_steps
+        self.connection = sqlite3.connect(file_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS variables '
+                '(var_id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS step_values '
+                '(var_id INTEGER NOT NULL, step INTEGER NOT NULL, '
+                'value REAL, PRIMARY KEY (var_id, step)) WITHOUT ROWID')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS step_values_value '
+                'ON step_values (var_id, value)')
+            if names is not None and not self._ids():
+                self.connection.executemany(
+                    'INSERT INTO variables (var_id, name) VALUES (?, ?)',
+                    enumerate(names))
+        self.names = [name for name, _ in sorted(self._ids().items(),
+                                                 key=lambda item: item[1])]
+        if names is not None and list(names) != self.names:
+            raise ValueError('{} holds other variables'.format(file_path))
+        self._var_ids = self._ids()
+        # every step has a row of every variable, the first one suffices
+        self.n_steps = self.connection.execute(
+            'SELECT COALESCE(MAX(step) + 1, 0) FROM step_values '
+            'WHERE var_id = 0').fetchone()[0]
+        self._pending = []
+
+    def _ids(self):
+        return dict(self.connection.execute(
+            'SELECT name, var_id FROM variables'))
+
+    def append(self, row):
+        """Appends the values of the next step, one per name."""
+        if len(row) != len(self.names):
+            raise ValueError('Expected {} values, got {}'
+                             .format(len(self.names), len(row)))
+        step = self.n_steps
+        self._pending.extend((var_id, step, float(value))
+                             for var_id, value in enumerate(row))
+        self.n_steps += 1
+        if len(self._pending) >= self.batch_steps * len(self.names):
+            self.flush()
+
+    def append_rows(self, rows):
+        """Appends the values of many steps, one row per step."""
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        """Commits the pending steps."""
+        if self._pending:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT INTO step_values (var_id, step, value) '
+                    'VALUES (?, ?, ?)', self._pending)
+            self._pending = []
+
+    def truncate(self, n_steps):
+        """Drops everything after the first `n_steps` steps, e.g. to
+        continue a simulation from a checkpoint."""
+        self.flush()
+        with self.connection:
+            self.connection.execute('DELETE FROM step_values WHERE step >= ?',
+                                    (n_steps,))
+        self.n_steps = min(self.n_steps, n_steps)
+
+    def _var_id(self, name):
+        if name not in self._var_ids:
+            raise ValueError('Unknown variable %r' % name)
+        return self._var_ids[name]
+
+    def _step_range(self, start, stop):
+        return start, self.n_steps if stop is None else stop
+
+    def range(self, name, start=0, stop=None):
+        """Values of a variable over steps [start, stop).
+
+        Returns
+        -------
+        steps: array of the steps
+        values: array of the values, nan for steps without solution
+        """
+        self.flush()
+        rows = self.connection.execute(
+            'SELECT step, value FROM step_values WHERE var_id = ? '
+            'AND step >= ? AND step < ? ORDER BY step',
+            (self._var_id(name),) + self._step_range(start, stop)).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        steps, values = zip(*rows)
+        return np.array(steps, dtype=np.int64), np.array(values, dtype=float)
+
+    def where(self, name, low=None, high=None, start=0, stop=None):
+        """Steps of [start, stop) at which a variable was within
+        [low, high], either bound may be left open.
+
+        Returns
+        -------
+        steps: sorted array of the steps
+        """
+        self.flush()
+        query = 'SELECT step FROM step_values WHERE var_id = ?'
+        params = [self._var_id(name)]
+        if low is not None:
+            query += ' AND value >= ?'
+            params.append(low)
+        if high is not None:
+            query += ' AND value <= ?'
+            params.append(high)
+        query += ' AND step >= ? AND step < ? ORDER BY step'
+        params.extend(self._step_range(start, stop))
+        return np.array([step for step, in self.connection.execute(query,
+                                                                   params)],
+                        dtype=np.int64)
+
+    def aggregate(self, name, function='avg', start=0, stop=None):
+        """Aggregate of a variable over steps [start, stop), steps without
+        solution are ignored.
+
+        :param function: one of `AGGREGATES`
+        :return: the aggregate, None if there is no value
+        """
+        if function not in AGGREGATES:
+            raise ValueError('Expected one of %s, got %r'
+                             % (', '.join(AGGREGATES), function))
+        self.flush()
+        return self.connection.execute(
+            'SELECT {}(value) FROM step_values WHERE var_id = ? '
+            'AND step >= ? AND step < ?'.format(function.upper()),
+            (self._var_id(name),) +
+            self._step_range(start, stop)).fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_store(values, file_path, names, batch_steps=DEFAULT_BATCH_STEPS):
+    """Stores a full (n_steps x n_cols) result matrix."""
+    with ResultStore(file_path, names, batch_steps) as store:
+        store.append_rows(np.asarray(values, dtype=float))
+    return store
@@ -0,0 +1,132 @@
+"""Index of simulation runs in a local SQLite database.
+
+Every run launched by `launcher.launch_runs` gets a row holding its
+parameters, its timings and summary statistics of its results, such that
+sweeps are queried without scanning run directories. The columns runs are
+usually looked up or ranked by are indexed.
+"""
+
+import json
+import sqlite3
+
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+# column name, SQL type of every column after the run id
+COLUMNS = (('run_dir', 'TEXT NOT NULL'),
+           ('network', 'TEXT'),
+           ('n_steps', 'INTEGER'),
+           ('seed', 'INTEGER'),
+           ('solve_backend', 'TEXT'),
+           ('status', 'TEXT NOT NULL'),
+           ('started', 'REAL NOT NULL'),
+           ('wall_time_s', 'REAL'),
+           ('cpu_time_s', 'REAL'),
+           ('energy', 'REAL'),
+           ('mean_power', 'REAL'),
+           ('min_power', 'REAL'),
+           ('max_power', 'REAL'),
+           ('failed_steps', 'INTEGER'),
+           ('infeasible_steps', 'INTEGER'),
+           ('approximate_steps', 'INTEGER'),
+           ('parameters', 'TEXT NOT NULL'),
+           ('error', 'TEXT'))
+COLUMN_NAMES = ('run_id',) + tuple(name for name, _ in COLUMNS)
+INDEXED_COLUMNS = ('network', 'status', 'started', 'energy')
+
+# summary statistics of a finished run, see `launcher.summarize_run`
+SUMMARY_COLUMNS = ('energy', 'mean_power', 'min_power', 'max_power',
+                   'failed_steps', 'infeasible_steps', 'approximate_steps')
+
+
+class RunIndex:
+    def __init__(self, file_path):
+        """Opens the index, creating the database if needed.
+
+        :param file_path: path of the SQLite database, ':memory:' for an
+            index that is not stored
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, '
+                + ', '.join('{} {}'.format(name, sql_type)
+                            for name, sql_type in COLUMNS) + ')')
+            for name in INDEXED_COLUMNS:
+                self.connection.execute(
+                    'CREATE INDEX IF NOT EXISTS runs_{0} ON runs ({0})'
+                    .format(name))
+
+    def add_run(self, run_id, run_dir, parameters, started):
+        """Records a run that is about to start.
+
+        :param parameters: dict of the parameters of the run, stored as
+            json, its network, n_steps, seed and solve_backend also get a
+            column of their own
+        :param started: start time in seconds since the epoch
+        """
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO runs (run_id, run_dir, network, n_steps, seed, '
+                'solve_backend, status, started, parameters) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (run_id, run_dir, parameters.get('network_path'),
+                 parameters.get('n_steps'), parameters.get('seed'),
+                 parameters.get('solve_backend'), RUNNING, started,
+                 json.dumps(parameters, sort_keys=True)))
+
+    def finish_run(self, run_id, summary, wall_time, cpu_time):
+        """Records the timings and the summary statistics of a finished run,
+        `summary` is a dict keyed by the `SUMMARY_COLUMNS`."""
+        assignments = ', '.join('{} = ?'.format(name)
+                                for name in SUMMARY_COLUMNS)
+        with self.connection:
+            self.connection.execute(
+                'UPDATE runs SET status = ?, wall_time_s = ?, '
+                'cpu_time_s = ?, ' + assignments + ' WHERE run_id = ?',
+                [FINISHED, wall_time, cpu_time] +
+                [summary.get(name) for name in SUMMARY_COLUMNS] + [run_id])
+
+    def fail_run(self, run_id, error, wall_time=None):
+        with self.connection:
+            self.connection.execute(
+                'UPDATE runs SET status = ?, error = ?, wall_time_s = ? '
+                'WHERE run_id = ?', (FAILED, error, wall_time, run_id))
+
+    def find(self, order_by='started', descending=False, limit=None,
+             **filters):
+        """Returns the runs matching all filters as dicts.
+
+        Arguments
+        ---------
+        order_by: column the runs are sorted by
+        descending: whether to sort in descending order
+        limit: optional maximum number of runs
+        filters: column, value pairs the runs have to match, e.g.
+                 `status=FINISHED`
+        """
+        for name in [order_by] + list(filters):
+            if name not in COLUMN_NAMES:
+                raise ValueError('Unknown column %r' % name)
+        query = 'SELECT * FROM runs'
+        if filters:
+            query += ' WHERE ' + ' AND '.join('{} = ?'.format(name)
+                                              for name in filters)
+        query += ' ORDER BY {} {}'.format(order_by,
+                                          'DESC' if descending else 'ASC')
+        if limit is not None:
+            query += ' LIMIT {:d}'.format(limit)
+        rows = self.connection.execute(query, list(filters.values()))
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
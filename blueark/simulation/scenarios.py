@@ -0,0 +1,244 @@
+"""Monte Carlo scenarios of uncertain consumer demand.
+
+Many demand trajectories are drawn with the random walks of the
+`DataAugmenter` and every step of every trajectory is solved like a step of
+the simulator solving in process. Scenarios are distributed in chunks over a
+process pool. The demands, objective, variables and status of all scenarios
+live in `multiprocessing.shared_memory` blocks: workers read their demands
+from them and write their solutions straight into them, only the bounds of
+the chunks travel through pickling.
+
+Whenever a chunk completes, the percentiles over the scenarios finished so
+far are handed to a callback, such that long runs report the distribution
+of the power while they run.
+"""
+
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from blueark.model.compiler import load_network
+from blueark.optmization import backends
+from blueark.simulation.data_augmentation import DataAugmenter
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# scenarios are chunked such that every worker receives a few chunks
+CHUNKS_PER_WORKER = 4
+
+DEMANDS = 'demands'
+OBJECTIVE = 'objective'
+VALUES = 'values'
+STATUS = 'status'
+
+ScenarioResults = namedtuple('ScenarioResults', ['var_names', 'demands',
+                                                 'objective', 'values',
+                                                 'status'])
+ScenarioResults.__doc__ = """Results of all scenarios, `demands` is a
+(n_scenarios x n_steps x n_consumers), `objective` and `status` are
+(n_scenarios x n_steps) and `values` is a (n_scenarios x n_steps x n_vars)
+array."""
+
+Percentiles = namedtuple('Percentiles', ['n_scenarios', 'percentiles',
+                                         'objective', 'energy', 'values'])
+Percentiles.__doc__ = """Percentiles over `n_scenarios` scenarios of the
+power of every step, `objective` (n_percentiles x n_steps), of the power
+summed over all steps, `energy` (n_percentiles), and of every variable,
+`values` (n_percentiles x n_steps x n_vars). Failed steps are ignored."""
+
+# state of a pool worker, set up by _init_worker
+_WORKER = {}
+
+
+def draw_demands(n_scenarios, n_consumers, n_steps, seed=0):
+    """Draws demand trajectories with the random walks of DataAugmenter.
+
+    Every scenario seeds the global random state from `seed` and its index,
+    such that a scenario does not depend on how many are drawn. The global
+    random state is restored afterwards.
+
+    Returns
+    -------
+    demands: (n_scenarios x n_steps x n_consumers) array
+    """
+    state = np.random.get_state()
+    demands = np.empty((n_scenarios, n_steps, n_consumers))
+    try:
+        for scenario in range(n_scenarios):
+            np.random.seed(np.random.SeedSequence(
+                [seed, scenario]).generate_state(1)[0])
+            consumptions = DataAugmenter(n_consumers,
+                                         n_steps).generate_consumptions()
+            demands[scenario] = np.column_stack(list(consumptions.values()))
+    finally:
+        np.random.set_state(state)
+    return demands
+
+
+def percentiles_of(objective, values, percentiles=DEFAULT_PERCENTILES):
+    """Percentiles over the scenarios of results as in ScenarioResults."""
+    percentiles = list(percentiles)
+    return Percentiles(len(objective), percentiles,
+                       np.nanpercentile(objective, percentiles, axis=0),
+                       np.nanpercentile(objective.sum(axis=1), percentiles),
+                       np.nanpercentile(values, percentiles, axis=0))
+
+
+def solve_scenarios(compiled, backend, arrays, start, stop):
+    """Solves every step of the scenarios `start` to `stop` - 1.
+
+    Arguments
+    ---------
+    compiled: the CompiledNetwork the scenarios run on
+    backend: a solver Backend
+    arrays: dict of the demands, objective, values and status arrays, the
+            solutions are written into them
+    """
+    demands = arrays[DEMANDS]
+    for scenario in range(start, stop):
+        for step in range(demands.shape[1]):
+            compiled.set_consumer_usage(*demands[scenario, step].tolist())
+            solution = backend.solve(backend.prepare(compiled), 1)
+            arrays[VALUES][scenario, step] = solution.values
+            arrays[OBJECTIVE][scenario, step] = solution.objective
+            arrays[STATUS][scenario, step] = solution.status
+
+
+def _create_block(shape, dtype):
+    size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    block = shared_memory.SharedMemory(create=True, size=size)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _attach_block(name, shape, dtype):
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _init_worker(network_path, solve_backend, specs):
+    """Process pool initializer, attaches the shared blocks and loads the
+    network once per worker."""
+    _WORKER['blocks'] = {}
+    _WORKER['arrays'] = {}
+    for key, spec in specs.items():
+        _WORKER['blocks'][key], _WORKER['arrays'][key] = \
+            _attach_block(*spec)
+    _WORKER['network'] = load_network(network_path)
+    _WORKER['backend'] = backends.get_backend(solve_backend)
+
+
+def _solve_chunk(start, stop):
+    solve_scenarios(_WORKER['network'], _WORKER['backend'],
+                    _WORKER['arrays'], start, stop)
+    return start, stop
+
+
+def run_scenarios(network_path, demands, max_workers=None, chunk_size=None,
+                  percentiles=DEFAULT_PERCENTILES, on_progress=None,
+                  solve_backend=backends.DEFAULT_BACKEND):
+    """Solves all demand scenarios on a network.
+
+    Arguments
+    ---------
+    network_path: JSON or TOML network file
+    demands: (n_scenarios x n_steps x n_consumers) array, e.g. of
+             `draw_demands`, consumers ordered by symbol
+    max_workers: number of worker processes, defaults to the cpu count. With
+                 a single worker or a single chunk nothing is forked.
+    chunk_size: number of scenarios per task, by default every worker
+                receives `CHUNKS_PER_WORKER` chunks
+    percentiles: the percentiles to report, between 0 and 100
+    on_progress: optional function called with the Percentiles of the
+                 finished scenarios whenever a chunk completes
+    solve_backend: name of the solver backend
+
+    Returns
+    -------
+    results: ScenarioResults, copied out of the shared blocks
+    report: Percentiles over all scenarios
+    """
+    demands = np.asarray(demands, dtype=float)
+    compiled = load_network(network_path)
+    var_names = compiled.arrays()['var_names']
+    n_scenarios, n_steps, n_consumers = demands.shape
+    if n_consumers != len(compiled.consumers):
+        raise ValueError('Expected demands of {} consumers, got {}'
+                         .format(len(compiled.consumers), n_consumers))
+
+    n_workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(n_scenarios /
+                                      (CHUNKS_PER_WORKER * n_workers)))
+    chunks = [(start, min(start + chunk_size, n_scenarios))
+              for start in range(0, n_scenarios, chunk_size)]
+
+    layouts = {DEMANDS: (demands.shape, np.float64),
+               OBJECTIVE: ((n_scenarios, n_steps), np.float64),
+               VALUES: ((n_scenarios, n_steps, len(var_names)), np.float64),
+               STATUS: ((n_scenarios, n_steps), np.int8)}
+    blocks = {}
+    arrays = {}
+    try:
+        for key, (shape, dtype) in layouts.items():
+            blocks[key], arrays[key] = _create_block(shape, dtype)
+        arrays[DEMANDS][...] = demands
+        arrays[OBJECTIVE].fill(np.nan)
+        arrays[VALUES].fill(np.nan)
+        arrays[STATUS].fill(-1)
+
+        finished = np.zeros(n_scenarios, dtype=bool)
+        if n_workers == 1 or len(chunks) == 1:
+            backend = backends.get_backend(solve_backend)
+            for start, stop in chunks:
+                solve_scenarios(compiled, backend, arrays, start, stop)
+                _report_progress(arrays, finished, start, stop,
+                                 percentiles, on_progress)
+        else:
+            specs = {key: (blocks[key].name, array.shape, array.dtype.str)
+                     for key, array in arrays.items()}
+            with ProcessPoolExecutor(max_workers=n_workers,
+                                     initializer=_init_worker,
+                                     initargs=(network_path, solve_backend,
+                                               specs)) as executor:
+                futures = [executor.submit(_solve_chunk, start, stop)
+                           for start, stop in chunks]
+                for future in as_completed(futures):
+                    start, stop = future.result()
+                    _report_progress(arrays, finished, start, stop,
+                                     percentiles, on_progress)
+
+        results = ScenarioResults(var_names, arrays[DEMANDS].copy(),
+                                  arrays[OBJECTIVE].copy(),
+                                  arrays[VALUES].copy(),
+                                  arrays[STATUS].copy())
+    finally:
+        # the views on the blocks have to go before the blocks are closed
+        arrays.clear()
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    return results, percentiles_of(results.objective, results.values,
+                                   percentiles)
+
+
+def _report_progress(arrays, finished, start, stop, percentiles,
+                     on_progress):
+    finished[start:stop] = True
+    if on_progress is not None:
+        on_progress(percentiles_of(arrays[OBJECTIVE][finished],
+                                   arrays[VALUES][finished], percentiles))
+
+
+def save_report(report, var_names, file_path):
+    """Stores Percentiles and the variable names as npz file."""
+    with open(file_path, 'wb') as outfile:
+        np.savez(outfile, var_names=np.array(var_names),
+                 n_scenarios=report.n_scenarios,
+                 percentiles=np.array(report.percentiles),
+                 objective=report.objective, energy=report.energy,
+                 values=report.values)
@@ -7,12 +7,29 @@ it will write the system state to a data file continuously.
 """
 
 import os
+import shutil
 import subprocess
 import datetime
+import uuid
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 import blueark.equations_parsing as equ_parse
+from blueark.model.compiler import load_network
+from blueark.model.objective import Objective
 from blueark.model.sample_model import Model2
+from blueark.optmization import backends
+from blueark.optmization.feasibility import FlowCheck
+from blueark.optmization.greedy import GreedyRouter
+from blueark.simulation import checkpoint
+from blueark.simulation.io import write_columns
+from blueark.simulation.archive import ARCHIVE_FILE_NAME, ArchiveWriter
+from blueark.simulation.result_store import STORE_FILE_NAME, ResultStore
+from blueark.simulation import instrumentation as instr
+from blueark.simulation.profiling import SamplingProfiler
+from blueark.simulation.pyramid import PyramidWriter, PYRAMID_DIR_NAME
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__),
                                             '../../'))
@@ -23,84 +40,444 @@ CPP_EXE_FILE_PATH = os.path.join(PROJECT_ROOT,
                                  'blueark/optmization',
                                  CPP_EXE_FILE_NAME)
 BOUNDS_FILE_NAME = 'bounds.dat'
-MATRIX_FILE_NAME = 'matrix.dat'
+MATRIX_FILE_NAME = 'matrix.spm'
 CPP_FILE_NAME = 'cpp_out.dat'
 
 VAR_FILE_NAME = 'var_output.dat'
 CONS_FILE_NAME = 'consumptions.dat'
 OBJ_FILE_NAME = 'objective.dat'
+# steps whose demands the network cannot deliver
+INFEASIBLE_FILE_NAME = 'infeasible.dat'
+# steps routed greedily since the solver missed the deadline
+APPROXIMATE_FILE_NAME = 'approximate.dat'
+# steps the in-process solver found no optimal solution for
+FAILED_FILE_NAME = 'failed.dat'
+# coefficients of the objective, for the power analysis of finished runs
+OBJECTIVE_VECTOR_FILE_NAME = 'objective_vector.npz'
+
+OUTPUT_FILE_NAMES = (VAR_FILE_NAME, CONS_FILE_NAME, OBJ_FILE_NAME,
+                     INFEASIBLE_FILE_NAME, APPROXIMATE_FILE_NAME,
+                     FAILED_FILE_NAME)
+
+# what to do with steps failing the max-flow pre-check
+SKIP = 'skip'
+DEGRADE = 'degrade'
+INFEASIBLE_ACTIONS = (SKIP, DEGRADE)
 
 
 class Simulator:
-    def __init__(self, consumer_data, n_steps, data_dir):
+    def __init__(self, consumer_data, n_steps, data_dir,
+                 checkpoint_interval=None, pyramid=False, instrument=False,
+                 timing_hooks=(), profile_every=None, trace_memory=True,
+                 network_path=None, solve_workers=None,
+                 solve_backend=backends.DEFAULT_BACKEND, on_infeasible=None,
+                 deadline=None, archive=False, run_id=None,
+                 result_store=False):
+        """Simulation of `n_steps` steps writing into a new run directory.
+
+        :param consumer_data: dict of consumer name, consumption array pairs
+        :param n_steps: number of steps to simulate
+        :param data_dir: directory in which the run directory is created
+        :param checkpoint_interval: if set, a checkpoint is written every
+            `checkpoint_interval` steps such that the run can be resumed
+        :param pyramid: whether to maintain a downsampling pyramid of the
+            objective and variables next to the raw results
+        :param instrument: whether to time every phase of every step, the
+            timings are exported into the run directory at the end
+        :param timing_hooks: TimingHook instances notified of every step and
+            phase, passing hooks turns instrumentation on
+        :param profile_every: if set, every `profile_every`-th step is
+            profiled with cProfile, which turns instrumentation on
+        :param trace_memory: whether profiled steps also trace allocations
+        :param network_path: JSON or TOML network file to simulate, its
+            compiled network is cached next to it. Defaults to `Model2`
+        :param solve_workers: if set, steps are solved in process instead of
+            by the cpp optimizer. Independent parts of the network are
+            solved concurrently on this many worker processes. Requires a
+            `network_path`
+        :param solve_backend: name of the solver backend used with
+            `solve_workers`, see `backends.backend_names`. It is imported
+            on the first step
+        :param on_infeasible: if set, the demands of every step are checked
+            with a max-flow on the network before solving. Steps whose
+            demands cannot be delivered are logged with their bottlenecks
+            and, with `SKIP`, written as nan without solving or, with
+            `DEGRADE`, solved for the demands a maximum flow delivers
+        :param deadline: if set, seconds the solver is given per step. Steps
+            it does not solve in time are routed greedily instead, see
+            `GreedyRouter`, and logged as approximate with the optimality
+            gap of the routing
+        :param archive: whether to also append the objective and variables
+            to a compressed archive with random access by step, see
+            `blueark.simulation.archive`
+        :param run_id: id of the run, its directory is `run_<run_id>`.
+            Defaults to a new id of `new_run_id`
+        :param result_store: whether to also insert the objective and
+            variables of every step into an indexed SQLite store, which
+            answers range, threshold and aggregate queries, see
+            `blueark.simulation.result_store`
+        """
+        if solve_workers is not None and network_path is None:
+            raise ValueError('Solving in process requires a network file')
+        if solve_backend not in backends.backend_names():
+            raise ValueError('Unknown solver backend %r' % solve_backend)
+        if on_infeasible is not None and \
+                on_infeasible not in INFEASIBLE_ACTIONS:
+            raise ValueError('Expected on_infeasible in %s, got %r'
+                             % (INFEASIBLE_ACTIONS, on_infeasible))
+        if deadline is not None and deadline <= 0:
+            raise ValueError('Expected a positive deadline, got %r'
+                             % deadline)
         self.n_steps = n_steps
         self.consumer_data = consumer_data
-        self.run_dir_path = self.init_data_files(data_dir)
+        self.checkpoint_interval = checkpoint_interval
+        self.pyramid = pyramid
+        self.pyramid_writer = None
+        self.archive = archive
+        self.archive_writer = None
+        self.result_store = result_store
+        self.store = None
+        # the column names are stored along the first step written
+        self.columns_written = False
+        self.start_step = 0
+        self.network_path = network_path
+        self.solve_workers = solve_workers
+        self.solve_backend = solve_backend
+        self.executor = None
+        self.objective = None
+        self._maximizer_key = None
+        self.on_infeasible = on_infeasible
+        self.flow_check = None
+        self.deadline = deadline
+        self.router = None
+        timing_hooks = list(timing_hooks)
+        if profile_every:
+            timing_hooks.append(SamplingProfiler(profile_every,
+                                                 trace_memory=trace_memory))
+        if instrument or timing_hooks:
+            self.timer = instr.PhaseTimer(timing_hooks)
+        else:
+            self.timer = instr.NullTimer()
+        self.run_id = run_id or new_run_id()
+        if data_dir is not None:
+            self.run_dir_path = self.init_data_files(data_dir, self.run_id)
+            if checkpoint_interval:
+                options = dict(self.solve_options(),
+                               **self.output_options())
+                checkpoint.save_inputs(self.run_dir_path, consumer_data,
+                                       n_steps, checkpoint_interval,
+                                       network_path, options)
+
+    def solve_options(self):
+        """Keyword arguments deciding how steps are solved, which a resumed
+        run is created with again."""
+        return {'solve_workers': self.solve_workers,
+                'solve_backend': self.solve_backend,
+                'on_infeasible': self.on_infeasible,
+                'deadline': self.deadline}
+
+    def output_options(self):
+        """Keyword arguments deciding which outputs are written next to the
+        raw results, which a resumed run is created with again."""
+        return {'pyramid': self.pyramid,
+                'archive': self.archive,
+                'result_store': self.result_store}
+
+    @classmethod
+    def resume(cls, run_dir_path, checkpoint_interval=None):
+        """Continues a checkpointed run from its last checkpoint.
+
+        Output written after the checkpoint is truncated and the random
+        state is restored. The run solves its steps and writes its outputs
+        the way it was started with.
+
+        :param run_dir_path: directory of the run to resume
+        :param checkpoint_interval: checkpoint interval of the resumed run,
+            defaults to the interval stored with the last checkpoint
+        """
+        consumer_data, n_steps, stored_interval, network_path, options = \
+            checkpoint.load_inputs(run_dir_path)
+        state = checkpoint.load_checkpoint(run_dir_path)
+
+        if checkpoint_interval is None:
+            checkpoint_interval = stored_interval
+        run_name = os.path.basename(os.path.normpath(run_dir_path))
+        simulator = cls(consumer_data, n_steps, None,
+                        checkpoint_interval=checkpoint_interval,
+                        network_path=network_path,
+                        run_id=run_name[len('run_'):], **options)
+        simulator.run_dir_path = run_dir_path
+
+        if state is None:
+            # crashed before the first checkpoint, restart from scratch
+            Simulator._reset_data_files(run_dir_path)
+            Simulator._remove_indexed_outputs(run_dir_path)
+            return simulator
+
+        checkpoint.truncate_outputs(run_dir_path, state.file_offsets)
+        np.random.set_state(state.rng_state)
+        simulator.start_step = state.step
+
+        pyramid_dir = os.path.join(run_dir_path, PYRAMID_DIR_NAME)
+        if os.path.isdir(pyramid_dir):
+            simulator.pyramid = True
+            simulator.pyramid_writer = PyramidWriter.resume(pyramid_dir,
+                                                            state.step)
+        archive_path = os.path.join(run_dir_path, ARCHIVE_FILE_NAME)
+        if os.path.isfile(archive_path):
+            simulator.archive = True
+            simulator.archive_writer = ArchiveWriter.resume(archive_path,
+                                                            state.step)
+        store_path = os.path.join(run_dir_path, STORE_FILE_NAME)
+        if os.path.isfile(store_path):
+            simulator.result_store = True
+            simulator.store = ResultStore(store_path)
+            simulator.store.truncate(state.step)
+        print('Resuming', run_dir_path, 'at step', state.step)
+        return simulator
 
     @staticmethod
-    def init_data_files(data_dir):
-        if not os.path.exists(data_dir):
-            os.mkdir(data_dir)
+    def init_data_files(data_dir, run_id=None):
+        # runs launched concurrently may create the data directory at once
+        os.makedirs(data_dir, exist_ok=True)
 
-        run_data_dir = 'run_{}'.format(get_datetime_tag())
+        run_data_dir = 'run_{}'.format(run_id or new_run_id())
         run_dir_path = os.path.join(data_dir, run_data_dir)
         os.mkdir(run_dir_path)
-
-        with open(os.path.join(run_dir_path, VAR_FILE_NAME), 'w') as outfile:
-            outfile.write('\n')
-
-        with open(os.path.join(run_dir_path, OBJ_FILE_NAME), 'w') as outfile:
-            outfile.write('\n')
-
-        with open(os.path.join(run_dir_path, CONS_FILE_NAME), 'w') as outfile:
-            outfile.write('\n')
+        Simulator._reset_data_files(run_dir_path)
 
         print('Running in', run_dir_path)
         return run_dir_path
 
-    def execute_main_loop(self):
-
-        model = Model2()
+    @staticmethod
+    def _reset_data_files(run_dir_path):
+        for file_name in OUTPUT_FILE_NAMES:
+            with open(os.path.join(run_dir_path, file_name), 'w') as outfile:
+                outfile.write('\n')
 
-        for step in range(self.n_steps):
-            print('Running step', step, '...')
+    @staticmethod
+    def _remove_indexed_outputs(run_dir_path):
+        """Removes the pyramid, archive and result store of a run, they are
+        created again along the first step written."""
+        pyramid_dir = os.path.join(run_dir_path, PYRAMID_DIR_NAME)
+        if os.path.isdir(pyramid_dir):
+            shutil.rmtree(pyramid_dir)
+        store_path = os.path.join(run_dir_path, STORE_FILE_NAME)
+        for path in (os.path.join(run_dir_path, ARCHIVE_FILE_NAME),
+                     store_path, store_path + '-wal', store_path + '-shm'):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def load_model(self):
+        """Returns the model to simulate, compiled networks expose the same
+        interface as the sample models."""
+        if self.network_path is not None:
+            return load_network(self.network_path)
+        return Model2()
 
-            current_consumption = self._consumation_on_day(step)
+    def execute_main_loop(self):
 
+        model = self.load_model()
+        if self.on_infeasible is not None:
+            self.flow_check = FlowCheck(model.network())
+        if self.deadline is not None:
+            self.router = GreedyRouter(model.network())
+        if self.solve_workers is not None and self.solve_workers > 1:
+            self.executor = ProcessPoolExecutor(self.solve_workers)
+
+        try:
+            for step in range(self.start_step, self.n_steps):
+                with self.timer.step(step):
+                    self.run_step(model, step)
+
+                if self.checkpoint_interval and \
+                        ((step + 1) % self.checkpoint_interval == 0 or
+                         step + 1 == self.n_steps):
+                    self.save_checkpoint(step + 1)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+            if self.archive_writer is not None:
+                self.archive_writer.close()
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+
+        self.timer.export(self.run_dir_path)
+
+    def save_checkpoint(self, next_step):
+        """Records that all steps before `next_step` are fully written."""
+        if self.archive_writer is not None:
+            self.archive_writer.flush()
+        if self.store is not None:
+            self.store.flush()
+        checkpoint.sync_outputs(self.run_dir_path, OUTPUT_FILE_NAMES)
+        state = checkpoint.Checkpoint(
+            next_step, np.random.get_state(),
+            checkpoint.get_file_offsets(self.run_dir_path, OUTPUT_FILE_NAMES))
+        checkpoint.save_checkpoint(self.run_dir_path, state)
+
+    def run_step(self, model, step):
+        """Solves a single step and appends its results to the outputs."""
+        print('Running step', step, '...')
+
+        timer = self.timer
+        current_consumption = self._consumation_on_day(step)
+
+        if self.flow_check is not None:
+            with timer.phase(instr.FEASIBILITY):
+                solved_consumption = self.check_feasibility(
+                    step, current_consumption)
+            if solved_consumption is None:
+                with timer.phase(instr.OUTPUT):
+                    self.update_outfile(
+                        current_consumption,
+                        OrderedDict((name, np.nan) for name in
+                                    self.flow_check.var_names),
+                        np.nan)
+                return
+            current_consumption = solved_consumption
+
+        if self.solve_workers is not None:
+            solved = self.solve_in_process(step, model, current_consumption)
+            if solved is None:
+                solved = self.route_greedily(step, current_consumption)
+            var_val_dict, object_val = solved
+            with timer.phase(instr.OUTPUT):
+                self.update_outfile(current_consumption, var_val_dict,
+                                    object_val)
+            return
+
+        with timer.phase(instr.CONSTRAINTS):
             model.set_consumer_usage(*list(current_consumption.values()))
 
             constr_equations, turbine_list = model.gen_constraints()
 
+        with timer.phase(instr.PARSING):
             constrains, bounds = self.filter_equations(constr_equations)
 
             all_var_names = equ_parse.get_all_coefficients(constr_equations)
-            turbine_dict = Simulator.create_turbine_dict(turbine_list,
-                                                         all_var_names)
-
-            matrix, rhs_vec, equ_vec, sort_coeffs = \
-                equ_parse.build_matrix(constr_equations)
-
-            equ_parse.write_matrix_file(matrix, equ_vec, rhs_vec,
-                                        os.path.join(self.run_dir_path,
-                                                     MATRIX_FILE_NAME))
-            all_coefficients = equ_parse.get_all_coefficients(constr_equations)
+            # the columns follow the variables of the bounds file
+            sorted_names = sorted(all_var_names, key=lambda x: int(x[2:]))
+            turbine_dict = self.compile_objective(turbine_list,
+                                                  sorted_names).turbine_dict()
             bounds_equ_dict = self.create_bounds_equ_dict(bounds,
-                                                          all_coefficients)
+                                                          all_var_names)
+
+        with timer.phase(instr.MATRIX):
+            rows, cols, values, rhs_vec, equ_vec, _ = \
+                equ_parse.build_sparse_matrix(constrains, sorted_names)
+
+        with timer.phase(instr.WRITE):
+            equ_parse.write_sparse_matrix_file(
+                rows, cols, values, equ_vec, rhs_vec,
+                (len(constrains), len(sorted_names)),
+                os.path.join(self.run_dir_path, MATRIX_FILE_NAME),
+                binary=True)
             equ_parse.write_bounds_file(bounds_equ_dict, turbine_dict,
                                         os.path.join(self.run_dir_path,
                                                      BOUNDS_FILE_NAME),
                                         len(constrains))
 
-            call_cpp_optimizer(CPP_EXE_FILE_PATH,
-                               BOUNDS_FILE_NAME,
-                               MATRIX_FILE_NAME,
-                               self.run_dir_path,
-                               CPP_FILE_NAME)
+        with timer.phase(instr.SOLVE):
+            solved = call_cpp_optimizer(CPP_EXE_FILE_PATH,
+                                        BOUNDS_FILE_NAME,
+                                        MATRIX_FILE_NAME,
+                                        self.run_dir_path,
+                                        CPP_FILE_NAME,
+                                        timeout=self.deadline)
+            if solved:
+                var_val_dict, object_val = self.parse_cpp_out(
+                    self.run_dir_path, CPP_FILE_NAME)
+
+        if not solved:
+            var_val_dict, object_val = self.route_greedily(
+                step, current_consumption)
+
+        with timer.phase(instr.OUTPUT):
+            self.update_outfile(current_consumption, var_val_dict,
+                                object_val)
+
+    def check_feasibility(self, step, consumption):
+        """Runs the max-flow pre-check of a step.
+
+        Returns the consumption to solve the step for, which is degraded to
+        what the network can deliver with `DEGRADE`, or None if the step is
+        skipped.
+        """
+        result = self.flow_check.check(list(consumption.values()))
+        if result.feasible:
+            return consumption
+
+        names = self.flow_check.bottleneck_names(result)
+        print('Step', step, 'can only deliver', result.max_flow, 'of',
+              result.demand, 'bottlenecks:', ', '.join(names))
+        with open(os.path.join(self.run_dir_path, INFEASIBLE_FILE_NAME),
+                  'a') as out:
+            out.write('{} {} {} {}\n'.format(step, result.demand,
+                                             result.max_flow,
+                                             ','.join(names) or '-'))
+        if self.on_infeasible == SKIP:
+            return None
+        return OrderedDict(zip(consumption, result.delivered.tolist()))
+
+    def route_greedily(self, step, consumption):
+        """Routes a step the solver missed the deadline of greedily and
+        logs it as approximate with the optimality gap of the routing."""
+        with self.timer.phase(instr.FALLBACK):
+            routing = self.router.route(list(consumption.values()))
+
+        print('Step', step, 'missed the deadline, routed greedily with a '
+              'gap of at most {:.1%}'.format(routing.gap))
+        with open(os.path.join(self.run_dir_path, APPROXIMATE_FILE_NAME),
+                  'a') as out:
+            out.write('{} {} {} {}\n'.format(step, routing.objective,
+                                             routing.bound, routing.gap))
+        return (OrderedDict(zip(self.router.var_names,
+                                routing.values.tolist())),
+                routing.objective)
+
+    def solve_in_process(self, step, model, current_consumption):
+        """Solves a step of a compiled network with the solver backend, the
+        scipy backend decomposes it into its independent parts. Returns
+        None if the solver misses the deadline, steps without optimal
+        solution are logged and keep nan for the failed blocks."""
+        backend = backends.get_backend(self.solve_backend)
+        timer = self.timer
+        with timer.phase(instr.CONSTRAINTS):
+            model.set_consumer_usage(*list(current_consumption.values()))
 
-            var_val_dict, object_val = self.parse_cpp_out(self.run_dir_path,
-                                                          CPP_FILE_NAME)
+        with timer.phase(instr.MATRIX):
+            program = backend.prepare(model)
+            self.set_objective(Objective(program.var_names,
+                                         program.objective))
 
-            self.update_outfile(current_consumption, var_val_dict, object_val)
+        with timer.phase(instr.SOLVE):
+            if self.deadline is None:
+                solution = backend.solve(program, self.solve_workers,
+                                         executor=self.executor)
+            else:
+                solution = backends.solve_within(backend, program,
+                                                 self.deadline,
+                                                 self.solve_workers)
+        if solution is None:
+            return None
+        if solution.status != 0:
+            self.log_failed_step(step, solution.status)
+
+        var_val_dict = OrderedDict(zip(solution.var_names,
+                                       solution.values.tolist()))
+        return var_val_dict, solution.objective
+
+    def log_failed_step(self, step, status):
+        """Logs a step the solver stopped on with the linprog `status`, e.g.
+        2 for infeasible demands the pre-check was not asked to catch."""
+        print('Step', step, 'has no optimal solution, the solver stopped '
+              'with status', status)
+        with open(os.path.join(self.run_dir_path, FAILED_FILE_NAME),
+                  'a') as out:
+            out.write('{} {}\n'.format(step, status))
 
     @staticmethod
     def parse_cpp_out(data_dir, cpp_file_name):
@@ -121,20 +498,24 @@ class Simulator:
     def _consumation_on_day(self, step):
         return {name: cons[step] for name, cons in self.consumer_data.items()}
 
-    @staticmethod
-    def create_turbine_dict(turbine_list, all_coefficients):
-
-        turbine_dict = {}
-
-        for item in turbine_list:
-            value, ending = item.split('*')
-            turbine_dict[ending.strip()] = float(value)
-
-        for name in all_coefficients:
-            if name not in turbine_dict.keys():
-                turbine_dict[name] = 0.0
-
-        return turbine_dict
+    def compile_objective(self, maximizers, var_names):
+        """Returns the Objective of the maximizer strings over the variables
+        `var_names`. It is only parsed again once the maximizers or the
+        variables changed since the previous step."""
+        key = (maximizers, var_names)
+        if key != self._maximizer_key:
+            self._maximizer_key = key
+            self.set_objective(Objective.from_maximizers(maximizers,
+                                                         var_names))
+        return self.objective
+
+    def set_objective(self, objective):
+        """Makes `objective` the objective of the run and stores it in the
+        run directory whenever it changed."""
+        if objective != self.objective:
+            self.objective = objective
+            objective.save(os.path.join(self.run_dir_path,
+                                        OBJECTIVE_VECTOR_FILE_NAME))
 
     @staticmethod
     def create_bounds_equ_dict(bounds_equ, all_coefficients):
@@ -174,6 +555,12 @@ class Simulator:
 
     def update_outfile(self, current_consumption, var_val_dict, object_val):
 
+        if not self.columns_written:
+            write_columns(self.run_dir_path, {
+                VAR_FILE_NAME: list(var_val_dict.keys()),
+                CONS_FILE_NAME: [str(key) for key in current_consumption]})
+            self.columns_written = True
+
         with open(os.path.join(self.run_dir_path, CONS_FILE_NAME), 'a') as out:
             values = [str(item) for item in list(current_consumption.values())]
             out.write(' '.join(values) + '\n')
@@ -185,23 +572,54 @@ class Simulator:
             values = [str(item) for item in list(var_val_dict.values())]
             out.write(' '.join(values) + '\n')
 
+        if self.pyramid:
+            if self.pyramid_writer is None:
+                self.pyramid_writer = PyramidWriter(
+                    os.path.join(self.run_dir_path, PYRAMID_DIR_NAME),
+                    ['objective'] + list(var_val_dict.keys()))
+            self.pyramid_writer.append([object_val] +
+                                       list(var_val_dict.values()))
+
+        if self.archive:
+            if self.archive_writer is None:
+                self.archive_writer = ArchiveWriter(
+                    os.path.join(self.run_dir_path, ARCHIVE_FILE_NAME),
+                    ['objective'] + list(var_val_dict.keys()))
+            self.archive_writer.append([object_val] +
+                                       list(var_val_dict.values()))
+
+        if self.result_store:
+            if self.store is None:
+                self.store = ResultStore(
+                    os.path.join(self.run_dir_path, STORE_FILE_NAME),
+                    ['objective'] + list(var_val_dict.keys()))
+            self.store.append([object_val] + list(var_val_dict.values()))
+
 
 def call_cpp_optimizer(exe_path, bounds_file_name,
-                       matrix_file_name, data_dir_path, cpp_file_name):
+                       matrix_file_name, data_dir_path, cpp_file_name,
+                       timeout=None):
     """Runs a subprocess on the cpp optimizer and gets the """
 
     if not os.path.isfile(exe_path):
         raise IOError('Cpp executable does not exist, needs to be compiled.')
 
-    call_str = '{} {} {} {}'.format(CPP_EXE_FILE_PATH,
-                                    bounds_file_name,
-                                    matrix_file_name,
-                                    cpp_file_name)
-
-    subprocess.call(call_str, cwd=data_dir_path, shell=True)
+    # without a shell, the optimizer itself is killed on timeout
+    try:
+        subprocess.call([exe_path, bounds_file_name, matrix_file_name,
+                         cpp_file_name], cwd=data_dir_path, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False
+    return True
 
 
 def get_datetime_tag():
     """Returns a datetime string in the format SSMMHH_ddmmYY."""
 
     return datetime.datetime.now().strftime('%H%M%S_%d%m%Y')
+
+
+def new_run_id():
+    """Returns a unique run id, the datetime tag followed by a random
+    suffix, such that runs started within the same second do not collide."""
+    return '{}_{}'.format(get_datetime_tag(), uuid.uuid4().hex[:8])
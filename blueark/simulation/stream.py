@@ -0,0 +1,117 @@
+"""Incremental reading of the result files of a running simulation.
+
+The simulator appends one line per step to the consumption, objective and
+variable files. A `ResultTailer` remembers how far it has read each of them
+and only parses lines appended since the last call.
+"""
+
+import os
+
+from blueark.simulation.simulator import CONS_FILE_NAME, OBJ_FILE_NAME, \
+    VAR_FILE_NAME
+
+
+class _FileTail:
+    """Complete lines appended to a single file since the last read."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = b''
+        self.seen_header = False
+
+    def truncated(self):
+        """Whether the file shrank below what was read, e.g. since a resumed
+        run dropped the steps after its last checkpoint."""
+        try:
+            return os.path.getsize(self.path) < self.offset
+        except FileNotFoundError:
+            return self.offset > 0
+
+    def reset(self):
+        self.offset = 0
+        self.partial = b''
+        self.seen_header = False
+
+    def read_lines(self):
+        try:
+            with open(self.path, 'rb') as infile:
+                infile.seek(self.offset)
+                data = infile.read()
+        except FileNotFoundError:
+            return []
+
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        # the last element is either empty or a line still being written
+        self.partial = lines.pop()
+
+        if lines and not self.seen_header:
+            # init_data_files starts every output file with an empty line
+            self.seen_header = True
+            lines = lines[1:]
+        return lines
+
+
+class ResultTailer:
+    """Reads the steps a simulation appended to its run dir since the last
+    call of `read_new_steps`.
+
+    Arguments
+    ---------
+    run_dir_path: run directory of the simulation to follow
+    """
+
+    def __init__(self, run_dir_path):
+        self.run_dir_path = run_dir_path
+        self.next_step = 0
+        self._tails = {name: _FileTail(os.path.join(run_dir_path, name))
+                       for name in (CONS_FILE_NAME, OBJ_FILE_NAME,
+                                    VAR_FILE_NAME)}
+        self._pending = {name: [] for name in self._tails}
+
+    def read_new_steps(self):
+        """Returns a list of dicts holding step, objective, consumptions and
+        variables of every step that was fully written since the last call.
+
+        Once the files were truncated, the steps are read again from the
+        first step that is no longer fully written, such that steps
+        rewritten by a resumed run are returned again.
+        """
+        if any(tail.truncated() for tail in self._tails.values()):
+            self._resync()
+
+        for name, tail in self._tails.items():
+            self._pending[name] += tail.read_lines()
+
+        n_complete = min(len(lines) for lines in self._pending.values())
+        steps = []
+        for idx in range(n_complete):
+            steps.append({
+                'step': self.next_step + idx,
+                'objective': float(self._pending[OBJ_FILE_NAME][idx]),
+                'consumptions': _parse_values(
+                    self._pending[CONS_FILE_NAME][idx]),
+                'variables': _parse_values(
+                    self._pending[VAR_FILE_NAME][idx])})
+
+        for name in self._pending:
+            del self._pending[name][:n_complete]
+        self.next_step += n_complete
+        return steps
+
+    def _resync(self):
+        """Reads all files from their start, skipping the steps that were
+        returned before and are still complete."""
+        for name, tail in self._tails.items():
+            tail.reset()
+            self._pending[name] = tail.read_lines()
+        kept = min(self.next_step,
+                   min(len(lines) for lines in self._pending.values()))
+        for name in self._pending:
+            del self._pending[name][:kept]
+        self.next_step = kept
+
+
+def _parse_values(line):
+    return [float(value) for value in line.split()]
@@ -0,0 +1,63 @@
+"""Archives the objective and variables of a finished simulation run.
+
+Usage: python scripts/archive_run.py RUN_DIR [--codec lzma] [--remove-text]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+import context  # noqa: F401, sets up the import path
+from blueark.model.objective import Objective
+from blueark.simulation.archive import (ARCHIVE_FILE_NAME, CODECS, ZLIB,
+                                        build_archive)
+from blueark.simulation.io import load_data
+from blueark.simulation.simulator import (OBJ_FILE_NAME,
+                                          OBJECTIVE_VECTOR_FILE_NAME,
+                                          VAR_FILE_NAME)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compress the results of '
+                                                 'a simulation run.')
+    parser.add_argument('run_dir')
+    parser.add_argument('--codec', default=ZLIB, choices=sorted(CODECS))
+    parser.add_argument('--remove-text', action='store_true',
+                        help='delete the text files of the variables and '
+                             'the objective afterwards')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    text_paths = [os.path.join(args.run_dir, name)
+                  for name in (OBJ_FILE_NAME, VAR_FILE_NAME)]
+    objective = np.atleast_1d(load_data(text_paths[0]))
+    variables = np.atleast_2d(load_data(text_paths[1]))
+    if variables.shape[0] != objective.shape[0]:
+        variables = variables.T
+
+    vector_path = os.path.join(args.run_dir, OBJECTIVE_VECTOR_FILE_NAME)
+    if os.path.isfile(vector_path):
+        var_names = Objective.load(vector_path).var_names
+    else:
+        var_names = ['var_{}'.format(idx)
+                     for idx in range(variables.shape[1])]
+
+    archive_path = os.path.join(args.run_dir, ARCHIVE_FILE_NAME)
+    build_archive(np.column_stack((objective, variables)), archive_path,
+                  ['objective'] + var_names, codec=args.codec)
+
+    text_size = sum(os.path.getsize(path) for path in text_paths)
+    archive_size = os.path.getsize(archive_path)
+    print('{} steps, {} bytes of text, {} bytes archived ({:.1f}x)'.format(
+        len(objective), text_size, archive_size,
+        text_size / max(archive_size, 1)))
+    if args.remove_text:
+        for path in text_paths:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Builds the downsampling pyramid of a finished simulation run.
+
+Usage: python scripts/build_pyramid.py RUN_DIR
+"""
+
+import os
+import sys
+
+import numpy as np
+
+import context  # noqa: F401, sets up the import path
+from blueark.simulation.io import load_data, read_columns
+from blueark.simulation.pyramid import build_pyramid, PYRAMID_DIR_NAME
+from blueark.simulation.simulator import OBJ_FILE_NAME, VAR_FILE_NAME
+
+
+def main(run_dir_path):
+    objective = np.atleast_1d(load_data(os.path.join(run_dir_path,
+                                                     OBJ_FILE_NAME)))
+    variables = np.atleast_2d(load_data(os.path.join(run_dir_path,
+                                                     VAR_FILE_NAME)))
+    if variables.shape[0] != objective.shape[0]:
+        variables = variables.T
+
+    # the symbols a live run names its pyramid columns with
+    var_names = read_columns(run_dir_path).get(VAR_FILE_NAME)
+    if var_names is None:
+        # runs written before the column names were stored
+        var_names = ['var_{}'.format(idx)
+                     for idx in range(variables.shape[1])]
+    elif len(var_names) != variables.shape[1]:
+        raise ValueError('{} names {} columns of the variables, found {}'
+                         .format(run_dir_path, len(var_names),
+                                 variables.shape[1]))
+    build_pyramid(np.column_stack((objective, variables)),
+                  os.path.join(run_dir_path, PYRAMID_DIR_NAME),
+                  ['objective'] + var_names)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,73 @@
+"""Launches a sweep of simulation runs concurrently and records them in the
+run index, or lists the indexed runs.
+
+Usage: python scripts/launch_runs.py NETWORK [NETWORK ...] [--seeds 8]
+       python scripts/launch_runs.py --list [--order-by energy]
+"""
+
+import argparse
+import os
+
+import context  # noqa: F401, sets up the import path
+from blueark.optmization import backends
+from blueark.simulation.launcher import RunConfig, launch_runs
+from blueark.simulation.run_index import COLUMN_NAMES, RunIndex
+from blueark.simulation.simulator import INFEASIBLE_ACTIONS
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+INDEX_PATH = os.path.join(DATA_DIR, 'runs.sqlite')
+
+LISTED_COLUMNS = ('run_id', 'status', 'network', 'seed', 'n_steps',
+                  'wall_time_s', 'energy', 'failed_steps')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run many simulations at '
+                                                 'once and index them.')
+    parser.add_argument('networks', nargs='*', metavar='NETWORK',
+                        help='JSON or TOML network files, every network is '
+                             'run with every seed')
+    parser.add_argument('--seeds', type=int, default=4,
+                        help='number of demand seeds per network')
+    parser.add_argument('--steps', type=int, default=30)
+    parser.add_argument('--workers', type=int,
+                        help='runs executed at once, defaults to the cpu '
+                             'count')
+    parser.add_argument('--solve-backend', default=backends.DEFAULT_BACKEND,
+                        choices=backends.backend_names())
+    parser.add_argument('--on-infeasible', choices=INFEASIBLE_ACTIONS)
+    parser.add_argument('--deadline', type=float, metavar='SECONDS')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--index', default=INDEX_PATH,
+                        help='SQLite run index')
+    parser.add_argument('--list', action='store_true',
+                        help='print the indexed runs instead of launching')
+    parser.add_argument('--order-by', default='started', choices=COLUMN_NAMES)
+    return parser.parse_args()
+
+
+def print_runs(index_path, order_by):
+    with RunIndex(index_path) as index:
+        runs = index.find(order_by=order_by, descending=order_by != 'started')
+    print(' '.join(LISTED_COLUMNS))
+    for run in runs:
+        print(' '.join(str(run[name]) for name in LISTED_COLUMNS))
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        print_runs(args.index, args.order_by)
+        return
+
+    configs = [RunConfig(network, args.steps, seed, args.solve_backend,
+                         args.on_infeasible, args.deadline)
+               for network in args.networks for seed in range(args.seeds)]
+    launch_runs(configs, args.data_dir, args.index, max_workers=args.workers,
+                on_finished=lambda run_id, status: print(run_id, status))
+    print('Runs indexed in', args.index)
+
+
+if __name__ == '__main__':
+    main()
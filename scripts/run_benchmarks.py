@@ -0,0 +1,63 @@
+"""Runs the scale benchmarks on generated networks and stores the results.
+
+Usage: python scripts/run_benchmarks.py [--sizes 100 1000] [--compare OLD]
+"""
+
+import argparse
+import os
+import sys
+
+import context  # noqa: F401, sets up the import path
+from blueark.benchmarks import scale
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'benchmarks')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks constraint '
+                                                 'generation, matrix assembly '
+                                                 'and solving.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=list(scale.DEFAULT_SIZES))
+    parser.add_argument('--array-sizes', type=int, nargs='+', default=[],
+                        help='sizes only benchmarked as array networks, '
+                             'e.g. 1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fan-out', type=float, default=3.0)
+    parser.add_argument('--sharing', type=float, default=0.1)
+    parser.add_argument('--turbine-density', type=float, default=0.3)
+    parser.add_argument('--dense-limit', type=int, default=scale.DENSE_LIMIT)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--compare', metavar='OLD_REPORT',
+                        help='print the ratios against an older report')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = scale.run_suite(args.sizes, repeat=args.repeat,
+                             measure_memory=not args.no_memory,
+                             dense_limit=args.dense_limit,
+                             array_sizes=args.array_sizes,
+                             depth=args.depth, fan_out=args.fan_out,
+                             sharing=args.sharing,
+                             turbine_density=args.turbine_density)
+    path = scale.save_results(report, args.results_dir)
+
+    for result in report['results'] + report['array_results']:
+        print(result)
+    print('Results stored in', path)
+
+    if args.compare:
+        ratios = scale.compare_results(scale.load_results(args.compare),
+                                       report)
+        for n_entities, size_ratios in sorted(ratios.items()):
+            print(n_entities, 'entities, new / old:', size_ratios)
+
+
+if __name__ == '__main__':
+    main()
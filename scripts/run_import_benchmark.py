@@ -0,0 +1,39 @@
+"""Measures the import time of the entry points of the package.
+
+Usage: python scripts/run_import_benchmark.py [--modules MODULE ...]
+"""
+
+import argparse
+import os
+
+import context  # noqa: F401, sets up the import path
+from blueark.benchmarks import import_time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'benchmarks')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measures how long importing '
+                                                 'the package modules takes '
+                                                 'in a fresh interpreter.')
+    parser.add_argument('--modules', nargs='+',
+                        default=list(import_time.DEFAULT_MODULES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = import_time.run_suite(args.modules, repeat=args.repeat)
+    path = import_time.save_results(report, args.results_dir)
+
+    for result in report['results']:
+        print('{module}: {import_s:.3f} s, heavy modules: {heavy}'.format(
+            heavy=', '.join(result['heavy_modules']) or 'none', **result))
+    print('Results stored in', path)
+
+
+if __name__ == '__main__':
+    main()
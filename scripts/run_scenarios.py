@@ -0,0 +1,64 @@
+"""Solves many random demand scenarios on a network and stores the
+percentiles of the generated power and of every variable.
+
+Usage: python scripts/run_scenarios.py NETWORK [--scenarios 1000]
+"""
+
+import argparse
+import os
+
+import context  # noqa: F401, sets up the import path
+from blueark.model.compiler import load_network
+from blueark.optmization import backends
+from blueark.simulation import scenarios
+from blueark.simulation.simulator import get_datetime_tag
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'scenarios')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Monte Carlo simulation of '
+                                                 'uncertain consumer demand.')
+    parser.add_argument('network', help='JSON or TOML network file')
+    parser.add_argument('--scenarios', type=int, default=1000)
+    parser.add_argument('--steps', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes, defaults to the '
+                             'cpu count')
+    parser.add_argument('--percentiles', type=float, nargs='+',
+                        default=list(scenarios.DEFAULT_PERCENTILES))
+    parser.add_argument('--solve-backend', default=backends.DEFAULT_BACKEND,
+                        choices=backends.backend_names())
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    return parser.parse_args()
+
+
+def print_progress(report):
+    print('{} scenarios, energy percentiles: {}'.format(
+        report.n_scenarios, ' '.join('{:.1f}'.format(value)
+                                     for value in report.energy)))
+
+
+def main():
+    args = parse_args()
+    n_consumers = len(load_network(args.network).consumers)
+    demands = scenarios.draw_demands(args.scenarios, n_consumers, args.steps,
+                                     seed=args.seed)
+    results, report = scenarios.run_scenarios(
+        args.network, demands, max_workers=args.workers,
+        percentiles=args.percentiles, on_progress=print_progress,
+        solve_backend=args.solve_backend)
+
+    if not os.path.exists(args.results_dir):
+        os.makedirs(args.results_dir)
+    path = os.path.join(args.results_dir,
+                        'scenarios_{}.npz'.format(get_datetime_tag()))
+    scenarios.save_report(report, results.var_names, path)
+    print('Failed steps:', int((results.status != 0).sum()))
+    print('Percentiles stored in', path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
+import argparse
 import os
 import sys
 
+from blueark.model.compiler import load_network
+from blueark.optmization import backends
 from blueark.simulation.data_augmentation import DataAugmenter
-from blueark.simulation.simulator import Simulator
+from blueark.simulation.simulator import INFEASIBLE_ACTIONS, Simulator
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, PROJECT_ROOT)
@@ -10,16 +13,83 @@ DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 
 N_CONSUMERS = 5
 N_TIME_STEPS = 1000
+CHECKPOINT_INTERVAL = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs a blue ark simulation.')
+    parser.add_argument('--resume', metavar='RUN_DIR',
+                        help='continue the run in RUN_DIR from its last '
+                             'checkpoint')
+    parser.add_argument('--checkpoint-interval', type=int,
+                        default=CHECKPOINT_INTERVAL,
+                        help='number of steps between two checkpoints, '
+                             '0 disables checkpointing')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time every phase of every step and export '
+                             'the timings into the run directory')
+    parser.add_argument('--profile-every', type=int, metavar='N',
+                        help='profile every N-th step with cProfile and '
+                             'tracemalloc')
+    parser.add_argument('--no-trace-memory', action='store_true',
+                        help='only profile calls, not allocations')
+    parser.add_argument('--network', metavar='FILE',
+                        help='JSON or TOML network file to simulate instead '
+                             'of the sample model')
+    parser.add_argument('--solve-workers', type=int, metavar='N',
+                        help='solve in process with scipy, independent parts '
+                             'of the network on N worker processes, '
+                             'requires --network')
+    parser.add_argument('--solve-backend', default=backends.DEFAULT_BACKEND,
+                        choices=backends.backend_names(),
+                        help='solver used with --solve-workers, only this '
+                             'solver is imported')
+    parser.add_argument('--on-infeasible', choices=INFEASIBLE_ACTIONS,
+                        help='check the demands of every step with a '
+                             'max-flow first and skip or degrade the steps '
+                             'the network cannot deliver')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help='time budget of the solver per step, steps '
+                             'it misses are routed greedily and logged as '
+                             'approximate')
+    parser.add_argument('--archive', action='store_true',
+                        help='also write the results into a compressed '
+                             'archive with random access by step')
+    parser.add_argument('--result-store', action='store_true',
+                        help='also insert the results into an indexed '
+                             'SQLite store for range and threshold queries')
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
+    if args.resume:
+        simulation = Simulator.resume(args.resume)
+        simulation.execute_main_loop()
+        return
+
+    n_consumers = N_CONSUMERS
+    if args.network:
+        n_consumers = len(load_network(args.network).consumers)
 
-    data_maker = DataAugmenter(N_CONSUMERS, N_TIME_STEPS)
+    data_maker = DataAugmenter(n_consumers, N_TIME_STEPS)
 
     all_consumptions = data_maker.generate_consumptions()
 
     simulation = Simulator(all_consumptions,
-                           N_TIME_STEPS, DATA_DIR)
+                           N_TIME_STEPS, DATA_DIR,
+                           checkpoint_interval=args.checkpoint_interval,
+                           instrument=args.instrument,
+                           profile_every=args.profile_every,
+                           trace_memory=not args.no_trace_memory,
+                           network_path=args.network,
+                           solve_workers=args.solve_workers,
+                           solve_backend=args.solve_backend,
+                           on_infeasible=args.on_infeasible,
+                           deadline=args.deadline,
+                           archive=args.archive,
+                           result_store=args.result_store)
 
     simulation.execute_main_loop()
 
@@ -0,0 +1,63 @@
+"""Sweeps the capacities of pipes or tanks of a network and stores the
+optimal power of every grid point as csv.
+
+Usage: python scripts/sweep_capacities.py NETWORK --axis ID START STOP NUM
+       [--axis ID START STOP NUM ...] [--demands D0 D1 ...]
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+import context  # noqa: F401, sets up the import path
+from blueark.model.compiler import load_network
+from blueark.optmization.sweep import sweep_capacities
+from blueark.simulation.simulator import get_datetime_tag
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'data', 'sweeps')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Optimal power over a grid '
+                                                 'of capacities.')
+    parser.add_argument('network', help='JSON or TOML network file')
+    parser.add_argument('--axis', nargs=4, action='append', required=True,
+                        metavar=('ID', 'START', 'STOP', 'NUM'),
+                        help='entity id of a pipe or tank and NUM evenly '
+                             'spaced capacities from START to STOP')
+    parser.add_argument('--demands', type=float, nargs='+',
+                        help='demand of every consumer, defaults to the '
+                             'demands of the network file')
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes, defaults to the '
+                             'cpu count')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    axes = [(entity_id, np.linspace(float(start), float(stop), int(num)))
+            for entity_id, start, stop, num in args.axis]
+    table = sweep_capacities(load_network(args.network), axes,
+                             demands=args.demands, max_workers=args.workers)
+
+    if not os.path.exists(args.results_dir):
+        os.makedirs(args.results_dir)
+    path = os.path.join(args.results_dir,
+                        'sweep_{}.csv'.format(get_datetime_tag()))
+    with open(path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(list(table))
+        writer.writerows(zip(*(column.tolist()
+                               for column in table.values())))
+    print('Solved {} blocks for {} grid points'.format(
+        int(table['solved_blocks'].sum()), len(table['power'])))
+    print('Sweep stored in', path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Fixtures shared by the tests."""
+
+import importlib.util
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+from blueark.simulation.simulator import Simulator
+
+MODEL2_PATH = os.path.join(os.path.dirname(__file__), '..', 'blueark',
+                           'model', 'networks', 'model2.json')
+# the five consumers of Model2
+N_CONSUMERS = 5
+
+HAS_EXCEL = importlib.util.find_spec('pandas') is not None and \
+    importlib.util.find_spec('openpyxl') is not None
+
+
+def copy_model2(dir_path):
+    """Copies the Model2 file into `dir_path` so that its compiled network is
+    cached there rather than in the source tree, returns the new path."""
+    os.makedirs(dir_path, exist_ok=True)
+    return shutil.copy(MODEL2_PATH, dir_path)
+
+
+def model2_demands(n_steps, seed=0):
+    """Seeded demands of the consumers of Model2 between 100 and 300, the
+    global random state is left untouched."""
+    random_state = np.random.RandomState(seed)
+    return OrderedDict((idx, random_state.uniform(100, 300, n_steps))
+                       for idx in range(N_CONSUMERS))
+
+
+def simulate_model2(data_dir, consumer_data, **kwargs):
+    """Simulates Model2 solved in process on a single worker for as many
+    steps as `consumer_data` holds and returns the finished Simulator."""
+    n_steps = len(next(iter(consumer_data.values())))
+    simulator = Simulator(consumer_data, n_steps, data_dir,
+                          network_path=copy_model2(data_dir), solve_workers=1,
+                          **kwargs)
+    simulator.execute_main_loop()
+    return simulator
+
+
+def write_workbook(file_path, sheets):
+    """Writes a dict of sheet name, dict of columns pairs as excel file."""
+    import pandas as pd
+    with pd.ExcelWriter(file_path) as writer:
+        for sheet, columns in sheets.items():
+            pd.DataFrame(columns).to_excel(writer, sheet_name=sheet,
+                                           index=False)
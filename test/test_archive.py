@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""Tests the compressed archive of simulation results."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation.archive import (ARCHIVE_FILE_NAME, LZMA, Archive,
+                                        ArchiveWriter, build_archive)
+from blueark.simulation.io import load_data
+from blueark.simulation.simulator import OBJ_FILE_NAME, VAR_FILE_NAME
+from test.helpers import model2_demands, simulate_model2
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.random((1003, 4))
+        # a saturated pipe and a step without a solution
+        self.values[:, 1] = 200.0
+        self.values[17] = np.nan
+        self.names = ['objective', 'x_0', 'x_1', 'x_2']
+
+    def test_step_ranges_match_raw_values(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, ARCHIVE_FILE_NAME)
+            writer = ArchiveWriter(path, self.names, chunk_steps=100)
+            for chunk in np.array_split(self.values, 37):
+                writer.append_rows(chunk)
+            writer.close()
+
+            archive = Archive(path)
+            self.assertEqual(archive.n_steps, 1003)
+            self.assertEqual(len(archive.starts), 11)
+            np.testing.assert_array_equal(archive.read(), self.values)
+            np.testing.assert_array_equal(archive.read(99, 301),
+                                          self.values[99:301])
+            np.testing.assert_array_equal(
+                archive.read(950, 2000, ['x_1', 'objective']),
+                self.values[950:, [2, 0]])
+            self.assertEqual(archive.read(500, 500).shape, (0, 4))
+
+    def test_unchanged_values_are_compressed(self):
+        values = np.repeat(self.values[:1], 1000, axis=0)
+        values[:, 0] = np.arange(1000)
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, ARCHIVE_FILE_NAME)
+            build_archive(values, path, self.names, codec=LZMA)
+            self.assertLess(os.path.getsize(path), values.nbytes / 50)
+            np.testing.assert_array_equal(Archive(path).read(), values)
+
+    def test_truncated_chunks_are_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, ARCHIVE_FILE_NAME)
+            build_archive(self.values, path, self.names, chunk_steps=400)
+            with open(path, 'r+b') as outfile:
+                outfile.truncate(os.path.getsize(path) - 1)
+
+            archive = Archive(path)
+            self.assertEqual(archive.n_steps, 800)
+            np.testing.assert_array_equal(archive.read(),
+                                          self.values[:800])
+
+    def test_resume_drops_later_steps(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, ARCHIVE_FILE_NAME)
+            writer = ArchiveWriter(path, self.names, chunk_steps=100)
+            writer.append_rows(self.values[:700])
+            writer.close()
+
+            writer = ArchiveWriter.resume(path, 517)
+            writer.append_rows(self.values[517:])
+            writer.close()
+            np.testing.assert_array_equal(Archive(path).read(), self.values)
+
+            with self.assertRaises(ValueError):
+                ArchiveWriter.resume(path, 2000)
+            with self.assertRaises(ValueError):
+                ArchiveWriter(path, self.names, codec='bz2')
+
+
+class TestSimulatorArchive(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_archive_matches_text_output(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = simulate_model2(tmpdirpath, model2_demands(4),
+                                           archive=True).run_dir_path
+
+            archive = Archive(os.path.join(run_dir_path, ARCHIVE_FILE_NAME))
+            self.assertEqual(archive.names[0], 'objective')
+            np.testing.assert_allclose(
+                archive.read(columns=['objective'])[:, 0],
+                load_data(os.path.join(run_dir_path, OBJ_FILE_NAME)))
+            np.testing.assert_allclose(
+                archive.read()[:, 1:],
+                load_data(os.path.join(run_dir_path, VAR_FILE_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""Tests the array backed network form."""
+
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.model.arrays import ArrayNetwork
+from blueark.model.compiler import CompiledNetwork, load_network
+from blueark.model.generator import generate_network, random_structure
+from blueark.model.network import Network
+from blueark.optmization import decomposition
+from test.helpers import MODEL2_PATH
+
+
+def canonical_rows(network):
+    """Rows of a compiled or array network independent of their order."""
+    arrays = network.arrays()
+    rows = set()
+    for row, (rhs, equ) in enumerate(zip(arrays['rhs'], arrays['equ'])):
+        start, end = arrays['indptr'][row], arrays['indptr'][row + 1]
+        coefficients = frozenset(
+            (arrays['var_names'][var], float(value))
+            for var, value in zip(arrays['indices'][start:end],
+                                  arrays['data'][start:end]))
+        rows.add((coefficients, float(rhs), int(equ)))
+    return rows
+
+
+class TestArrayNetwork(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def assert_same_problem(self, network):
+        compiled = CompiledNetwork(network)
+        arrays = ArrayNetwork.from_network(network)
+        self.assertEqual(arrays.var_names, compiled.arrays()['var_names'])
+        self.assertEqual(canonical_rows(arrays), canonical_rows(compiled))
+        np.testing.assert_array_equal(arrays.arrays()['objective'],
+                                      compiled.arrays()['objective'])
+
+    def test_matches_compiled_model2(self):
+        compiled = load_network(MODEL2_PATH, use_cache=False)
+        compiled.set_consumer_usage(150, 120, 100, 180, 200)
+        arrays = ArrayNetwork.from_network(Network(
+            [compiled.entities[idx] for idx in compiled.source_indices]))
+        self.assertEqual(canonical_rows(arrays), canonical_rows(compiled))
+
+    def test_matches_compiled_generated_network(self):
+        SymbolGenerator.reset()
+        self.assert_same_problem(generate_network(500, sharing=0.3, seed=8))
+
+    def test_structure_matches_generated_network(self):
+        SymbolGenerator.reset()
+        network = generate_network(300, seed=2)
+        from_objects = ArrayNetwork.from_network(network)
+        from_structure = ArrayNetwork.from_structure(
+            *random_structure(300, seed=2))
+        self.assertEqual(canonical_rows(from_objects),
+                         canonical_rows(from_structure))
+
+    def test_decomposes_like_compiled(self):
+        SymbolGenerator.reset()
+        network = generate_network(300, sharing=0.0, seed=6)
+        program = decomposition.linear_program(
+            ArrayNetwork.from_network(network))
+        self.assertEqual(len(decomposition.find_components(program)),
+                         len(network.sources))
+
+
+if __name__ == '__main__':
+    unittest.main()
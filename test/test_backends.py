@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""Tests the solver backend registry and the lazy imports it relies on."""
+
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from blueark.benchmarks import import_time
+from blueark.optmization import backends, decomposition
+from blueark.simulation.simulator import Simulator
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_backends_are_loaded_once_on_first_use(self):
+        calls = []
+
+        def loader():
+            calls.append(None)
+            return backends.Backend('dummy', None, None)
+
+        backends.register_backend('dummy', loader)
+        try:
+            self.assertIn('dummy', backends.backend_names())
+            self.assertEqual(calls, [])
+            backend = backends.get_backend('dummy')
+            self.assertIs(backends.get_backend('dummy'), backend)
+            self.assertEqual(len(calls), 1)
+        finally:
+            backends._LOADERS.pop('dummy')
+            backends._BACKENDS.pop('dummy')
+
+        with self.assertRaises(ValueError):
+            backends.get_backend('dummy')
+        with self.assertRaises(ValueError):
+            Simulator({}, 1, None, solve_backend='dummy')
+
+    def test_scipy_backend_solves_programs(self):
+        backend = backends.get_backend(backends.SCIPY)
+        program = decomposition.LinearProgram(
+            ['x_0', 'x_1', 'x_2'], np.array([1.0, 2.0, 0.0]),
+            csr_matrix(np.array([[1.0, 1.0, 0.0], [0.0, 1.0, -1.0]])),
+            np.array([10.0, 0.0]), np.array([-1, 0]),
+            np.array([-1.0, -1.0, 4.0]), {})
+        solution = backend.solve(program)
+        self.assertEqual(solution.status, 0)
+        np.testing.assert_allclose(solution.values, [6, 4, 4], atol=1e-7)
+        self.assertAlmostEqual(solution.objective, 14.0)
+
+    def test_simulator_import_is_light(self):
+        result = import_time.measure_import('blueark.simulation.simulator',
+                                            repeat=1)
+        self.assertEqual(result['heavy_modules'], [])
+        self.assertGreater(result['import_s'], 0)
+
+    def test_data_loader_import_is_light(self):
+        result = import_time.measure_import(
+            'blueark.data_aggregation.load_data', repeat=1)
+        self.assertEqual(result['heavy_modules'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""Tests the cache of converted excel sheets."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from blueark.data_aggregation.cache import (PICKLE_FORMAT, SheetCache,
+                                            default_cache_dir)
+from blueark.data_aggregation.load_data import (get_all_file_paths,
+                                                load_all_blueark_data)
+from test.helpers import HAS_EXCEL, write_workbook
+
+
+@unittest.skipUnless(HAS_EXCEL, 'requires pandas and openpyxl')
+class TestSheetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmpdir.name, 'data.xlsx')
+        write_workbook(self.file_path, {'flow': {'a': [1, 2, 3]},
+                                        'level': {'b': [4.5, 5.5]}})
+        self.cache = SheetCache(default_cache_dir(self.tmpdir.name),
+                                PICKLE_FORMAT)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def cached_files(self):
+        return sorted(name for name in os.listdir(self.cache.cache_dir)
+                      if not name.endswith('.json'))
+
+    def test_hit_and_miss(self):
+        import pandas as pd
+        self.assertFalse(self.cache.is_fresh(self.file_path))
+        with mock.patch('pandas.read_excel',
+                        side_effect=pd.read_excel) as read_excel:
+            workbook = self.cache.load_workbook(self.file_path)
+            self.assertEqual(read_excel.call_count, 2)
+            self.assertTrue(self.cache.is_fresh(self.file_path))
+
+            self.assertEqual(self.cache.sheet_names(self.file_path),
+                             ['flow', 'level'])
+            frame = self.cache.load_sheet(self.file_path, 'level')
+            self.assertEqual(read_excel.call_count, 2)
+        self.assertEqual(list(workbook['flow']['a']), [1, 2, 3])
+        self.assertEqual(list(frame['b']), [4.5, 5.5])
+
+    def test_modification_time_invalidates(self):
+        self.cache.load_workbook(self.file_path)
+        stat = os.stat(self.file_path)
+        os.utime(self.file_path, ns=(stat.st_atime_ns,
+                                     stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(self.cache.is_fresh(self.file_path))
+        self.cache.load_workbook(self.file_path)
+        self.assertTrue(self.cache.is_fresh(self.file_path))
+
+    def test_size_invalidates(self):
+        self.cache.load_workbook(self.file_path)
+        stat = os.stat(self.file_path)
+        write_workbook(self.file_path, {'flow': {'a': list(range(100))},
+                                        'level': {'b': [4.5, 5.5]}})
+        # same modification time, only the size tells the files apart
+        os.utime(self.file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertNotEqual(os.stat(self.file_path).st_size, stat.st_size)
+        self.assertFalse(self.cache.is_fresh(self.file_path))
+        self.assertEqual(len(self.cache.load_sheet(self.file_path, 'flow')),
+                         100)
+
+    def test_lost_sheets_are_removed(self):
+        self.cache.load_workbook(self.file_path)
+        self.assertEqual(len(self.cached_files()), 2)
+
+        write_workbook(self.file_path, {'flow': {'a': [7]}})
+        self.assertEqual(list(self.cache.load_workbook(self.file_path)),
+                         ['flow'])
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_directories_are_skipped(self):
+        os.mkdir(os.path.join(self.tmpdir.name, 'subdir'))
+        self.assertEqual(list(get_all_file_paths(self.tmpdir.name)),
+                         ['data.xlsx'])
+
+        # the cache dir is created inside the data dir on the first load
+        first = load_all_blueark_data(self.tmpdir.name)
+        self.assertTrue(os.path.isdir(default_cache_dir(self.tmpdir.name)))
+        second = load_all_blueark_data(self.tmpdir.name)
+        self.assertEqual(list(second), ['data.xlsx'])
+        self.assertEqual(list(second['data.xlsx']), ['flow', 'level'])
+        self.assertTrue(first['data.xlsx']['level'].equals(
+            second['data.xlsx']['level']))
+
+        uncached = load_all_blueark_data(self.tmpdir.name, use_cache=False)
+        self.assertTrue(uncached['data.xlsx']['flow'].equals(
+            second['data.xlsx']['flow']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""Tests checkpointing and resuming simulation runs."""
+
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest import mock
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation import checkpoint
+from blueark.simulation.archive import ARCHIVE_FILE_NAME, Archive
+from blueark.simulation.io import load_data
+from blueark.simulation.pyramid import PYRAMID_DIR_NAME, Pyramid
+from blueark.simulation.result_store import STORE_FILE_NAME, ResultStore
+from blueark.simulation.simulator import (OBJ_FILE_NAME, SKIP, Simulator,
+                                          OUTPUT_FILE_NAMES, VAR_FILE_NAME)
+from test.helpers import copy_model2, model2_demands, simulate_model2
+
+
+class FakeSolveSimulator(Simulator):
+    """Simulator writing random values instead of calling the optimizer."""
+    crash_at = None
+
+    def run_step(self, model, step):
+        if step == self.crash_at:
+            raise RuntimeError('simulated crash')
+        consumption = self._consumation_on_day(step)
+        value = np.random.random()
+        self.update_outfile(consumption, {'x_0': value}, value)
+
+
+class CrashingSimulator(Simulator):
+    """Simulator solving in process, crashing once at `crash_at`."""
+    crash_at = None
+
+    def run_step(self, model, step):
+        if step == self.crash_at:
+            raise RuntimeError('simulated crash')
+        super().run_step(model, step)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def tearDown(self):
+        # the main loop builds a model, which consumes global symbols
+        SymbolGenerator.reset()
+
+    def test_resume_matches_uninterrupted_run(self):
+        consumer_data = OrderedDict((idx, np.arange(20.0) + idx)
+                                    for idx in range(3))
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            np.random.seed(42)
+            crashed = FakeSolveSimulator(consumer_data, 20,
+                                         os.path.join(tmpdirpath, 'a'),
+                                         checkpoint_interval=5)
+            crashed.crash_at = 13
+            with self.assertRaises(RuntimeError):
+                crashed.execute_main_loop()
+
+            resumed = FakeSolveSimulator.resume(crashed.run_dir_path)
+            self.assertEqual(resumed.start_step, 10)
+            resumed.execute_main_loop()
+
+            np.random.seed(42)
+            reference = FakeSolveSimulator(consumer_data, 20,
+                                           os.path.join(tmpdirpath, 'b'))
+            reference.execute_main_loop()
+
+            for file_name in OUTPUT_FILE_NAMES:
+                with open(os.path.join(crashed.run_dir_path,
+                                       file_name)) as infile:
+                    resumed_lines = infile.readlines()
+                with open(os.path.join(reference.run_dir_path,
+                                       file_name)) as infile:
+                    reference_lines = infile.readlines()
+                self.assertEqual(resumed_lines, reference_lines)
+
+    def test_outputs_are_synced_before_the_checkpoint(self):
+        consumer_data = OrderedDict((idx, np.arange(4.0)) for idx in range(3))
+        calls = mock.Mock()
+        with tempfile.TemporaryDirectory() as tmpdirpath, \
+                mock.patch.object(checkpoint, 'sync_outputs',
+                                  wraps=checkpoint.sync_outputs) as sync, \
+                mock.patch.object(checkpoint, 'save_checkpoint',
+                                  wraps=checkpoint.save_checkpoint) as save:
+            calls.attach_mock(sync, 'sync_outputs')
+            calls.attach_mock(save, 'save_checkpoint')
+            simulator = FakeSolveSimulator(consumer_data, 4, tmpdirpath,
+                                           checkpoint_interval=2)
+            simulator.execute_main_loop()
+
+        self.assertEqual([name for name, _, _ in calls.mock_calls],
+                         ['sync_outputs', 'save_checkpoint'] * 2)
+        sync.assert_called_with(simulator.run_dir_path, OUTPUT_FILE_NAMES)
+
+    def test_resumed_run_solves_like_the_original(self):
+        consumer_data = model2_demands(6)
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            crashed = CrashingSimulator(consumer_data, 6,
+                                        os.path.join(tmpdirpath, 'a'),
+                                        checkpoint_interval=2,
+                                        network_path=copy_model2(tmpdirpath),
+                                        solve_workers=1, on_infeasible=SKIP,
+                                        deadline=30.0)
+            crashed.crash_at = 3
+            with self.assertRaises(RuntimeError):
+                crashed.execute_main_loop()
+
+            resumed = Simulator.resume(crashed.run_dir_path)
+            self.assertEqual(resumed.solve_options(), crashed.solve_options())
+            resumed.execute_main_loop()
+
+            reference = simulate_model2(os.path.join(tmpdirpath, 'b'),
+                                        consumer_data, on_infeasible=SKIP,
+                                        deadline=30.0)
+
+            for file_name in OUTPUT_FILE_NAMES:
+                with open(os.path.join(crashed.run_dir_path,
+                                       file_name)) as infile:
+                    resumed_lines = infile.readlines()
+                with open(os.path.join(reference.run_dir_path,
+                                       file_name)) as infile:
+                    reference_lines = infile.readlines()
+                self.assertEqual(resumed_lines, reference_lines)
+
+    def test_restart_before_first_checkpoint_rewrites_all_outputs(self):
+        consumer_data = model2_demands(6)
+        outputs = {'pyramid': True, 'archive': True, 'result_store': True}
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            crashed = CrashingSimulator(consumer_data, 6,
+                                        os.path.join(tmpdirpath, 'a'),
+                                        checkpoint_interval=5,
+                                        network_path=copy_model2(tmpdirpath),
+                                        solve_workers=1, **outputs)
+            crashed.crash_at = 2
+            with self.assertRaises(RuntimeError):
+                crashed.execute_main_loop()
+            run_dir_path = crashed.run_dir_path
+            self.assertTrue(os.path.isfile(os.path.join(run_dir_path,
+                                                        ARCHIVE_FILE_NAME)))
+
+            resumed = Simulator.resume(run_dir_path)
+            self.assertEqual(resumed.start_step, 0)
+            self.assertEqual(resumed.output_options(), outputs)
+            for name in (ARCHIVE_FILE_NAME, STORE_FILE_NAME,
+                         PYRAMID_DIR_NAME):
+                self.assertFalse(os.path.exists(os.path.join(run_dir_path,
+                                                             name)))
+            resumed.execute_main_loop()
+
+            values = np.column_stack([
+                load_data(os.path.join(run_dir_path, OBJ_FILE_NAME)),
+                load_data(os.path.join(run_dir_path, VAR_FILE_NAME))])
+            np.testing.assert_allclose(
+                Archive(os.path.join(run_dir_path,
+                                     ARCHIVE_FILE_NAME)).read(), values)
+            np.testing.assert_allclose(
+                Pyramid(os.path.join(run_dir_path,
+                                     PYRAMID_DIR_NAME)).raw(), values)
+            with ResultStore(os.path.join(run_dir_path,
+                                          STORE_FILE_NAME)) as store:
+                self.assertEqual(store.n_steps, 6)
+                np.testing.assert_allclose(store.range('objective')[1],
+                                           values[:, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""Tests declarative networks and their compiled, cached form."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import blueark.equations_parsing as equ_parse
+from blueark.equations import SymbolGenerator
+from blueark.model import compiler
+from blueark.model import spec as net_spec
+from blueark.model.entities import Consumer
+from blueark.model.generator import generate_network
+from blueark.model.network import Network
+from blueark.model.sample_model import Model2
+from test.helpers import MODEL2_PATH
+
+
+def canonical(constraints):
+    """Constraints independent of the order of their terms."""
+    return {(frozenset(equ_parse.get_coefficients(equ).items()),
+             equ_parse.get_equality_type(equ),
+             equ_parse.get_rhs_value(equ))
+            for equ in constraints}
+
+
+class TestCompiledNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdirpath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdirpath)
+        SymbolGenerator.reset()
+
+    def test_model2_file_matches_sample_model(self):
+        compiled = compiler.load_network(MODEL2_PATH, use_cache=False)
+        compiled.set_consumer_usage(150, 120, 100, 180, 200)
+        constraints, maximizers = compiled.gen_constraints()
+
+        SymbolGenerator.reset()
+        model = Model2()
+        model.set_consumer_usage(150, 120, 100, 180, 200)
+        expected, expected_maximizers = model.gen_constraints()
+
+        self.assertEqual(canonical(constraints), canonical(expected))
+        self.assertEqual(sorted(maximizers), sorted(expected_maximizers))
+
+    def test_rows_are_ordered_canonically(self):
+        compiled = compiler.load_network(MODEL2_PATH, use_cache=False)
+        compiled.set_consumer_usage(150, 120, 100, 180, 200)
+        expected = compiled.gen_constraints()
+
+        code = ('from blueark.model.sample_model import Model2\n'
+                'model = Model2()\n'
+                'model.set_consumer_usage(150, 120, 100, 180, 200)\n'
+                'print(repr(model.gen_constraints()))\n')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.join(os.path.dirname(compiler.__file__), '..', '..')] +
+            [path for path in [env.get('PYTHONPATH')] if path])
+        for seed in ('1', '2', '3'):
+            env['PYTHONHASHSEED'] = seed
+            output = subprocess.check_output([sys.executable, '-c', code],
+                                             env=env)
+            constraints, maximizers = eval(output.decode())
+            self.assertEqual(constraints, expected[0])
+            self.assertEqual(maximizers, expected[1])
+
+    def test_parameters_patch_rows_and_arrays(self):
+        compiled = compiler.load_network(MODEL2_PATH, use_cache=False)
+        arrays = compiled.arrays()
+        compiled.set_parameter('tank_left_top', 1234)
+        compiled.set_parameter('consumer_2', 55)
+
+        self.assertEqual(compiled.entities[compiled.ids['consumer_2']].demand,
+                         55)
+        constraints, _ = compiled.gen_constraints()
+        self.assertIn('1.0 * x_9 <= 1234.0', constraints)
+        self.assertIn('1.0 * x_2 = 55.0', constraints)
+        self.assertIn(1234.0, arrays['rhs'])
+        self.assertIn(55.0, arrays['rhs'])
+
+        matrix = compiled.matrix()
+        self.assertEqual(matrix.shape, (len(constraints),
+                                        len(arrays['var_names'])))
+        with self.assertRaises(ValueError):
+            compiled.set_consumer_usage(1, 2)
+
+    def test_cache_is_keyed_by_content(self):
+        path = os.path.join(self.tmpdirpath, 'net.json')
+        shutil.copy(MODEL2_PATH, path)
+        cache_dir = os.path.join(self.tmpdirpath, 'cache')
+
+        first = compiler.load_network(path, cache_dir=cache_dir)
+        with mock.patch.object(compiler, 'compile_spec') as compile_spec:
+            cached = compiler.load_network(path, cache_dir=cache_dir)
+            compile_spec.assert_not_called()
+        self.assertEqual(cached.gen_constraints(), first.gen_constraints())
+        self.assertGreaterEqual(SymbolGenerator.last_index(), 16)
+
+        with open(path) as infile:
+            spec = json.load(infile)
+        spec['entities'][-2]['max_throughput'] = 2500
+        with open(path, 'w') as outfile:
+            json.dump(spec, outfile)
+
+        changed = compiler.load_network(path, cache_dir=cache_dir)
+        self.assertIn('1.0 * x_15 <= 2500.0', changed.gen_constraints()[0])
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_cache_tolerates_concurrent_writers(self):
+        path = os.path.join(self.tmpdirpath, 'net.json')
+        shutil.copy(MODEL2_PATH, path)
+        cache_dir = os.path.join(self.tmpdirpath, 'cache')
+        compiler.load_network(path, cache_dir=cache_dir)
+        cached, = os.listdir(cache_dir)
+        stale = os.path.join(cache_dir, 'net.json_' + '0' * 24 + '.pkl')
+        with open(stale, 'wb'):
+            pass
+        os.remove(os.path.join(cache_dir, cached))
+
+        # another process already swept the stale file
+        with mock.patch.object(compiler.os, 'remove',
+                               side_effect=FileNotFoundError):
+            compiler.load_network(path, cache_dir=cache_dir)
+        self.assertIn(cached, os.listdir(cache_dir))
+        self.assertFalse([name for name in os.listdir(cache_dir)
+                          if name.endswith('.tmp')])
+
+    @unittest.skipIf(net_spec.tomllib is None, 'requires tomllib')
+    def test_toml_network(self):
+        path = os.path.join(self.tmpdirpath, 'net.toml')
+        with open(path, 'w') as outfile:
+            outfile.write('name = "small"\n'
+                          '[[entities]]\nid = "home"\ntype = "consumer"\n'
+                          'demand = 10\n'
+                          '[[entities]]\nid = "pipe"\ntype = "pipe"\n'
+                          'children = ["home"]\nmax_throughput = 50\n'
+                          'efficiency = 20\n'
+                          '[[entities]]\nid = "source"\ntype = "source"\n'
+                          'children = ["pipe"]\n')
+        compiled = compiler.load_network(path, use_cache=False)
+        self.assertEqual(compiled.gen_constraints()[1], ['20.0 * x_1'])
+
+    def test_invalid_specs(self):
+        consumer = {'id': 'home', 'type': 'consumer', 'demand': 1}
+        pipe = {'id': 'pipe', 'type': 'pipe', 'children': ['home'],
+                'max_throughput': 5}
+        source = {'id': 'source', 'type': 'source', 'children': ['pipe']}
+
+        for entities in ([pipe, consumer, source],
+                         [consumer, consumer, pipe, source],
+                         [consumer, pipe],
+                         [consumer, dict(pipe, type='valve'), source]):
+            with self.assertRaises(ValueError):
+                net_spec.build_network({'entities': entities})
+
+
+def canonical_arrays(compiled):
+    """Rows of the numeric problem independent of their order."""
+    arrays = compiled.arrays()
+    matrix = compiled.matrix().toarray()
+    rows = {(tuple(row), rhs, equ) for row, rhs, equ
+            in zip(matrix, arrays['rhs'], arrays['equ'])}
+    return arrays['var_names'], rows, list(arrays['objective'])
+
+
+class TestRegenerate(unittest.TestCase):
+
+    def setUp(self):
+        SymbolGenerator.reset()
+        self.compiled = compiler.CompiledNetwork(
+            generate_network(300, sharing=0.2, seed=5))
+        self.compiled.arrays()
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def assert_matches_full_build(self):
+        sources = [self.compiled.entities[idx]
+                   for idx in self.compiled.source_indices]
+        for entity in self.compiled.entities:
+            entity.parents = set()
+        reference = compiler.CompiledNetwork(Network(sources))
+        self.assertEqual(canonical(self.compiled.gen_constraints()[0]),
+                         canonical(reference.gen_constraints()[0]))
+        self.assertEqual(canonical_arrays(self.compiled),
+                         canonical_arrays(reference))
+
+    def test_parameter_edits_only_rebuild_their_block(self):
+        consumer = self.compiled.entities[self.compiled.consumers[3]]
+        consumer.demand = 42
+        pipe = next(entity for entity in self.compiled.entities
+                    if hasattr(entity, 'efficiency'))
+        pipe.efficiency = 75
+
+        changed = self.compiled.regenerate()
+        self.assertEqual(changed, sorted([self.compiled.consumers[3],
+                                          self.compiled.entity_index(pipe)]))
+        self.assertEqual(self.compiled.regenerate(), [])
+        self.assert_matches_full_build()
+
+    def test_structural_edits_rebuild_neighbours(self):
+        entities = self.compiled.entities
+        # the dropped child stays reachable through its other parent
+        tank = next(entity for entity in entities
+                    if hasattr(entity, 'capacity') and
+                    len(entity.children[0].parents) > 1)
+        old_child = tank.children[0]
+        new_consumer = Consumer(77)
+        tank.children = tank.children[1:] + [new_consumer]
+
+        changed = self.compiled.regenerate()
+        self.assertIn(self.compiled.entity_index(tank), changed)
+        self.assertIn(self.compiled.entity_index(old_child), changed)
+        self.assertIn(self.compiled.entity_index(new_consumer), changed)
+        self.assertLess(len(changed), 5)
+        self.assertIn(new_consumer.my_symbol.get_symbol(),
+                      self.compiled.arrays()['var_names'])
+        self.assert_matches_full_build()
+
+    def detach_subtree(self):
+        """Drops a subtree hanging off a single parent, which shares one of
+        its children, and returns the parent and the subtree."""
+        parent, subtree = next(
+            (entity, child) for entity in self.compiled.entities
+            for child in entity.children
+            if len(child.parents) == 1 and child.children and
+            any(len(grandchild.parents) > 1
+                for grandchild in child.children))
+        parent.children = [child for child in parent.children
+                           if child is not subtree]
+        return parent, subtree
+
+    def test_detached_entities_drop_their_blocks(self):
+        compiled = self.compiled
+        n_consumers = len(compiled.consumers)
+        _, subtree = self.detach_subtree()
+
+        changed = compiled.regenerate()
+        self.assertIn(compiled.entity_index(subtree), compiled.detached)
+        self.assertTrue(compiled.detached <= set(changed))
+        for idx in compiled.detached:
+            self.assertEqual(compiled.blocks[idx], [])
+            self.assertEqual(compiled.maximizer_blocks[idx], [])
+        self.assertNotIn(subtree.my_symbol.get_symbol(),
+                         compiled.arrays()['var_names'])
+        self.assertLessEqual(len(compiled.consumers), n_consumers)
+        with self.assertRaises(ValueError):
+            compiled.set_parameter(subtree, 10)
+        self.assert_matches_full_build()
+
+    def test_reattached_entities_rebuild_their_blocks(self):
+        compiled = self.compiled
+        n_consumers = len(compiled.consumers)
+        parent, subtree = self.detach_subtree()
+        compiled.regenerate()
+        detached = set(compiled.detached)
+
+        parent.children = parent.children + [subtree]
+        changed = compiled.regenerate()
+        self.assertEqual(compiled.detached, set())
+        self.assertTrue(detached <= set(changed))
+        self.assertEqual(len(compiled.consumers), n_consumers)
+        self.assert_matches_full_build()
+
+
+if __name__ == '__main__':
+    unittest.main()
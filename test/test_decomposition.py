@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""Tests the decomposition of networks into independent linear programs."""
+
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from blueark.equations import SymbolGenerator
+from blueark.model.compiler import CompiledNetwork, load_network
+from blueark.model.generator import generate_network
+from blueark.model.network import Network
+from blueark.model.sample_model import Model
+from blueark.optmization import backends, decomposition
+from blueark.simulation.launcher import summarize_run
+from blueark.simulation.simulator import (FAILED_FILE_NAME, Simulator,
+                                          VAR_FILE_NAME)
+from test.helpers import MODEL2_PATH, simulate_model2
+
+
+def two_block_program():
+    """max x0 + 2 x1 + 3 x2 s.t. x0 + x1 <= 10, x2 - x3 = 0 with x1 <= 4
+    and x3 <= 5."""
+    matrix = csr_matrix(np.array([[1.0, 1.0, 0.0, 0.0],
+                                  [0.0, 0.0, 1.0, -1.0]]))
+    return decomposition.LinearProgram(
+        ['x_0', 'x_1', 'x_2', 'x_3'], np.array([1.0, 2.0, 3.0, 0.0]),
+        matrix, np.array([10.0, 0.0]), np.array([-1, 0]),
+        np.array([-1.0, 4.0, -1.0, 5.0]), {})
+
+
+class TestDecomposition(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_blocks_are_solved_and_merged(self):
+        program = two_block_program()
+        self.assertEqual(len(decomposition.find_components(program)), 2)
+
+        for max_workers in (1, 2):
+            solution = decomposition.solve_decomposed(program, max_workers)
+            self.assertEqual(solution.status, 0)
+            self.assertEqual(solution.n_components, 2)
+            np.testing.assert_allclose(solution.values, [6, 4, 5, 5],
+                                       atol=1e-7)
+            self.assertAlmostEqual(solution.objective, 29.0)
+
+    def test_components_of_networks(self):
+        # both sources of Model feed the top tank
+        model = Model()
+        network = Network([model.natural_source, model.controlled_source])
+        program = decomposition.linear_program(CompiledNetwork(network))
+        self.assertEqual(len(decomposition.find_components(program)), 1)
+
+        SymbolGenerator.reset()
+        network = generate_network(400, sharing=0.0, seed=4)
+        program = decomposition.linear_program(CompiledNetwork(network))
+        self.assertEqual(len(decomposition.find_components(program)),
+                         len(network.sources))
+
+    def test_fixed_demands_are_eliminated(self):
+        compiled = load_network(MODEL2_PATH, use_cache=False)
+        compiled.set_consumer_usage(1, 2, 3, 4, 5)
+        program = decomposition.linear_program(compiled, fix_demands=True)
+
+        self.assertEqual(sorted(program.fixed), [0, 1, 2, 3, 4])
+        self.assertEqual(program.fixed[2], 3.0)
+        for _, variables in decomposition.find_components(program):
+            self.assertFalse(set(variables) & set(program.fixed))
+
+    def test_simulator_solves_in_process(self):
+        consumer_data = OrderedDict((idx, np.arange(3.0) + 100 * idx)
+                                    for idx in range(5))
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            simulator = simulate_model2(tmpdirpath, consumer_data)
+            with open(os.path.join(simulator.run_dir_path,
+                                   VAR_FILE_NAME)) as infile:
+                lines = infile.read().split('\n')[1:-1]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(lines[0].split()),
+                         len(simulator.objective.var_names))
+
+        with self.assertRaises(ValueError):
+            Simulator(consumer_data, 3, None, solve_workers=2)
+
+    def test_failed_solves_are_logged(self):
+        scipy_backend = backends.get_backend(backends.SCIPY)
+        backends.register_backend('pinned', lambda: backends.Backend(
+            'pinned', lambda compiled: scipy_backend.prepare(
+                compiled, fix_demands=True), scipy_backend.solve))
+        # the rows of Model2 only balance without demand, pinning the
+        # demands of the second step leaves the solver without solution
+        consumer_data = OrderedDict((idx, np.array([0.0, 150.0]))
+                                    for idx in range(5))
+        try:
+            with tempfile.TemporaryDirectory() as tmpdirpath:
+                run_dir_path = simulate_model2(
+                    tmpdirpath, consumer_data,
+                    solve_backend='pinned').run_dir_path
+                with open(os.path.join(run_dir_path,
+                                       FAILED_FILE_NAME)) as infile:
+                    log = infile.read().split('\n')[1:-1]
+                summary = summarize_run(run_dir_path)
+        finally:
+            backends._LOADERS.pop('pinned')
+            backends._BACKENDS.pop('pinned', None)
+
+        self.assertEqual(log, ['1 2'])
+        self.assertEqual(summary['failed_steps'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
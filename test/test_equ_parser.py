@@ -10,6 +10,7 @@ import csv
 import numpy as np
 
 from blueark.equations_parsing import *
+from blueark.simulation.io import read_sparse_matrix_file
 
 
 class TestEquationParsing(unittest.TestCase):
@@ -104,6 +105,47 @@ class TestEquationParsing(unittest.TestCase):
 
             # TODO finish up
 
+    def test_build_sparse_matrix(self):
+        equ1 = '1.1 * x_1 + 2.0 * x_2 + 1.0 * x_3 = 5.0'
+        equ2 = '2.1 * x_1 + 2.0 * x_4 <= 10.0'
+
+        rows, cols, values, rhs_vec, equ_vec, names = \
+            build_sparse_matrix([equ1, equ2])
+        dense = np.zeros((2, len(names)))
+        dense[rows, cols] = values
+
+        matrix, expected_rhs, expected_equ, expected_names = \
+            build_matrix([equ1, equ2])
+        self.assertEqual(dense.tolist(), matrix)
+        self.assertEqual(rhs_vec.tolist(), expected_rhs)
+        self.assertEqual(equ_vec.tolist(), expected_equ)
+        self.assertEqual(names, expected_names)
+
+        # explicit columns may hold variables without coefficients
+        _, cols, _, _, _, names = build_sparse_matrix(
+            [equ2], ['x_1', 'x_2', 'x_3', 'x_4'])
+        self.assertEqual(cols.tolist(), [0, 3])
+
+    def test_sparse_matrix_file_round_trip(self):
+        rows = np.array([0, 0, 2, 3])
+        cols = np.array([1, 4, 0, 4])
+        values = np.array([0.1234567890123, -2.0, 1e-12, 3.0])
+        equ_vec = np.array([0, -1, 1, 0])
+        rhs_vec = np.array([1.0, 2.5, -1.0 / 3, 0.0])
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            for binary in (False, True):
+                file_path = os.path.join(tmpdirpath, 'matrix.spm')
+                write_sparse_matrix_file(rows, cols, values, equ_vec,
+                                         rhs_vec, (4, 5), file_path,
+                                         binary=binary)
+                result = read_sparse_matrix_file(file_path)
+
+                for read, expected in zip(result[:5], (rows, cols, values,
+                                                       equ_vec, rhs_vec)):
+                    self.assertEqual(read.tolist(), expected.tolist())
+                self.assertEqual(result[5], (4, 5))
+
 
 if __name__ == '__main__':
     tester = TestEquationParsing()
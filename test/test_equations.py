@@ -36,6 +36,12 @@ class TestEquations(unittest.TestCase):
         eq2 = NaryPlus(LiteralNode(7), SymbolicNode("-y"))
         self.assertNotEqual(eq1, eq2)
 
+    def test_hash_independent_of_order(self):
+        nodes = [SymbolicNode("x_{}".format(idx)) for idx in range(20)]
+        self.assertEqual(hash(NaryPlus(*nodes)),
+                         hash(NaryPlus(*reversed(nodes))))
+        self.assertEqual(len({NaryPlus(*nodes), NaryPlus(*nodes[::-1])}), 1)
+
     def test_equalities_constraints(self):
         # -2 + 9 + -2y >= z
         sym1 = SymbolicNode("-y")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""Tests the max-flow feasibility pre-check."""
+
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+from scipy.optimize import linprog
+
+from blueark.equations import SymbolGenerator
+from blueark.model.compiler import load_network
+from blueark.model.entities import (CAPACITY, LEVEL, Consumer, Pipe, Source,
+                                    Tank)
+from blueark.model.network import Network
+from blueark.model.sample_model import Model2
+from blueark.optmization.feasibility import FlowCheck, entity_limit
+from blueark.simulation.io import load_data
+from blueark.simulation.simulator import (CONS_FILE_NAME, DEGRADE,
+                                          INFEASIBLE_FILE_NAME, SKIP,
+                                          Simulator, VAR_FILE_NAME)
+from test.helpers import MODEL2_PATH, simulate_model2
+
+
+class TestFlowCheck(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_model2_bottlenecks(self):
+        check = FlowCheck(Model2().network())
+
+        result = check.check([150, 120, 100, 180, 200])
+        self.assertTrue(result.feasible)
+        self.assertEqual(result.bottlenecks, [])
+        np.testing.assert_allclose(result.delivered, [150, 120, 100, 180, 200])
+
+        # consumer x_0 is only reached by the pipe x_6 of 200, the left
+        # branch is limited by the tank x_9 of 1500, which lets 750 through
+        result = check.check([300] * 5)
+        self.assertFalse(result.feasible)
+        self.assertAlmostEqual(result.max_flow, 1250)
+        self.assertAlmostEqual(result.shortfall, 250)
+        self.assertEqual(check.bottleneck_names(result), ['x_6', 'x_9'])
+        self.assertAlmostEqual(result.delivered.sum(), 1250)
+
+    def test_tank_limits_match_the_level_rows(self):
+        compiled = load_network(MODEL2_PATH, use_cache=False)
+        for idx, entity in enumerate(compiled.entities):
+            if not isinstance(entity, Tank):
+                continue
+            # the largest flow to the children the tank rows allow
+            rows = [row for row in compiled.blocks[idx]
+                    if row.kind in (LEVEL, CAPACITY)]
+            names = sorted({name for row in rows for name in row.names})
+            matrix = np.zeros((len(rows), len(names)))
+            for row_idx, row in enumerate(rows):
+                for name, coeff in zip(row.names, row.coeffs):
+                    matrix[row_idx, names.index(name)] = coeff
+            equalities = np.array([row.equ == 0 for row in rows])
+            rhs = np.array([row.rhs for row in rows])
+            children = [child.my_symbol.get_symbol()
+                        for child in entity.children]
+            result = linprog([-float(name in children) for name in names],
+                             A_ub=matrix[~equalities], b_ub=rhs[~equalities],
+                             A_eq=matrix[equalities], b_eq=rhs[equalities])
+            self.assertEqual(result.status, 0)
+            self.assertAlmostEqual(-result.fun, entity_limit(entity))
+
+    def test_limits_are_read_on_every_check(self):
+        SymbolGenerator.reset()
+        consumers = [Consumer(40), Consumer(30)]
+        # a level of 130 lets 65 through
+        tank = Tank(consumers, 130)
+        pipe = Pipe([tank], 60)
+        source = Source(pipe, throughput=50)
+        check = FlowCheck(Network([source]))
+
+        result = check.check()
+        self.assertEqual(check.bottleneck_names(result), ['x_4'])
+        self.assertAlmostEqual(result.max_flow, 50)
+
+        source.throughput = None
+        self.assertEqual(check.bottleneck_names(check.check()), ['x_3'])
+        pipe.max_throughput = 1000
+        self.assertEqual(check.bottleneck_names(check.check()), ['x_2'])
+        self.assertTrue(check.check([20, 30]).feasible)
+
+        with self.assertRaises(ValueError):
+            check.check([1, 2, 3])
+
+
+class TestSimulatorPreCheck(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def run_simulation(self, on_infeasible):
+        # the second step asks for more than the network can deliver
+        consumer_data = OrderedDict((idx, np.array([150.0, 300.0, 100.0]))
+                                    for idx in range(5))
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = simulate_model2(
+                tmpdirpath, consumer_data,
+                on_infeasible=on_infeasible).run_dir_path
+            with open(os.path.join(run_dir_path,
+                                   INFEASIBLE_FILE_NAME)) as infile:
+                log = infile.read().split('\n')[1:-1]
+            return (log, load_data(os.path.join(run_dir_path,
+                                                VAR_FILE_NAME)),
+                    load_data(os.path.join(run_dir_path, CONS_FILE_NAME)))
+
+    def test_skip_infeasible_steps(self):
+        log, values, consumptions = self.run_simulation(SKIP)
+        self.assertEqual(log, ['1 1500.0 1250.0 x_6,x_9'])
+        self.assertTrue(np.isnan(values[1]).all())
+        self.assertFalse(np.isnan(values[[0, 2]]).any())
+        np.testing.assert_array_equal(consumptions[1], [300.0] * 5)
+
+    def test_degrade_infeasible_steps(self):
+        log, values, consumptions = self.run_simulation(DEGRADE)
+        self.assertEqual(len(log), 1)
+        self.assertFalse(np.isnan(values).any())
+        self.assertAlmostEqual(consumptions[1].sum(), 1250)
+        self.assertTrue((consumptions[1] <= 300).all())
+
+        with self.assertRaises(ValueError):
+            Simulator({}, 1, None, on_infeasible='retry')
+
+
+if __name__ == '__main__':
+    unittest.main()
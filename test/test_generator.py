@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Tests the network abstraction and the random network generator."""
+
+import unittest
+
+from blueark.equations import SymbolGenerator
+from blueark.model.entities import Consumer, Source
+from blueark.model.generator import generate_network, generate_spec
+from blueark.model.network import Network
+from blueark.model.sample_model import Model2
+from blueark.model.spec import build_network
+
+
+class TestNetwork(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_same_constraints_as_sample_model(self):
+        SymbolGenerator.reset()
+        model = Model2()
+        model.set_consumer_usage(150, 120, 100, 180, 200)
+        expected, expected_maximizers = model.gen_constraints()
+
+        SymbolGenerator.reset()
+        model = Model2()
+        model.set_consumer_usage(150, 120, 100, 180, 200)
+        constraints, maximizers = Network([model.source]).gen_constraints()
+
+        self.assertEqual(set(constraints), set(expected))
+        self.assertEqual(len(constraints), len(expected))
+        self.assertEqual(sorted(maximizers), sorted(expected_maximizers))
+
+
+class TestGenerator(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_structure_is_valid(self):
+        SymbolGenerator.reset()
+        network = generate_network(500, depth=3, fan_out=2.5, sharing=0.3,
+                                   seed=3)
+        entities = network.entities()
+
+        self.assertGreater(len(entities), 400)
+        self.assertLess(len(entities), 600)
+        for entity in entities:
+            if isinstance(entity, Consumer):
+                self.assertEqual(entity.children, [])
+            else:
+                self.assertTrue(entity.children)
+
+        network.link()
+        for entity in entities:
+            if not isinstance(entity, Source):
+                self.assertTrue(entity.parents)
+        self.assertTrue(any(len(entity.parents) > 1 for entity in entities))
+
+    def test_seed_is_reproducible(self):
+        SymbolGenerator.reset()
+        first = generate_network(200, seed=7).gen_constraints()
+        SymbolGenerator.reset()
+        second = generate_network(200, seed=7).gen_constraints()
+        self.assertEqual(first, second)
+
+    def test_spec_builds_the_same_network(self):
+        SymbolGenerator.reset()
+        expected = generate_network(200, seed=7).gen_constraints()
+        network, _ = build_network(generate_spec(200, seed=7))
+        self.assertEqual(network.gen_constraints(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""Tests the greedy routing and the solver deadline."""
+
+import os
+import tempfile
+import time
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.model.compiler import load_network
+from blueark.optmization import backends
+from blueark.optmization.greedy import GreedyRouter
+from blueark.simulation.io import load_data
+from blueark.simulation.simulator import (APPROXIMATE_FILE_NAME, Simulator,
+                                          VAR_FILE_NAME)
+from test.helpers import MODEL2_PATH, simulate_model2
+
+
+def solve_slowly(program, max_workers=None, executor=None):
+    time.sleep(30)
+
+
+class TestGreedyRouter(unittest.TestCase):
+
+    def setUp(self):
+        # symbols are global, start from the ones the network file expects
+        SymbolGenerator.reset()
+        self.compiled = load_network(MODEL2_PATH, use_cache=False)
+        self.router = GreedyRouter(self.compiled.network())
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def values_by_id(self, routing):
+        """The routed value of every entity id of the network file."""
+        values = dict(zip(self.router.var_names, routing.values))
+        return {entity_id: values[
+            self.compiled.entities[idx].my_symbol.get_symbol()]
+            for entity_id, idx in self.compiled.ids.items()}
+
+    def test_efficient_paths_are_routed_first(self):
+        routing = self.router.route([150, 120, 100, 180, 200])
+        values = self.values_by_id(routing)
+        # consumer_0 is served through the bottom right tank below the
+        # turbines of 50 and 60 instead of the bottom left tank below the
+        # ones of 40 and 30, tanks hold their level of twice the flow
+        self.assertEqual(values['tank_bottom_right'], 300)
+        self.assertEqual(values['tank_bottom_left'], 240)
+        self.assertEqual(values['consumer_0'], 150)
+
+        self.assertAlmostEqual(routing.objective, 46100)
+        self.assertGreaterEqual(routing.bound, routing.objective)
+        self.assertAlmostEqual(routing.gap,
+                               1 - routing.objective / routing.bound)
+
+    def test_limits_are_respected(self):
+        router = self.router
+        routing = router.route([300] * 5)
+        values = self.values_by_id(routing)
+        limits = {'pipe_bottom_right': 200, 'pipe_left_top': 900,
+                  'pipe_turbine_right': 500}
+        for entity_id, limit in limits.items():
+            self.assertLessEqual(values[entity_id], limit)
+        self.assertAlmostEqual(values['pipe_bottom_right'], 200)
+        for entity_id, value in values.items():
+            self.assertLessEqual(value, 300 * 5)
+        self.assertAlmostEqual(routing.values[router.consumers].sum(), 1250)
+
+        routing = router.route([0] * 5)
+        self.assertEqual(routing.objective, 0)
+        self.assertEqual(routing.gap, 0)
+
+        with self.assertRaises(ValueError):
+            router.route([1, 2])
+
+
+class TestDeadline(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_solve_within_deadline(self):
+        backend = backends.get_backend(backends.SCIPY)
+        program = backend.prepare(load_network(MODEL2_PATH, use_cache=False))
+        solution = backends.solve_within(backend, program, 30)
+        np.testing.assert_allclose(solution.values,
+                                   backend.solve(program, 1).values)
+
+    def test_missed_deadlines_are_routed_greedily(self):
+        backends.register_backend('slow', lambda: backends.Backend(
+            'slow', backends.get_backend(backends.SCIPY).prepare,
+            solve_slowly))
+        consumer_data = OrderedDict((idx, np.array([150.0, 120.0]))
+                                    for idx in range(5))
+        try:
+            with tempfile.TemporaryDirectory() as tmpdirpath:
+                start = time.perf_counter()
+                run_dir_path = simulate_model2(
+                    tmpdirpath, consumer_data, solve_backend='slow',
+                    deadline=0.2).run_dir_path
+                self.assertLess(time.perf_counter() - start, 10)
+
+                with open(os.path.join(run_dir_path,
+                                       APPROXIMATE_FILE_NAME)) as infile:
+                    log = [line.split()
+                           for line in infile.read().split('\n')[1:-1]]
+                values = load_data(os.path.join(run_dir_path,
+                                                VAR_FILE_NAME))
+        finally:
+            backends._LOADERS.pop('slow')
+            backends._BACKENDS.pop('slow', None)
+
+        self.assertEqual([int(line[0]) for line in log], [0, 1])
+        self.assertTrue(all(0 <= float(line[3]) <= 1 for line in log))
+        self.assertEqual(values.shape, (2, 16))
+        np.testing.assert_allclose(values[:, :5], [[150] * 5, [120] * 5])
+
+        with self.assertRaises(ValueError):
+            Simulator({}, 1, None, deadline=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
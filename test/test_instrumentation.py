@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Tests the per phase timing of the simulation loop."""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from blueark.simulation import instrumentation as instr
+from blueark.simulation import profiling
+
+
+class RecordingHook(instr.TimingHook):
+    def __init__(self):
+        self.events = []
+
+    def step_started(self, step):
+        self.events.append(('step_started', step))
+
+    def phase_finished(self, step, phase, wall, cpu):
+        self.events.append(('phase_finished', step, phase))
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_hooks_summary_and_export(self):
+        hook = RecordingHook()
+        timer = instr.PhaseTimer([hook])
+
+        for step in range(3):
+            with timer.step(step):
+                with timer.phase(instr.CONSTRAINTS):
+                    pass
+                with timer.phase(instr.SOLVE):
+                    sum(range(1000))
+
+        self.assertEqual(hook.events[:3],
+                         [('step_started', 0),
+                          ('phase_finished', 0, instr.CONSTRAINTS),
+                          ('phase_finished', 0, instr.SOLVE)])
+
+        summary = timer.summary()
+        self.assertEqual(summary[instr.SOLVE]['count'], 3)
+        self.assertEqual(summary['step']['count'], 3)
+        self.assertLessEqual(summary[instr.SOLVE]['wall_p50'],
+                             summary[instr.SOLVE]['wall_max'])
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            timer.export(tmpdirpath)
+            with open(os.path.join(tmpdirpath,
+                                   instr.SUMMARY_FILE_NAME)) as infile:
+                self.assertIn(instr.CONSTRAINTS, json.load(infile))
+            with open(os.path.join(tmpdirpath,
+                                   instr.TRACE_FILE_NAME)) as infile:
+                rows = list(csv.reader(infile))
+            self.assertEqual(len(rows), 1 + 3 * 2)
+            self.assertEqual(rows[2][:2], ['0', instr.SOLVE])
+
+    def test_null_timer_records_nothing(self):
+        timer = instr.NullTimer()
+        with timer.step(0):
+            with timer.phase(instr.SOLVE):
+                pass
+        self.assertEqual(timer.summary(), {})
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_only_sampled_steps_are_profiled(self):
+        profiler = profiling.SamplingProfiler(every=2)
+        timer = instr.PhaseTimer([profiler])
+        kept = []
+
+        for step in range(5):
+            with timer.step(step):
+                with timer.phase(instr.CONSTRAINTS):
+                    kept.append([float(idx) for idx in range(1000)])
+
+        self.assertEqual(profiler.n_samples, 3)
+        report = profiler.memory_report()
+        self.assertTrue(any(__file__ in site['traceback'][0]
+                            for site in report[instr.CONSTRAINTS]))
+
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            timer.export(tmpdirpath)
+            for file_name in (profiling.CALLS_FILE_NAME,
+                              profiling.CALLS_TEXT_FILE_NAME,
+                              profiling.MEMORY_FILE_NAME,
+                              profiling.MEMORY_SAMPLES_FILE_NAME):
+                self.assertTrue(os.path.isfile(os.path.join(tmpdirpath,
+                                                            file_name)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""Tests the loaders of the outputs of simulation runs."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation.io import (LOADER_CACHE_DIR_NAME, load_data,
+                                   load_run, read_columns, read_table)
+from blueark.simulation.simulator import (CONS_FILE_NAME, OBJ_FILE_NAME,
+                                          VAR_FILE_NAME)
+from test.helpers import model2_demands, simulate_model2
+
+
+class TestReadTable(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.uniform(0, 300, (1000, 4))
+        self.values[17, 2] = np.nan
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, VAR_FILE_NAME)
+        with open(self.path, 'w') as outfile:
+            # the blank first line written by init_data_files
+            outfile.write('\n')
+            for row in self.values:
+                outfile.write(' '.join(str(item) for item in row) + '\n')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_matches_genfromtxt(self):
+        np.testing.assert_array_equal(load_data(self.path),
+                                      np.genfromtxt(self.path))
+
+        with open(self.path, 'w') as outfile:
+            outfile.write('\n1.5\n2.5\n')
+        np.testing.assert_array_equal(load_data(self.path), [1.5, 2.5])
+
+    def test_rows_and_columns_across_chunks(self):
+        for start, stop in ((0, None), (0, 1), (333, 777), (990, 2000)):
+            np.testing.assert_array_equal(
+                read_table(self.path, usecols=[3, 1], start=start,
+                           stop=stop, chunk_bytes=1000),
+                self.values[start:stop, [3, 1]])
+        self.assertEqual(read_table(self.path, start=1000).shape, (0, 4))
+
+    def test_malformed_files_are_rejected(self):
+        with open(self.path, 'a') as outfile:
+            outfile.write('1.0 2.0\n')
+        with self.assertRaises(ValueError):
+            read_table(self.path)
+
+        with open(self.path, 'w') as outfile:
+            outfile.write('1.0 none\n')
+        with self.assertRaises(ValueError):
+            read_table(self.path)
+
+
+class TestLoadRun(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def simulate(self, data_dir, **kwargs):
+        return simulate_model2(data_dir, model2_demands(6),
+                               **kwargs).run_dir_path
+
+    def test_text_outputs_with_names(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = self.simulate(tmpdirpath)
+            variables = np.genfromtxt(os.path.join(run_dir_path,
+                                                   VAR_FILE_NAME))
+
+            table = load_run(run_dir_path, cache=False)
+            self.assertEqual(table.names[:3], ['x_0', 'x_1', 'x_2'])
+            np.testing.assert_array_equal(table.values, variables)
+
+            table = load_run(run_dir_path, CONS_FILE_NAME,
+                             usecols=['4', '0'], start=2, stop=5)
+            self.assertEqual(table.names, ['4', '0'])
+            np.testing.assert_array_equal(
+                table.values,
+                np.genfromtxt(os.path.join(run_dir_path,
+                                           CONS_FILE_NAME))[2:5, [4, 0]])
+
+            with self.assertRaises(ValueError):
+                load_run(run_dir_path, usecols=['x_5'])
+
+    def test_binary_copies_are_reused_until_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = self.simulate(tmpdirpath)
+            cache_dir = os.path.join(run_dir_path, LOADER_CACHE_DIR_NAME)
+
+            first = load_run(run_dir_path, OBJ_FILE_NAME)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            second = load_run(run_dir_path, OBJ_FILE_NAME, start=1, stop=3)
+            self.assertIsInstance(second.values, np.memmap)
+            np.testing.assert_array_equal(second.values, first.values[1:3])
+
+            with open(os.path.join(run_dir_path, OBJ_FILE_NAME), 'a') as out:
+                out.write('1234.5\n')
+            third = load_run(run_dir_path, OBJ_FILE_NAME)
+            self.assertEqual(third.values[-1, 0], 1234.5)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_pyramid_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = self.simulate(tmpdirpath, pyramid=True)
+
+            var_path = os.path.join(run_dir_path, VAR_FILE_NAME)
+
+            table = load_run(run_dir_path, cache=False)
+            self.assertIsInstance(table.values, np.memmap)
+            np.testing.assert_array_equal(table.values, read_table(var_path))
+
+            table = load_run(run_dir_path, usecols=['x_7', 'x_0'], start=3)
+            self.assertEqual(table.names, ['x_7', 'x_0'])
+            names = read_columns(run_dir_path)[VAR_FILE_NAME]
+            np.testing.assert_array_equal(
+                table.values,
+                read_table(var_path, start=3,
+                           usecols=[names.index('x_7'), names.index('x_0')]))
+            np.testing.assert_array_equal(
+                load_run(run_dir_path, OBJ_FILE_NAME).values[:, 0],
+                np.genfromtxt(os.path.join(run_dir_path, OBJ_FILE_NAME)))
+
+
+if __name__ == '__main__':
+    unittest.main()
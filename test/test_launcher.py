@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Tests the concurrent run launcher and the run index."""
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation.io import load_data
+from blueark.simulation.launcher import RunConfig, launch_runs
+from blueark.simulation.run_index import FAILED, FINISHED, RunIndex
+from blueark.simulation.simulator import (CONS_FILE_NAME, Simulator,
+                                          new_run_id)
+from test.helpers import copy_model2
+
+
+class TestRunIndex(unittest.TestCase):
+
+    def test_runs_are_filtered_and_ranked(self):
+        with RunIndex(':memory:') as index:
+            for idx, network in enumerate(['a.json', 'b.json', 'a.json']):
+                index.add_run('run_{}'.format(idx), 'dir', {
+                    'network_path': network, 'n_steps': 3, 'seed': idx},
+                    1000.0 + idx)
+            index.finish_run('run_0', {'energy': 5.0}, 1.0, 0.5)
+            index.finish_run('run_2', {'energy': 7.0}, 1.0, 0.5)
+            index.fail_run('run_1', 'Traceback')
+
+            runs = index.find(order_by='energy', descending=True,
+                              status=FINISHED)
+            self.assertEqual([run['run_id'] for run in runs],
+                             ['run_2', 'run_0'])
+            self.assertEqual(json.loads(runs[0]['parameters'])['seed'], 2)
+            self.assertEqual(index.find(network='b.json')[0]['status'],
+                             FAILED)
+            self.assertEqual(len(index.find(limit=2)), 2)
+            with self.assertRaises(ValueError):
+                index.find(order_by='energy; DROP TABLE runs')
+
+            indexes = {row['name'] for row in index.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")}
+            self.assertIn('runs_energy', indexes)
+
+
+class TestLauncher(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_run_ids_do_not_collide(self):
+        self.assertEqual(len({new_run_id() for _ in range(1000)}), 1000)
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            first = Simulator({}, 1, tmpdirpath).run_dir_path
+            second = Simulator({}, 1, tmpdirpath).run_dir_path
+            self.assertNotEqual(first, second)
+
+    def test_concurrent_runs_are_indexed(self):
+        finished = []
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            network_path = copy_model2(tmpdirpath)
+            configs = [RunConfig(network_path, 3, seed)
+                       for seed in range(4)]
+            configs.append(RunConfig('missing.json', 3))
+            index_path = os.path.join(tmpdirpath, 'runs.sqlite')
+            run_ids = launch_runs(
+                configs, tmpdirpath, index_path, max_workers=3,
+                on_finished=lambda run_id, status: finished.append(run_id))
+
+            self.assertEqual(sorted(finished), sorted(run_ids))
+            with RunIndex(index_path) as index:
+                runs = {run['run_id']: run for run in index.find()}
+            self.assertEqual([runs[run_id]['status'] for run_id in run_ids],
+                             [FINISHED] * 4 + [FAILED])
+            self.assertIn('missing.json', runs[run_ids[-1]]['error'])
+
+            first = runs[run_ids[0]]
+            self.assertEqual(first['seed'], 0)
+            self.assertEqual(first['failed_steps'], 0)
+            self.assertGreater(first['wall_time_s'], 0)
+            consumptions = [load_data(os.path.join(runs[run_id]['run_dir'],
+                                                   CONS_FILE_NAME))
+                            for run_id in run_ids[:2]]
+            self.assertEqual(consumptions[0].shape, (3, 5))
+            self.assertFalse(np.array_equal(*consumptions))
+
+
+if __name__ == '__main__':
+    unittest.main()
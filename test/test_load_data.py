@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""Tests the lazy loading and aggregation of the blue ark data files."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from blueark.data_aggregation.cache import SheetCache, default_cache_dir
+from blueark.data_aggregation.load_data import (FILE_COLUMN, SHEET_COLUMN,
+                                                LazyBlueArkData,
+                                                aggregate_all_data_to_df)
+from test.helpers import HAS_EXCEL, write_workbook
+
+
+@unittest.skipUnless(HAS_EXCEL, 'requires pandas and openpyxl')
+class TestLazyBlueArkData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir_path = self.tmpdir.name
+        write_workbook(os.path.join(self.dir_path, 'a.xlsx'),
+                       {'flow': {'x': [1, 2]}, 'level': {'x': [3]}})
+        write_workbook(os.path.join(self.dir_path, 'b.xlsx'),
+                       {'flow': {'x': [4], 'y': [5.5]}})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sheets_are_read_on_access(self):
+        import pandas as pd
+        data = LazyBlueArkData(self.dir_path, use_cache=False)
+        with mock.patch('pandas.read_excel',
+                        side_effect=pd.read_excel) as read_excel:
+            self.assertEqual(list(data), [('a.xlsx', 'flow'),
+                                          ('a.xlsx', 'level'),
+                                          ('b.xlsx', 'flow')])
+            self.assertEqual(len(data), 3)
+            read_excel.assert_not_called()
+
+            self.assertEqual(list(data['a.xlsx', 'level']['x']), [3])
+            self.assertEqual(list(data['a.xlsx', 'level']['x']), [3])
+            self.assertEqual(read_excel.call_count, 1)
+        self.assertEqual(list(data._frames), [('a.xlsx', 'level')])
+
+        with self.assertRaises(KeyError):
+            data['a.xlsx', 'missing']
+        with self.assertRaises(KeyError):
+            data['missing.xlsx', 'flow']
+
+    def test_prefetch_without_cache_keeps_the_frames(self):
+        data = LazyBlueArkData(self.dir_path, use_cache=False)
+        data.prefetch(max_workers=2)
+        self.assertEqual(sorted(data._frames), sorted(data))
+        self.assertEqual(list(data['b.xlsx', 'flow']['y']), [5.5])
+
+    def test_prefetch_with_cache_converts_the_workbooks(self):
+        data = LazyBlueArkData(self.dir_path)
+        data.prefetch(['a.xlsx'], max_workers=2)
+        cache = SheetCache(default_cache_dir(self.dir_path))
+        self.assertTrue(cache.is_fresh(os.path.join(self.dir_path,
+                                                    'a.xlsx')))
+        self.assertFalse(cache.is_fresh(os.path.join(self.dir_path,
+                                                     'b.xlsx')))
+        self.assertEqual(data.sheet_names('a.xlsx'), ['flow', 'level'])
+        self.assertEqual(data._frames, {})
+        self.assertEqual(list(data['a.xlsx', 'flow']['x']), [1, 2])
+
+    def test_aggregate(self):
+        aggregated = aggregate_all_data_to_df(self.dir_path, max_workers=2)
+        self.assertEqual(len(aggregated), 4)
+        self.assertEqual(list(aggregated['x']), [1, 2, 3, 4])
+        for column, categories in ((FILE_COLUMN, ['a.xlsx', 'b.xlsx']),
+                                   (SHEET_COLUMN, ['flow', 'level'])):
+            self.assertEqual(aggregated[column].dtype.name, 'category')
+            self.assertEqual(
+                sorted(aggregated[column].cat.categories), categories)
+        self.assertEqual(list(aggregated[SHEET_COLUMN]),
+                         ['flow', 'flow', 'level', 'flow'])
+
+    def test_aggregate_rejects_clashing_columns(self):
+        write_workbook(os.path.join(self.dir_path, 'c.xlsx'),
+                       {'meta': {SHEET_COLUMN: ['own']}})
+        with self.assertRaises(ValueError):
+            aggregate_all_data_to_df(self.dir_path, max_workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
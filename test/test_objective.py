@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Tests the compiled objective and the batch evaluation of power."""
+
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.model.compiler import load_network
+from blueark.model.objective import Objective
+from blueark.model.sample_model import Model2
+from blueark.simulation.io import load_data
+from blueark.simulation.simulator import (OBJ_FILE_NAME,
+                                          OBJECTIVE_VECTOR_FILE_NAME,
+                                          VAR_FILE_NAME)
+from test.helpers import MODEL2_PATH, simulate_model2
+
+
+class TestObjective(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_maximizers_are_compiled_into_columns(self):
+        objective = Objective.from_maximizers(
+            ['30.0 * x_2', '5.0 * x_0', '2.0 * x_2'], ['x_0', 'x_1', 'x_2'])
+        np.testing.assert_array_equal(objective.coefficients, [5, 0, 32])
+        self.assertEqual(objective.turbine_names, ['x_0', 'x_2'])
+        self.assertEqual(objective.turbine_dict(),
+                         {'x_0': 5.0, 'x_1': 0.0, 'x_2': 32.0})
+
+        with self.assertRaises(ValueError):
+            Objective.from_maximizers(['1.0 * x_3'], ['x_0'])
+
+    def test_power_of_many_steps(self):
+        objective = Objective(['x_0', 'x_1', 'x_2'], [5.0, 0.0, 32.0])
+        values = np.arange(12.0).reshape(4, 3)
+
+        np.testing.assert_allclose(objective.power(values),
+                                   [64, 175, 286, 397])
+        self.assertEqual(objective.power(values[1]), 175)
+        np.testing.assert_allclose(objective.turbine_power(values),
+                                   values[:, [0, 2]] * [5, 32])
+        self.assertEqual(objective.turbine_power(values).shape, (4, 2))
+
+    def test_sample_model_matches_compiled_network(self):
+        compiled = load_network(MODEL2_PATH, use_cache=False)
+        expected = Objective.from_arrays(compiled.arrays())
+
+        SymbolGenerator.reset()
+        _, maximizers = Model2().gen_constraints()
+        self.assertEqual(Objective.from_maximizers(maximizers,
+                                                   expected.var_names),
+                         expected)
+
+    def test_power_of_a_finished_run(self):
+        consumer_data = OrderedDict((idx, np.arange(4.0) + 10 * idx)
+                                    for idx in range(5))
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            simulator = simulate_model2(tmpdirpath, consumer_data)
+            run_dir_path = simulator.run_dir_path
+            objective = Objective.load(os.path.join(
+                run_dir_path, OBJECTIVE_VECTOR_FILE_NAME))
+            values = load_data(os.path.join(run_dir_path, VAR_FILE_NAME))
+            power = load_data(os.path.join(run_dir_path, OBJ_FILE_NAME))
+
+        self.assertEqual(objective, simulator.objective)
+        np.testing.assert_allclose(objective.power(values), power)
+
+
+if __name__ == '__main__':
+    unittest.main()
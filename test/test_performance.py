@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""Performance regression tier, checks the pipeline against the baseline.
+
+The benchmarks only run if BLUEARK_BENCHMARKS is set:
+
+    BLUEARK_BENCHMARKS=1 python -m unittest test.test_performance
+
+BLUEARK_REGRESSION_THRESHOLD sets the tolerated slowdown factor, 2 by
+default. With BLUEARK_UPDATE_BASELINE set the measurements replace the
+baseline instead, e.g. after an intended change of the performance.
+"""
+
+import os
+import unittest
+
+from blueark.benchmarks import regression
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmarks',
+                             'baseline.json')
+
+
+class TestRegressionCheck(unittest.TestCase):
+
+    def report(self, seconds, memory):
+        return {'results': {'200': {regression.SOLVE_STAGE: {
+            regression.RELATIVE_TIME: seconds,
+            regression.PEAK_MEMORY: memory}}}}
+
+    def test_slowdowns_beyond_threshold_are_reported(self):
+        baseline = self.report(1.0, 10 ** 7)
+        self.assertEqual(regression.find_regressions(
+            baseline, self.report(1.9, 1.5 * 10 ** 7)), [])
+
+        regressions = regression.find_regressions(
+            baseline, self.report(10.0, 3 * 10 ** 7))
+        self.assertEqual([(item.stage, item.measure, item.ratio)
+                          for item in regressions],
+                         [(regression.SOLVE_STAGE, regression.RELATIVE_TIME,
+                           10.0),
+                          (regression.SOLVE_STAGE, regression.PEAK_MEMORY,
+                           3.0)])
+        self.assertEqual(len(regression.find_regressions(
+            baseline, self.report(10.0, 3 * 10 ** 7), threshold=20,
+            memory_threshold=2)), 1)
+
+    def test_noise_and_new_sizes_are_ignored(self):
+        baseline = self.report(0.001, 1000)
+        self.assertEqual(regression.find_regressions(
+            baseline, self.report(0.04, 200 * 1000)), [])
+        self.assertEqual(len(regression.find_regressions(
+            baseline, self.report(0.2, 1000))), 1)
+        self.assertEqual(regression.find_regressions(
+            {'results': {}}, self.report(100, 10 ** 9)), [])
+
+
+@unittest.skipUnless(os.environ.get('BLUEARK_BENCHMARKS'),
+                     'set BLUEARK_BENCHMARKS to run the benchmark tier')
+class TestPerformance(unittest.TestCase):
+
+    def test_no_regression_against_baseline(self):
+        report = regression.measure()
+        if os.environ.get('BLUEARK_UPDATE_BASELINE'):
+            regression.save_baseline(report, BASELINE_PATH)
+            self.skipTest('baseline updated')
+
+        threshold = float(os.environ.get('BLUEARK_REGRESSION_THRESHOLD',
+                                         regression.DEFAULT_THRESHOLD))
+        regressions = regression.find_regressions(
+            regression.load_baseline(BASELINE_PATH), report, threshold)
+        self.assertEqual(regressions, [], '\n'.join(
+            regression.describe(item) for item in regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""Tests the downsampling pyramid of simulation results."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.simulation.pyramid import Pyramid, PyramidWriter, build_pyramid
+
+
+class TestPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.random((1003, 3))
+        self.names = ['objective', 'x_0', 'x_1']
+
+    def assert_windows_match(self, steps, minima, maxima, means, window):
+        for step, low, high, mean in zip(steps, minima, maxima, means):
+            raw = self.values[step:step + window]
+            np.testing.assert_allclose(low, raw.min(axis=0))
+            np.testing.assert_allclose(high, raw.max(axis=0))
+            np.testing.assert_allclose(mean, raw.mean(axis=0))
+
+    def test_streamed_query_matches_raw_values(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            writer = PyramidWriter(tmpdirpath, self.names, n_levels=6)
+            for chunk in np.array_split(self.values, 37):
+                writer.append_rows(chunk)
+
+            pyramid = Pyramid(tmpdirpath)
+            steps, minima, maxima, means = pyramid.query(100, 900, 50)
+            window = 2 ** pyramid.level_for(100, 900, 50)
+
+            self.assertGreater(window, 1)
+            self.assertLessEqual(len(steps), 60)
+            self.assert_windows_match(steps, minima, maxima, means, window)
+
+    def test_incomplete_tail_window(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            build_pyramid(self.values, tmpdirpath, self.names)
+            pyramid = Pyramid(tmpdirpath)
+            steps, minima, maxima, means = pyramid.query(0, 1003, 10)
+            window = 2 ** pyramid.level_for(0, 1003, 10)
+
+            self.assertGreater(steps[-1] + window, 1003)
+            self.assert_windows_match(steps, minima, maxima, means, window)
+
+    def test_resume_drops_later_steps(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            full_dir = os.path.join(tmpdirpath, 'full')
+            resumed_dir = os.path.join(tmpdirpath, 'resumed')
+            build_pyramid(self.values, full_dir, self.names, n_levels=6)
+
+            writer = PyramidWriter(resumed_dir, self.names, n_levels=6)
+            writer.append_rows(self.values[:700])
+            writer = PyramidWriter.resume(resumed_dir, 517)
+            writer.append_rows(self.values[517:])
+
+            for level in range(7):
+                file_name = 'level_{}.bin'.format(level)
+                with open(os.path.join(full_dir, file_name), 'rb') as full:
+                    with open(os.path.join(resumed_dir,
+                                           file_name), 'rb') as resumed:
+                        self.assertEqual(full.read(), resumed.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
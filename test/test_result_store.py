@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""Tests the indexed SQLite store of simulation results."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation.io import load_data
+from blueark.simulation.result_store import (STORE_FILE_NAME, ResultStore,
+                                             build_store)
+from blueark.simulation.simulator import OBJ_FILE_NAME, VAR_FILE_NAME
+from test.helpers import model2_demands, simulate_model2
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.random((503, 3))
+        # a pipe at its capacity every fifth step, a step without solution
+        self.values[::5, 2] = 200.0
+        self.values[17] = np.nan
+        self.names = ['objective', 'x_0', 'x_1']
+
+    def test_range_threshold_and_aggregate_queries(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, STORE_FILE_NAME)
+            build_store(self.values, path, self.names, batch_steps=64)
+
+            with ResultStore(path) as store:
+                self.assertEqual(store.names, self.names)
+                self.assertEqual(store.n_steps, 503)
+
+                steps, values = store.range('x_0', 10, 20)
+                np.testing.assert_array_equal(steps, np.arange(10, 20))
+                np.testing.assert_array_equal(values, self.values[10:20, 1])
+
+                np.testing.assert_array_equal(
+                    store.where('x_1', low=199.9),
+                    np.arange(0, 503, 5))
+                np.testing.assert_array_equal(
+                    store.where('x_1', low=199.9, start=100, stop=120),
+                    [100, 105, 110, 115])
+                np.testing.assert_array_equal(
+                    store.where('objective', high=0.5),
+                    np.flatnonzero(self.values[:, 0] <= 0.5))
+
+                self.assertAlmostEqual(
+                    store.aggregate('objective', 'avg', 100, 400),
+                    self.values[100:400, 0].mean())
+                self.assertAlmostEqual(store.aggregate('x_0', 'max'),
+                                       np.nanmax(self.values[:, 1]))
+                self.assertEqual(store.aggregate('x_0', 'count'), 502)
+
+                with self.assertRaises(ValueError):
+                    store.aggregate('x_0', 'median')
+                with self.assertRaises(ValueError):
+                    store.range('x_9')
+
+    def test_appends_are_visible_and_truncated(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            path = os.path.join(tmpdirpath, STORE_FILE_NAME)
+            with ResultStore(path, self.names, batch_steps=1000) as store:
+                store.append_rows(self.values[:300])
+                # a second connection sees the committed batches only
+                with ResultStore(path) as reader:
+                    self.assertEqual(reader.n_steps, 0)
+                store.flush()
+                with ResultStore(path) as reader:
+                    self.assertEqual(reader.n_steps, 300)
+
+                store.truncate(200)
+                store.append_rows(self.values[200:])
+                self.assertEqual(store.n_steps, 503)
+                np.testing.assert_array_equal(store.range('x_0')[1],
+                                              self.values[:, 1])
+
+            with self.assertRaises(ValueError):
+                ResultStore(path, ['objective', 'x_5'])
+
+
+class TestSimulatorResultStore(unittest.TestCase):
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_store_matches_text_output(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            run_dir_path = simulate_model2(tmpdirpath, model2_demands(4),
+                                           result_store=True).run_dir_path
+
+            variables = load_data(os.path.join(run_dir_path, VAR_FILE_NAME))
+            with ResultStore(os.path.join(run_dir_path,
+                                          STORE_FILE_NAME)) as store:
+                self.assertEqual(store.n_steps, 4)
+                np.testing.assert_allclose(
+                    store.range('objective')[1],
+                    load_data(os.path.join(run_dir_path, OBJ_FILE_NAME)))
+                np.testing.assert_allclose(
+                    store.range(store.names[1])[1], variables[:, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
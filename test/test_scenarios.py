@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Tests the Monte Carlo scenario engine."""
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.simulation import scenarios
+from test.helpers import copy_model2
+
+
+class TestScenarios(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.network_path = copy_model2(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        SymbolGenerator.reset()
+
+    def test_demands_are_drawn_per_scenario(self):
+        state = np.random.get_state()
+        demands = scenarios.draw_demands(6, 5, 20, seed=3)
+        self.assertEqual(demands.shape, (6, 20, 5))
+        self.assertTrue(((demands >= 100) & (demands <= 300)).all())
+        np.testing.assert_array_equal(
+            scenarios.draw_demands(3, 5, 20, seed=3), demands[:3])
+        self.assertFalse(np.array_equal(demands[0], demands[1]))
+        np.testing.assert_array_equal(np.random.get_state()[1], state[1])
+
+    def test_workers_write_into_shared_results(self):
+        demands = scenarios.draw_demands(8, 5, 3)
+        progress = []
+        results, report = scenarios.run_scenarios(
+            self.network_path, demands, max_workers=2, chunk_size=3,
+            on_progress=lambda report: progress.append(report.n_scenarios))
+        serial, serial_report = scenarios.run_scenarios(
+            self.network_path, demands, max_workers=1)
+
+        self.assertEqual(progress[-1], 8)
+        self.assertEqual(sorted(progress), progress)
+        self.assertEqual(len(progress), 3)
+        np.testing.assert_array_equal(results.demands, demands)
+        self.assertTrue((results.status == 0).all())
+        self.assertEqual(results.values.shape,
+                         (8, 3, len(results.var_names)))
+        np.testing.assert_allclose(results.values, serial.values, atol=1e-9)
+        np.testing.assert_allclose(report.values, serial_report.values,
+                                   atol=1e-9)
+
+        self.assertEqual(report.objective.shape, (5, 3))
+        np.testing.assert_allclose(
+            report.energy,
+            np.percentile(results.objective.sum(axis=1),
+                          scenarios.DEFAULT_PERCENTILES))
+
+        with self.assertRaises(ValueError):
+            scenarios.run_scenarios(self.network_path, demands[:, :, :4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""Tests following the result files of a running simulation."""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from blueark.simulation.simulator import CONS_FILE_NAME, OBJ_FILE_NAME, \
+    VAR_FILE_NAME
+from blueark.representation import server
+from blueark.representation.server import DashboardServer, _send_event
+from blueark.simulation.stream import ResultTailer
+
+
+class TestResultTailer(unittest.TestCase):
+
+    def test_only_complete_steps_are_returned(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            def append(file_name, text):
+                with open(os.path.join(tmpdirpath, file_name), 'a') as out:
+                    out.write(text)
+
+            append(CONS_FILE_NAME, '\n150.0 120.0\n')
+            append(OBJ_FILE_NAME, '\n42.0\n')
+            append(VAR_FILE_NAME, '\n1.0 2.0\n3.0')
+
+            tailer = ResultTailer(tmpdirpath)
+            steps = tailer.read_new_steps()
+            self.assertEqual(steps, [{'step': 0, 'objective': 42.0,
+                                      'consumptions': [150.0, 120.0],
+                                      'variables': [1.0, 2.0]}])
+
+            append(CONS_FILE_NAME, '100.0 90.0\n')
+            append(OBJ_FILE_NAME, '7.0\n')
+            self.assertEqual(tailer.read_new_steps(), [])
+
+            append(VAR_FILE_NAME, ' 4.0\n')
+            steps = tailer.read_new_steps()
+            self.assertEqual(steps, [{'step': 1, 'objective': 7.0,
+                                      'consumptions': [100.0, 90.0],
+                                      'variables': [3.0, 4.0]}])
+
+    def test_truncated_files_are_read_again(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            def write(file_name, text):
+                with open(os.path.join(tmpdirpath, file_name), 'w') as out:
+                    out.write(text)
+
+            write(CONS_FILE_NAME, '\n1.0\n2.0\n3.0\n')
+            write(OBJ_FILE_NAME, '\n10.0\n20.0\n30.0\n')
+            write(VAR_FILE_NAME, '\n0.1\n0.2\n0.3\n')
+            tailer = ResultTailer(tmpdirpath)
+            self.assertEqual(len(tailer.read_new_steps()), 3)
+
+            # a resumed run truncates to its checkpoint after the first step
+            # and writes the following steps again
+            write(CONS_FILE_NAME, '\n1.0\n2.0\n')
+            write(OBJ_FILE_NAME, '\n10.0\n21.0\n')
+            write(VAR_FILE_NAME, '\n0.1\n')
+            self.assertEqual(tailer.read_new_steps(), [])
+
+            with open(os.path.join(tmpdirpath, VAR_FILE_NAME), 'a') as out:
+                out.write('0.25\n')
+            self.assertEqual(tailer.read_new_steps(),
+                             [{'step': 1, 'objective': 21.0,
+                               'consumptions': [2.0],
+                               'variables': [0.25]}])
+
+
+class _Writer:
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_skipped_steps_are_sent_as_null(self):
+        writer = _Writer()
+        step = {'step': 3, 'objective': float('nan'),
+                'consumptions': [150.0], 'variables': [float('nan'), 1.0]}
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(_send_event(writer, 'steps', [step]))
+        finally:
+            loop.close()
+
+        event, data = writer.data.decode('utf-8').strip().split('\n')
+        self.assertEqual(event, 'event: steps')
+        self.assertNotIn('NaN', data)
+        self.assertEqual(json.loads(data[len('data: '):]),
+                         [{'step': 3, 'objective': None,
+                           'consumptions': [150.0],
+                           'variables': [None, 1.0]}])
+
+
+class TestDashboardServer(unittest.TestCase):
+
+    def test_static_files_stay_in_their_dir(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            static_dir = os.path.join(tmpdirpath, 'static')
+            for dir_path in (static_dir, static_dir + '_private'):
+                os.mkdir(dir_path)
+                with open(os.path.join(dir_path, 'index.html'), 'w') as out:
+                    out.write('<html></html>')
+
+            dashboard = DashboardServer(tmpdirpath)
+            loop = asyncio.new_event_loop()
+            try:
+                for path, status in (('/', b'200'),
+                                     ('/../static_private/index.html',
+                                      b'404'),
+                                     ('/../static/index.html', b'200')):
+                    writer = _Writer()
+                    with mock.patch.object(server, 'STATIC_DIR', static_dir):
+                        loop.run_until_complete(
+                            dashboard.serve_static(writer, path))
+                    self.assertEqual(writer.data.split()[1], status)
+            finally:
+                loop.close()
+
+    def test_poll_reads_the_steps_off_the_event_loop(self):
+        with tempfile.TemporaryDirectory() as tmpdirpath:
+            for file_name, text in ((CONS_FILE_NAME, '\n150.0\n'),
+                                    (OBJ_FILE_NAME, '\n42.0\n'),
+                                    (VAR_FILE_NAME, '\n1.0\n')):
+                with open(os.path.join(tmpdirpath, file_name), 'w') as out:
+                    out.write(text)
+
+            dashboard = DashboardServer(tmpdirpath, poll_interval=0.01)
+            loop = asyncio.new_event_loop()
+            try:
+                with mock.patch.object(
+                        loop, 'run_in_executor',
+                        wraps=loop.run_in_executor) as run_in_executor:
+                    poller = loop.create_task(dashboard.poll())
+                    loop.run_until_complete(asyncio.sleep(0.1))
+                    poller.cancel()
+                    with self.assertRaises(asyncio.CancelledError):
+                        loop.run_until_complete(poller)
+                run_in_executor.assert_called_with(
+                    None, dashboard.tailer.read_new_steps)
+            finally:
+                loop.close()
+            self.assertEqual([step['step'] for step in dashboard.history],
+                             [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""Tests the capacity sweeps over compiled networks."""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from blueark.equations import SymbolGenerator
+from blueark.model.compiler import compile_spec
+from blueark.optmization import sweep
+from blueark.optmization.decomposition import linear_program, solve_decomposed
+
+
+def chains_spec(n_chains):
+    """Independent source, pipe, consumer chains, chain `k` delivers at
+    most `min(100 + k, pipe_k)` with an efficiency of `20 + k`."""
+    entities = []
+    for k in range(n_chains):
+        entities += [{'id': 'consumer_{}'.format(k), 'type': 'consumer',
+                      'demand': 100 + k},
+                     {'id': 'pipe_{}'.format(k), 'type': 'pipe',
+                      'children': ['consumer_{}'.format(k)],
+                      'max_throughput': 150, 'efficiency': 20 + k},
+                     {'id': 'source_{}'.format(k), 'type': 'source',
+                      'children': ['pipe_{}'.format(k)]}]
+    return {'name': 'chains', 'entities': entities}
+
+
+def expected_power(capacities):
+    """Power of three chains for the capacities of their pipes."""
+    return sum((20 + k) * min(100 + k, capacity)
+               for k, capacity in enumerate(capacities))
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        SymbolGenerator.reset()
+        self.compiled = compile_spec(chains_spec(3))
+        self.axes = [('pipe_0', np.linspace(0, 200, 6)),
+                     ('pipe_2', np.linspace(0, 150, 7))]
+
+    def tearDown(self):
+        SymbolGenerator.reset()
+
+    def test_table_holds_the_optimal_power_of_every_point(self):
+        table = sweep.sweep_capacities(self.compiled, self.axes,
+                                       max_workers=1)
+
+        self.assertEqual(list(table), ['pipe_0', 'pipe_2', sweep.POWER_COLUMN,
+                                       sweep.STATUS_COLUMN,
+                                       sweep.SOLVED_COLUMN])
+        grid = list(itertools.product(*(values for _, values in self.axes)))
+        np.testing.assert_array_equal(table['pipe_0'],
+                                      [point[0] for point in grid])
+        np.testing.assert_allclose(
+            table[sweep.POWER_COLUMN],
+            [expected_power([first, 150, second]) for first, second in grid])
+        np.testing.assert_array_equal(table[sweep.STATUS_COLUMN], 0)
+
+    def test_matches_solving_the_patched_network(self):
+        table = sweep.sweep_capacities(self.compiled, self.axes,
+                                       demands=[90, 50, 60], max_workers=1)
+        for idx in (0, 9, 20, 41):
+            self.compiled.set_parameter('pipe_0', table['pipe_0'][idx])
+            self.compiled.set_parameter('pipe_2', table['pipe_2'][idx])
+            solution = solve_decomposed(linear_program(self.compiled), 1)
+            self.assertAlmostEqual(table[sweep.POWER_COLUMN][idx],
+                                   solution.objective)
+
+    def test_neighbouring_solutions_are_reused(self):
+        table = sweep.sweep_capacities(
+            self.compiled, [('pipe_1', [50, 150, 200, 250])], max_workers=1)
+        # only the block of the pipe is solved again, and only while the
+        # capacity binds its flow
+        np.testing.assert_array_equal(table[sweep.SOLVED_COLUMN],
+                                      [3, 1, 0, 0])
+
+        table = sweep.sweep_capacities(self.compiled, self.axes,
+                                       max_workers=1)
+        self.assertLess(table[sweep.SOLVED_COLUMN].sum(),
+                        len(table[sweep.POWER_COLUMN]))
+
+    def test_parallel_sweep_matches(self):
+        serial = sweep.sweep_capacities(self.compiled, self.axes,
+                                        max_workers=1)
+        parallel = sweep.sweep_capacities(self.compiled, self.axes,
+                                          max_workers=2)
+        np.testing.assert_allclose(parallel[sweep.POWER_COLUMN],
+                                   serial[sweep.POWER_COLUMN])
+
+    def test_serpentine_order_moves_one_step_at_a_time(self):
+        for shape in ((5,), (3, 2, 4), (2, 3, 3, 2)):
+            order = sweep.serpentine_order(shape)
+            self.assertEqual(sorted(order), list(range(int(np.prod(shape)))))
+            steps = np.abs(np.diff(np.unravel_index(order, shape), axis=1))
+            np.testing.assert_array_equal(steps.sum(axis=0), 1)
+
+    def test_only_capacities_can_be_swept(self):
+        with self.assertRaises(ValueError):
+            sweep.sweep_capacities(self.compiled, [('consumer_0', [1, 2])],
+                                   max_workers=1)
+        with self.assertRaises(ValueError):
+            sweep.sweep_capacities(self.compiled, [('pipe_0', [1]),
+                                                   ('pipe_0', [2])],
+                                   max_workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()